@@ -0,0 +1,276 @@
+import asyncio
+import functools
+import json
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import ValidationError
+from .models import CollectionVersion, Customer, Product, Feedback, ProductFacet
+from .serializers import CustomerSerializer, ProductSerializer, FeedbackSerializer
+from .pagination import TOMBSTONED, encode_cursor, decode_cursor, get_limit
+from .projection import get_fields, db_fields, render_rows
+from .search import search_pipeline, search_page
+from .facets import facet_body
+from .counters import counts_body
+from .streaming import STREAM_BATCH_SIZE
+from .utils import get_async_db_handle
+from .versioning import collection_etag, conditional_response, not_modified, state_of, validators, with_validators
+
+# Same compact output as DRF's JSONRenderer, so both deployments answer byte for byte alike
+JSON_OPTIONS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def json_response(body, status=200):
+    return JsonResponse(body, status=status, safe=False, json_dumps_params=JSON_OPTIONS)
+
+
+def async_read(view):
+    """
+    GET-only async view; invalid query params answer 400 like DRF would.
+    """
+    @require_GET
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except ValidationError as e:
+            return json_response(e.detail, status=400)
+    return wrapper
+
+
+def get_collection(model_class):
+    db_handle, _ = get_async_db_handle()
+    return db_handle[model_class._meta['collection']]
+
+
+def live(model_class, query):
+    """
+    Restrict a query to documents that are not tombstoned.
+    """
+    if 'deleted_at' in model_class._fields:
+        return {**query, 'deleted_at': None}
+    return query
+
+
+def projection_for(model_class, key, fields):
+    return dict.fromkeys(set(db_fields(model_class, fields) + [key]), 1)
+
+
+async def find_one(model_class, serializer_class, query, counts=False):
+    """
+    Fetch one raw document and render it like its serializer.
+
+    With `counts`, the feedback counts are added like the sync detail views do.
+
+    Returns:
+    - (rendered row, raw document holding its version and updated_at), or (None, None)
+    """
+    fields = list(serializer_class().fields)
+    projection = {**projection_for(model_class, '_id', fields), 'version': 1, 'updated_at': 1}
+    if counts:
+        projection['feedback_counts'] = 1
+    document = await get_collection(model_class).find_one(live(model_class, query), projection)
+    if document is None:
+        return None, None
+    row = render_rows(model_class, [document], fields)[0]
+    if counts:
+        row['feedback_counts'] = counts_body(document.get('feedback_counts'))
+    return row, document
+
+
+async def list_response(request, model_class, serializer_class, key):
+    """
+    Keyset-paginated (or streamed) list with the same shape and validators as
+    the sync list views: a matching If-None-Match is answered with 304 before
+    the collection itself is queried.
+    """
+    counter = await get_collection(CollectionVersion).find_one({'_id': model_class._meta['collection']})
+    etag, last_modified = collection_etag(request, model_class, state_of(counter))
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    response = await page_response(request, model_class, serializer_class, key)
+    if response.status_code == 200:
+        with_validators(response, etag, last_modified)
+    return response
+
+
+async def page_response(request, model_class, serializer_class, key):
+    params = request.GET
+    fields = get_fields(params, serializer_class) or list(serializer_class().fields)
+    after = decode_cursor(params.get('cursor'))
+    query = live(model_class, {key: {'$gt': after}} if after is not None else {})
+    collection = get_collection(model_class)
+    cursor = collection.find(query, projection_for(model_class, key, fields)).sort(key, 1)
+
+    if params.get('stream') in ('1', 'true'):
+        return StreamingHttpResponse(stream_rows(model_class, cursor.batch_size(STREAM_BATCH_SIZE), fields),
+                                     content_type='application/json')
+
+    # Fetch one extra document to know whether another page exists
+    limit = get_limit(params)
+    documents = await cursor.limit(limit + 1).to_list()
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1][key])
+
+    body = {"results": render_rows(model_class, documents, fields), "next": next_cursor}
+    if params.get('count') in ('1', 'true'):
+        body["count"] = await collection.estimated_document_count() - await collection.count_documents(TOMBSTONED)
+    return json_response(body)
+
+
+async def stream_rows(model_class, cursor, fields):
+    yield '['
+    separator = ''
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) == STREAM_BATCH_SIZE:
+            yield separator + dump_rows(model_class, batch, fields)
+            separator, batch = ',', []
+    if batch:
+        yield separator + dump_rows(model_class, batch, fields)
+    yield ']'
+
+
+def dump_rows(model_class, documents, fields):
+    return ','.join(json.dumps(row, **JSON_OPTIONS) for row in render_rows(model_class, documents, fields))
+
+
+#############
+# Read (GET)
+#############
+
+
+@async_read
+async def customer_list(request):
+    """
+    Async counterpart of views.customer_list.
+    """
+    return await list_response(request, Customer, CustomerSerializer, 'user_id')
+
+@async_read
+async def product_list(request):
+    """
+    Async counterpart of views.product_list.
+    """
+    return await list_response(request, Product, ProductSerializer, 'item_id')
+
+@async_read
+async def feedback_list(request):
+    """
+    Async counterpart of views.feedback_list.
+    """
+    return await list_response(request, Feedback, FeedbackSerializer, 'review_id')
+
+@async_read
+async def feedback_search(request):
+    """
+    Async counterpart of views.feedback_search.
+    """
+    pipeline, limit, fields = search_pipeline(request.GET)
+    documents = await (await get_collection(Feedback).aggregate(pipeline)).to_list()
+    return json_response(search_page(documents, limit, fields))
+
+@async_read
+async def product_facets(request):
+    """
+    Async counterpart of views.product_facets.
+    """
+    documents = await get_collection(ProductFacet).find({}, {"_id": 0}).to_list()
+    return json_response(facet_body(documents))
+
+@async_read
+async def customer_detail(request, customer_id):
+    """
+    Retrieve details of a specific customer.
+
+    Returns:
+    - Customer details with their feedback counts if found
+    - 304 Not Modified if the client's ETag still matches
+    - 404 Not Found if customer doesn't exist
+    """
+    customer, document = await find_one(Customer, CustomerSerializer, {'user_id': customer_id}, counts=True)
+    if customer is None:
+        return HttpResponse(status=404)
+    etag, last_modified = validators('customer', customer_id, document)
+    return conditional_response(request, etag, last_modified, lambda: json_response(customer))
+
+@async_read
+async def product_detail(request, product_id):
+    """
+    Retrieve details of a specific product.
+
+    Returns:
+    - Product details with its review, fit and length counts if found
+    - 304 Not Modified if the client's ETag still matches
+    - 404 Not Found if product doesn't exist
+    """
+    product, document = await find_one(Product, ProductSerializer, {'item_id': product_id}, counts=True)
+    if product is None:
+        return HttpResponse(status=404)
+    etag, last_modified = validators('product', product_id, document)
+    return conditional_response(request, etag, last_modified, lambda: json_response(product))
+
+@async_read
+async def feedback_detail(request, feedback_id):
+    """
+    Retrieve details of a specific feedback, including associated customer and product details.
+
+    The customer and product are fetched concurrently off the feedback's stored keys.
+    """
+    try:
+        feedback, document = await find_one(Feedback, FeedbackSerializer, {'review_id': feedback_id})
+        if feedback is None:
+            return json_response({"error": "Feedback not found"}, status=404)
+        (customer, customer_document), (product, product_document) = await asyncio.gather(
+            find_one(Customer, CustomerSerializer, {'user_id': feedback['customer_id']}),
+            find_one(Product, ProductSerializer, {'item_id': feedback['product_id']}),
+        )
+        # Feedback of a deleted customer or product is only waiting for the reaper
+        if customer is None or product is None:
+            return json_response({"error": "Feedback not found"}, status=404)
+        feedback['customer'], feedback['product'] = customer, product
+        etag, last_modified = validators('feedback', feedback_id, document, customer_document, product_document)
+        return conditional_response(request, etag, last_modified, lambda: json_response(feedback))
+    except Exception as e:
+        return json_response({"error": str(e)}, status=500)
+
+async def feedback_ids(model_class, key, value):
+    """
+    Review IDs of a customer or product; None when the parent doesn't exist.
+    """
+    # Checked first: the feedback of a deleted parent stays until its delete job reaches it
+    if await get_collection(model_class).find_one(live(model_class, {key: value}), {'_id': 1}) is None:
+        return None
+    feedbacks = get_collection(Feedback).find(live(Feedback, {key: value}), {'review_id': 1, '_id': 0})
+    return [document['review_id'] for document in await feedbacks.to_list()]
+
+@async_read
+async def customer_feedbacks(request, user_id):
+    """
+    Retrieve all feedback IDs for a specific customer.
+
+    Returns:
+    - List of customer's feedback review IDs
+    - 404 Not Found if customer doesn't exist
+    """
+    ids = await feedback_ids(Customer, 'user_id', user_id)
+    if ids is None:
+        return json_response({"error": "Customer not found"}, status=404)
+    return json_response({"feedback_ids": ids})
+
+@async_read
+async def product_feedbacks(request, item_id):
+    """
+    Retrieve all feedback IDs for a specific product.
+
+    Returns:
+    - List of product's feedback review IDs
+    - 404 Not Found if product doesn't exist
+    """
+    ids = await feedback_ids(Product, 'item_id', item_id)
+    if ids is None:
+        return json_response({"error": "Product not found"}, status=404)
+    return json_response({"feedback_ids": ids})
@@ -0,0 +1,367 @@
+import re
+from datetime import date, datetime, timedelta
+import numpy as np
+from django.utils.dateparse import parse_date
+
+NON_FIELD_ERRORS = 'non_field_errors'
+
+CUP_SIZES = ('AA', 'A', 'B', 'C', 'D', 'DD', 'E', 'F', 'G')
+CLOTH_SIZE_CATEGORIES = ('XS', 'S', 'M', 'L', 'XL', 'XXL')
+VALID_CATEGORIES = frozenset([
+    'clothing', 'accessories', 'tops', 'bottoms', 'dresses',
+    'underwear', 'sportswear', 'formal', 'casual', 'shoes'
+])
+MAX_KEYWORDS = 5
+
+BRA_SIZE_RE = re.compile(r'^(28|30|32|34|36|38|40|42|44|46|48|50|52)(?:[A-D]{0,1})?$')
+HEIGHT_RE = re.compile(r'^(\d)\'(\d{1,2})$')
+MEASUREMENT_RE = re.compile(r'^\d+(\.\d+)?$')
+DECIMAL_SUFFIX_RE = re.compile(r'\.0*\s*$')
+
+# Integers beyond this can't be held in an int64 column; they are out of range anyway
+INT_LIMIT = 2 ** 62
+
+# Customer measurements stored as floats (inches); bra_size is stored as the band number
+MEASUREMENT_FIELDS = ('waist', 'hips', 'bust')
+
+
+def height_inches(value):
+    """
+    Convert a feet'inches height (e.g. 5'6) to inches; anything else is returned unchanged.
+    """
+    match = HEIGHT_RE.match(value) if isinstance(value, str) else None
+    return int(match.group(1)) * 12 + int(match.group(2)) if match else value
+
+
+def store_measurements(data):
+    """
+    Convert validated customer measurements to the numbers they are stored as, in place.
+    """
+    for field in MEASUREMENT_FIELDS:
+        if field in data:
+            data[field] = float(data[field])
+    if 'bra_size' in data:
+        data['bra_size'] = int(data['bra_size'])
+    if 'height' in data:
+        data['height'] = height_inches(data['height'])
+    return data
+
+
+class Batch:
+    """
+    Rows of one batch with the errors and cleaned values collected so far.
+
+    Validation runs column by column over the whole batch: numeric bounds are
+    NumPy comparisons, patterns are compiled once and choices are set lookups.
+    Nothing here touches settings or the database, so batches can be
+    validated in worker processes.
+    """
+
+    def __init__(self, rows, partial=False):
+        self.rows = rows
+        self.partial = partial
+        self.errors = [{} for _ in rows]
+        self.data = [{} for _ in rows]
+        for position, row in enumerate(rows):
+            if row is None:
+                self.errors[position][NON_FIELD_ERRORS] = ["No data provided"]
+            elif not isinstance(row, dict):
+                self.errors[position][NON_FIELD_ERRORS] = [
+                    f"Invalid data. Expected a dictionary, but got {type(row).__name__}."
+                ]
+
+    def add_error(self, position, field, message):
+        self.errors[position].setdefault(field, []).append(message)
+
+    def add_errors(self, positions, field, message):
+        for position in positions:
+            self.add_error(position, field, message)
+
+    def present(self, field):
+        """
+        Positions and raw values of a field, reporting missing and null values.
+        """
+        positions, values = [], []
+        for position, row in enumerate(self.rows):
+            if not isinstance(row, dict):
+                continue
+            if field not in row:
+                if not self.partial:
+                    self.add_error(position, field, "This field is required.")
+                continue
+            if row[field] is None:
+                self.add_error(position, field, "This field may not be null.")
+                continue
+            positions.append(position)
+            values.append(row[field])
+        return positions, values
+
+    def valid(self, field):
+        """
+        Positions whose value for `field` has passed every check so far.
+        """
+        return [position for position, data in enumerate(self.data) if field in data]
+
+    def reject(self, positions, field, message):
+        """
+        Report an error on a field and drop its cleaned value.
+        """
+        for position in positions:
+            self.add_error(position, field, message)
+            self.data[position].pop(field, None)
+
+    def clean(self):
+        """
+        Positions of rows without any error so far.
+        """
+        return [position for position, errors in enumerate(self.errors) if not errors]
+
+    def result(self):
+        """
+        Returns:
+        - (list of (position, cleaned data), list of (position, errors))
+        """
+        validated, failed = [], []
+        for position, errors in enumerate(self.errors):
+            if errors:
+                failed.append((position, errors))
+            else:
+                validated.append((position, self.data[position]))
+        return validated, failed
+
+
+def integer_column(batch, field, min_value, max_value):
+    positions, values = batch.present(field)
+    parsed_positions, parsed = [], []
+    for position, value in zip(positions, values):
+        if isinstance(value, str) and len(value) > 1000:
+            batch.add_error(position, field, "String value too large.")
+            continue
+        try:
+            number = int(DECIMAL_SUFFIX_RE.sub('', str(value)))
+        except (ValueError, TypeError):
+            batch.add_error(position, field, "A valid integer is required.")
+            continue
+        parsed_positions.append(position)
+        parsed.append(max(min(number, INT_LIMIT), -INT_LIMIT))
+        batch.data[position][field] = number
+
+    if parsed:
+        index = np.array(parsed_positions)
+        column = np.array(parsed, dtype=np.int64)
+        batch.reject(index[column > max_value], field, f"Ensure this value is less than or equal to {max_value}.")
+        batch.reject(index[column < min_value], field, f"Ensure this value is greater than or equal to {min_value}.")
+
+
+def char_column(batch, field, max_length, min_length=None, allow_blank=False):
+    positions, values = batch.present(field)
+    kept_positions, kept = [], []
+    for position, value in zip(positions, values):
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            batch.add_error(position, field, "Not a valid string.")
+            continue
+        value = str(value).strip()
+        if value == '' and not allow_blank:
+            batch.add_error(position, field, "This field may not be blank.")
+            continue
+        kept_positions.append(position)
+        kept.append(value)
+        batch.data[position][field] = value
+
+    if kept:
+        index = np.array(kept_positions)
+        lengths = np.fromiter(map(len, kept), dtype=np.int64, count=len(kept))
+        batch.reject(index[lengths > max_length], field, f"Ensure this field has no more than {max_length} characters.")
+        if min_length is not None:
+            batch.reject(index[lengths < min_length], field, f"Ensure this field has at least {min_length} characters.")
+
+
+def choice_column(batch, field, choices):
+    allowed = frozenset(choices)
+    positions, values = batch.present(field)
+    for position, value in zip(positions, values):
+        if str(value) in allowed:
+            batch.data[position][field] = str(value)
+        else:
+            batch.add_error(position, field, f'"{value}" is not a valid choice.')
+
+
+def float_values(batch, field, positions):
+    """
+    Parse a cleaned string column into a float array; NaN where parsing fails.
+    """
+    values = np.full(len(positions), np.nan)
+    parsed = np.zeros(len(positions), dtype=bool)
+    for offset, position in enumerate(positions):
+        try:
+            values[offset] = float(batch.data[position][field])
+            parsed[offset] = True
+        except ValueError:
+            pass
+    return values, parsed
+
+
+def validate_customers(rows, partial=False):
+    """
+    Validate a batch of customer records with the rules of CustomerSerializer
+    and the Customer model, using the serializer's error messages.
+
+    Returns:
+    - (list of (position, validated data), list of (position, errors))
+    """
+    batch = Batch(rows, partial)
+
+    # Field level, in CustomerSerializer's field order
+    integer_column(batch, 'user_id', 100000, 999999)
+    char_column(batch, 'user_name', 100, min_length=2)
+    char_column(batch, 'waist', 10)
+    choice_column(batch, 'cup_size', CUP_SIZES)
+    char_column(batch, 'bra_size', 10)
+    char_column(batch, 'hips', 10)
+    char_column(batch, 'bust', 10)
+    char_column(batch, 'height', 10)
+
+    # validate_waist: numeric and between 20 and 60
+    positions = np.array(batch.valid('waist'), dtype=np.int64)
+    waist, parsed = float_values(batch, 'waist', positions)
+    batch.reject(positions[~parsed], 'waist', "Waist must be a numeric value.")
+    batch.reject(positions[parsed & ((waist < 20) | (waist > 60))], 'waist',
+                 "Waist measurement seems unusual. Expected between 20-60 inches.")
+
+    # validate_bra_size
+    batch.reject([position for position in batch.valid('bra_size')
+                  if not BRA_SIZE_RE.match(batch.data[position]['bra_size'])],
+                 'bra_size', "Invalid bra size. Use format like '34B' or '36'.")
+
+    # validate_height: 4'0 to 7'11
+    bad_format, feet, inches, height_positions = [], [], [], []
+    for position in batch.valid('height'):
+        match = HEIGHT_RE.match(batch.data[position]['height'])
+        if match:
+            height_positions.append(position)
+            feet.append(int(match.group(1)))
+            inches.append(int(match.group(2)))
+        else:
+            bad_format.append(position)
+    batch.reject(bad_format, 'height', "Height must be in format 5'6")
+    if height_positions:
+        feet, inches = np.array(feet), np.array(inches)
+        batch.reject(np.array(height_positions)[(feet < 4) | (feet > 7) | (inches > 11)], 'height',
+                     "Height seems unusual. Expected between 4'0 and 7'11")
+
+    # Cross-field check, only for rows without field errors
+    positions = [position for position in batch.clean()
+                 if 'waist' in batch.data[position] and 'hips' in batch.data[position]]
+    if positions:
+        positions = np.array(positions)
+        waist, waist_parsed = float_values(batch, 'waist', positions)
+        hips, hips_parsed = float_values(batch, 'hips', positions)
+        parsed = waist_parsed & hips_parsed
+        batch.add_errors(positions[~parsed], NON_FIELD_ERRORS, "Invalid measurement format for waist or hips.")
+        batch.add_errors(positions[parsed & (waist >= hips)], NON_FIELD_ERRORS,
+                         "Waist measurement must be less than hip measurement.")
+
+    # Model level: measurements must be plain decimals
+    for position in batch.clean():
+        for field in ('waist', 'bra_size', 'hips', 'bust'):
+            value = batch.data[position].get(field)
+            if value is not None and not MEASUREMENT_RE.match(value):
+                batch.add_error(position, field, f"Invalid measurement format for '{value}'.")
+
+    for position in batch.clean():
+        store_measurements(batch.data[position])
+    return batch.result()
+
+
+def validate_products(rows, partial=False, today=None):
+    """
+    Validate a batch of product records with the rules of ProductSerializer
+    and the Product model, using the serializer's error messages.
+
+    Returns:
+    - (list of (position, validated data), list of (position, errors))
+    """
+    today = today or date.today()
+    batch = Batch(rows, partial)
+
+    integer_column(batch, 'item_id', 100000, 999999)
+    char_column(batch, 'product_name', 100, min_length=2)
+    integer_column(batch, 'size', 0, 50)
+    integer_column(batch, 'quality', 1, 5)
+    keyword_column(batch)
+    choice_column(batch, 'cloth_size_category', CLOTH_SIZE_CATEGORIES)
+    date_column(batch, 'last_update_date', today)
+
+    return batch.result()
+
+
+def keyword_column(batch):
+    """
+    Keywords: a non-empty list of at most 5 strings from VALID_CATEGORIES, lowercased.
+    """
+    positions, values = batch.present('keywords')
+    for position, value in zip(positions, values):
+        if isinstance(value, (str, dict)) or not hasattr(value, '__iter__'):
+            batch.add_error(position, 'keywords', f'Expected a list of items but got type "{type(value).__name__}".')
+            continue
+        value = list(value)
+
+        item_errors, keywords = {}, []
+        for offset, keyword in enumerate(value):
+            if keyword is None:
+                item_errors[offset] = ["This field may not be null."]
+            elif isinstance(keyword, bool) or not isinstance(keyword, (str, int, float)):
+                item_errors[offset] = ["Not a valid string."]
+            elif str(keyword).strip() == '':
+                item_errors[offset] = ["This field may not be blank."]
+            elif len(str(keyword).strip()) > 100:
+                item_errors[offset] = ["Ensure this field has no more than 100 characters."]
+            else:
+                keywords.append(str(keyword).strip().lower())
+        if item_errors:
+            batch.errors[position]['keywords'] = item_errors
+            continue
+        if len(value) < 1:
+            batch.add_error(position, 'keywords', "Ensure this field has at least 1 elements.")
+            continue
+
+        # validate_keywords
+        if len(value) > MAX_KEYWORDS:
+            batch.add_error(position, 'keywords', f"Maximum {MAX_KEYWORDS} keywords allowed.")
+            continue
+        invalid = [keyword for keyword in keywords if keyword not in VALID_CATEGORIES]
+        if invalid:
+            batch.add_error(position, 'keywords', f"Keyword '{invalid[0]}' is not a valid product category.")
+            continue
+        batch.data[position]['keywords'] = keywords
+
+
+def date_column(batch, field, today):
+    """
+    ISO dates no later than today and at most 5 years back.
+    """
+    positions, values = batch.present(field)
+    parsed_positions, ordinals = [], []
+    for position, value in zip(positions, values):
+        if isinstance(value, datetime):
+            batch.add_error(position, field, "Expected a date but got a datetime.")
+            continue
+        parsed = value if isinstance(value, date) else None
+        if parsed is None:
+            try:
+                parsed = parse_date(value)
+            except (ValueError, TypeError):
+                parsed = None
+        if parsed is None:
+            batch.add_error(position, field, "Date has wrong format. Use one of these formats instead: YYYY-MM-DD.")
+            continue
+        batch.data[position][field] = parsed
+        parsed_positions.append(position)
+        ordinals.append(parsed.toordinal())
+
+    if ordinals:
+        index = np.array(parsed_positions)
+        column = np.array(ordinals)
+        oldest = (today - timedelta(days=365 * 5)).toordinal()
+        batch.reject(index[column > today.toordinal()], field, "Update date cannot be in the future.")
+        batch.reject(index[column < oldest], field, "Update date seems too old. Maximum 5 years in the past.")
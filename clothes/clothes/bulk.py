@@ -0,0 +1,686 @@
+import logging
+import time
+from collections import deque
+from itertools import islice
+from django.conf import settings
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from rest_framework import status
+from rest_framework.response import Response
+from .batch_validation import NON_FIELD_ERRORS, validate_customers, validate_products
+from .cache import detail_cache
+from .counters import count_feedback, count_updates, counted, counted_update, touches_counters, COUNTED_FIELDS
+from .facets import record, record_updates, snapshot, touches_facets, tracked_update
+from .jobs import enqueue, iter_batches
+from .metrics import bulk_rows_ingested
+from .models import Customer, Product, Feedback, utc_now
+from .parallel import feedback_shard, imap_shards, shards, validate_shard
+from .reaper import PARENTS, reap, tombstone_matching
+from .serializers import FeedbackSerializer
+from .streaming import StreamParseError, is_streaming_upload, iter_records
+from .versioning import bump_collection, invalidate_customers, invalidate_products, invalidate_feedbacks
+
+logger = logging.getLogger(__name__)
+
+# Stored fields items-mode updates read with their existence lookup, to check changes against
+STORED_FIELDS = {Customer: ('waist', 'hips')}
+
+
+def chunked(iterable, size):
+    """
+    Yield successive lists of at most `size` items from any iterable.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_batch_size(request):
+    """
+    Resolve the write batch size from `?batch_size=`, falling back to BULK_BATCH_SIZE.
+    """
+    try:
+        batch_size = int(request.query_params.get('batch_size', settings.BULK_BATCH_SIZE))
+    except (TypeError, ValueError):
+        batch_size = settings.BULK_BATCH_SIZE
+    return max(batch_size, 1)
+
+
+def as_int(value):
+    """
+    Coerce a natural key from the payload to int, or None when it is not one.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def resolve_references(model_class, key, values):
+    """
+    Load the documents for a set of natural keys with one `$in` query.
+
+    Returns:
+    - Dict mapping each existing key to a document holding only its id and key
+    """
+    keys = {value for value in values if value is not None}
+    if not keys:
+        return {}
+    documents = model_class.objects(**{f"{key}__in": list(keys)}).only('id', key)
+    return {getattr(document, key): document for document in documents}
+
+
+def feedback_entries(rows, errors, start=0):
+    """
+    Resolve the customers and products of raw feedback rows, with one query
+    per collection for the whole batch; rows pointing at missing ones are
+    reported, not skipped silently.
+
+    Returns:
+    - List of entries for parallel.feedback_shard
+    """
+    records = [row if isinstance(row, dict) else {} for row in rows]
+    customers = resolve_references(Customer, 'user_id', [as_int(row.get('customer_id')) for row in records])
+    products = resolve_references(Product, 'item_id', [as_int(row.get('product_id')) for row in records])
+
+    entries = []
+    for index, feedback_data in enumerate(rows, start=start):
+        if not isinstance(feedback_data, dict):
+            errors.append({"index": index, "errors": ["Expected an object."]})
+            continue
+
+        customer = customers.get(as_int(feedback_data.get('customer_id')))
+        product = products.get(as_int(feedback_data.get('product_id')))
+        missing = {}
+        if customer is None:
+            missing['customer_id'] = [f"Customer {feedback_data.get('customer_id')} does not exist."]
+        if product is None:
+            missing['product_id'] = [f"Product {feedback_data.get('product_id')} does not exist."]
+        if missing:
+            errors.append({"index": index, "errors": missing})
+            continue
+        entries.append((index, feedback_data, (customer.pk, customer.user_id), (product.pk, product.item_id)))
+    return entries
+
+
+# Batch validators of the upload targets; feedback is validated document by document
+VALIDATORS = {Customer: validate_customers, Product: validate_products}
+
+
+def validate_shards(model_class, batches):
+    """
+    Validate batches of rows into documents, in the process pool when there
+    is more than one, yielding each batch's results in order as soon as it
+    is validated.
+
+    Batches are read lazily, only as far as the pool runs ahead of the
+    caller, so a caller inserting each batch keeps the workers validating
+    the next ones meanwhile. Feedback references are resolved here, in this
+    process, before their batch goes to the pool.
+
+    Args:
+    - model_class: Customer, Product or Feedback
+    - batches: Iterable of (index of the first row, rows)
+
+    Returns:
+    - Iterator of (row count, list of (row index, unsaved document), list of row errors)
+    """
+    sizes = deque()
+
+    def arguments():
+        for start, rows in batches:
+            rows = list(rows)
+            sizes.append(len(rows))
+            if model_class is Feedback:
+                errors = []
+                yield feedback_entries(rows, errors, start), errors
+            else:
+                yield VALIDATORS[model_class], model_class, rows, start
+
+    function = feedback_shard if model_class is Feedback else validate_shard
+    for validated, errors in imap_shards(function, arguments()):
+        yield sizes.popleft(), validated, errors
+
+
+def validate_rows(model_class, rows, errors, start=0):
+    """
+    Validate an in-memory payload in VALIDATION_SHARD_SIZE shards, see validate_shards.
+
+    Returns:
+    - List of (row index, unsaved document) tuples that passed validation
+    """
+    validated = []
+    for _, shard_validated, shard_errors in validate_shards(model_class, shards(list(rows), start)):
+        validated.extend(shard_validated)
+        errors.extend(shard_errors)
+    return validated
+
+
+def drop_duplicates(model_class, key, validated, errors, seen=None):
+    """
+    Remove rows whose natural key repeats inside the payload or already exists.
+
+    Existing keys are looked up with a single `$in` query instead of letting
+    the unique index reject rows one by one halfway through the import.
+
+    Args:
+    - seen: Keys of the payload's earlier shards, to report a repeat of one
+      of them as a duplicate rather than as existing once it is written
+    """
+    keys = [getattr(document, key) for _, document in validated]
+    # Tombstoned documents still hold their key until the reaper removes them
+    existing = set(model_class.all_objects(**{f"{key}__in": keys}).scalar(key))
+
+    seen = set() if seen is None else seen
+    unique = []
+    for index, document in validated:
+        value = getattr(document, key)
+        if value in seen:
+            errors.append({"index": index, "errors": {key: [f"Duplicate {key} {value} in payload."]}})
+        elif value in existing:
+            errors.append({"index": index, "errors": {key: [f"{key} {value} already exists."]}})
+        else:
+            seen.add(value)
+            unique.append((index, document))
+    return unique
+
+
+def insert_batches(model_class, validated, batch_size, errors):
+    """
+    Insert validated documents as unordered `insert_many` chunks.
+
+    A failing row (e.g. a unique index race with another writer) only rejects
+    that row; the rest of its chunk is still written. Written rows are then
+    recorded by after_insert.
+
+    Returns:
+    - List of the documents that were written
+    """
+    collection = model_class._get_collection()
+    inserted = []
+    for batch in chunked(validated, batch_size):
+        try:
+            collection.insert_many([document.to_mongo() for _, document in batch], ordered=False)
+            inserted.extend(document for _, document in batch)
+        except BulkWriteError as e:
+            failed = {error['index']: error['errmsg'] for error in e.details.get('writeErrors', [])}
+            for position, (index, document) in enumerate(batch):
+                if position in failed:
+                    errors.append({"index": index, "errors": [failed[position]]})
+                else:
+                    inserted.append(document)
+    if inserted:
+        after_insert(model_class, inserted)
+    return inserted
+
+
+def after_insert(model_class, inserted):
+    """
+    Record written rows: the collection version, product facets or feedback
+    counters, and the ingest metric.
+
+    The rows are committed by then, so each step is best-effort: a failure is
+    logged and the rows are still reported as inserted. Facets and counters
+    it missed are repaired by rebuild_facets and reconcile_feedback_counts.
+    """
+    collection = model_class._meta['collection']
+    steps = [('version', lambda: bump_collection(model_class))]
+    if model_class is Product:
+        steps.append(('facets', lambda: record(added=inserted)))
+    elif model_class is Feedback:
+        steps.append(('counters', lambda: count_feedback(added=inserted)))
+    steps.append(('metrics', lambda: bulk_rows_ingested.labels(collection).inc(len(inserted))))
+    for name, step in steps:
+        try:
+            step()
+        except Exception:
+            logger.exception("Recording %s of %d inserted %s failed", name, len(inserted), collection)
+
+
+def parse_items(items, key, errors, start=0):
+    """
+    Check the shape of `[{"id": ..., "changes": {...}}]` update items.
+
+    Returns:
+    - List of (item index, natural key, changes) for well-formed items
+    """
+    parsed, seen = [], set()
+    for index, item in enumerate(items, start=start):
+        if not isinstance(item, dict) or not isinstance(item.get('changes'), dict) or not item['changes']:
+            errors.append({"index": index, "errors": ["Expected an object with an 'id' and non-empty 'changes'."]})
+            continue
+        identifier = as_int(item.get('id'))
+        if identifier is None:
+            errors.append({"index": index, "errors": {"id": ["A valid integer is required."]}})
+        elif identifier in seen:
+            errors.append({"index": index, "errors": {"id": [f"Duplicate {key} {identifier} in payload."]}})
+        elif key in item['changes']:
+            errors.append({"index": index, "errors": {key: [f"{key} cannot be changed in a bulk update."]}})
+        else:
+            seen.add(identifier)
+            parsed.append((index, identifier, item['changes']))
+    return parsed
+
+
+def validate_feedback_changes(rows, partial=True):
+    """
+    Validate feedback changes with FeedbackSerializer, resolving changed
+    customers and products with one query per collection.
+
+    Returns:
+    - (list of (position, validated data), list of (position, errors)), like the batch validators
+    """
+    validated, failed = [], []
+    for position, row in enumerate(rows):
+        serializer = FeedbackSerializer(data=row, partial=partial)
+        if serializer.is_valid():
+            validated.append((position, dict(serializer.validated_data)))
+        else:
+            failed.append((position, serializer.errors))
+
+    customers = resolve_references(Customer, 'user_id', [data.get('user_id') for _, data in validated])
+    products = resolve_references(Product, 'item_id', [data.get('item_id') for _, data in validated])
+    resolved = []
+    for position, data in validated:
+        missing = {}
+        if 'user_id' in data:
+            data['customer'] = customers.get(data['user_id'])
+            if data['customer'] is None:
+                missing['customer_id'] = [f"Customer {data['user_id']} does not exist."]
+        if 'item_id' in data:
+            data['product'] = products.get(data['item_id'])
+            if data['product'] is None:
+                missing['product_id'] = [f"Product {data['item_id']} does not exist."]
+        if missing:
+            failed.append((position, missing))
+        else:
+            resolved.append((position, data))
+    return resolved, failed
+
+
+def update_document(model_class, changes):
+    """
+    Turn validated field values into a `$set` that also bumps the document version.
+    """
+    fields = model_class._fields
+    values = {fields[name].db_field: fields[name].to_mongo(value) for name, value in changes.items()}
+    values['updated_at'] = utc_now()
+    return {'$set': values, '$inc': {'version': 1}}
+
+
+def stored_errors(model_class, changes, stored):
+    """
+    Checks of a partial change against the stored document, like the
+    serializer's cross-field validation on a full one: a new waist must
+    still be below the stored hips and the other way round.
+    """
+    if model_class is not Customer or not {'waist', 'hips'} & set(changes):
+        return None
+    try:
+        waist = float(changes.get('waist', stored.get('waist')))
+        hips = float(changes.get('hips', stored.get('hips')))
+    except (TypeError, ValueError):
+        return {NON_FIELD_ERRORS: ["Invalid measurement format for waist or hips."]}
+    if waist >= hips:
+        return {NON_FIELD_ERRORS: ["Waist measurement must be less than hip measurement."]}
+    return None
+
+
+def update_items(request, model_class, key, validator):
+    """
+    Apply a different change to each document, see apply_items.
+
+    Args:
+    - request: Request whose body holds `items: [{"id": key, "changes": {...}}]`
+    - validator: Batch validator called with `partial=True`
+
+    Returns:
+    - (response, list of updated keys)
+    """
+    items = request.data.get('items')
+    if not isinstance(items, list) or not items:
+        return Response({"error": "'items' must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST), []
+
+    errors = []
+    matched_count, modified_count, updated = apply_items(model_class, key, validator, items,
+                                                         get_batch_size(request), errors)
+    return bulk_response({
+        "matched_count": matched_count,
+        "modified_count": modified_count,
+        "updated": updated
+    }, updated, errors, success=status.HTTP_200_OK), updated
+
+
+def apply_items(model_class, key, validator, items, batch_size, errors, start=0):
+    """
+    Apply a different change to each document as unordered `bulk_write` chunks.
+
+    Items are checked and validated together first (partial validation, so
+    only the given fields are required) and their keys are looked up with
+    one `$in` query, which also reads the STORED_FIELDS the changes are
+    checked against; what remains is sent as `UpdateOne` operations, one
+    round trip per `batch_size` chunk.
+
+    Returns:
+    - (matched count, modified count, list of updated keys)
+    """
+    parsed = parse_items(items, key, errors, start)
+    validated, failed = validator([changes for _, _, changes in parsed], partial=True)
+    for position, item_errors in failed:
+        errors.append({"index": parsed[position][0], "errors": item_errors})
+
+    existing = model_class.objects(**{f"{key}__in": [parsed[position][1] for position, _ in validated]})
+    stored = {document[key]: document
+              for document in existing.only(key, *STORED_FIELDS.get(model_class, ())).as_pymongo()}
+    pending = []
+    for position, changes in validated:
+        index, identifier, _ = parsed[position]
+        if identifier not in stored:
+            errors.append({"index": index, "errors": {"id": [f"{key} {identifier} does not exist."]}})
+            continue
+        item_errors = stored_errors(model_class, changes, stored[identifier])
+        if item_errors:
+            errors.append({"index": index, "errors": item_errors})
+        else:
+            pending.append((index, identifier, changes))
+
+    collection = model_class._get_collection()
+    matched_count, modified_count, updated = 0, 0, []
+    for batch in chunked(pending, batch_size):
+        operations = [UpdateOne({key: identifier}, update_document(model_class, changes))
+                      for _, identifier, changes in batch]
+        before, counted_before = {}, {}
+        if model_class is Product:
+            before = snapshot(key, [identifier for _, identifier, changes in batch if touches_facets(changes)])
+        elif model_class is Feedback:
+            counted_before = counted([identifier for _, identifier, changes in batch if touches_counters(changes)])
+        try:
+            result = collection.bulk_write(operations, ordered=False).bulk_api_result
+            failed_writes = {}
+        except BulkWriteError as e:
+            result = e.details
+            failed_writes = {error['index']: error['errmsg'] for error in result.get('writeErrors', [])}
+        matched_count += result['nMatched']
+        modified_count += result['nModified']
+        written = set()
+        for position, (index, identifier, _) in enumerate(batch):
+            if position in failed_writes:
+                errors.append({"index": index, "errors": [failed_writes[position]]})
+            else:
+                written.add(identifier)
+                updated.append(identifier)
+        if before:
+            record_updates(before, {identifier: changes for _, identifier, changes in batch
+                                    if identifier in before and identifier in written})
+        if counted_before:
+            count_updates(counted_before, {identifier: changes for _, identifier, changes in batch
+                                           if identifier in counted_before and identifier in written})
+
+    if updated:
+        bump_collection(model_class)
+    return matched_count, modified_count, updated
+
+
+def load_batches(model_class, key, batches, batch_size, seen=None):
+    """
+    Validate and insert batches of rows, writing each batch as soon as it is
+    validated while the pool validates the next ones (see validate_shards).
+
+    Duplicates are checked per batch; a key repeated in a later batch is
+    caught by the existence lookup since the earlier row has been written by
+    then, or by `seen` (see drop_duplicates) when it is given.
+
+    Args:
+    - batches: Iterable of (index of the first row, rows)
+    - batch_size: Rows per `insert_many` chunk
+
+    Returns:
+    - Iterator of (row count, list of written documents, list of row errors) per batch
+    """
+    for count, validated, errors in validate_shards(model_class, batches):
+        validated = drop_duplicates(model_class, key, validated, errors, seen)
+        yield count, insert_batches(model_class, validated, batch_size, errors), errors
+
+
+def load_rows(model_class, key, rows, batch_size, errors):
+    """
+    Validate and insert an in-memory payload, one VALIDATION_SHARD_SIZE shard at a time.
+
+    Returns:
+    - List of the documents that were written, in row order
+    """
+    inserted = []
+    for _, shard_inserted, shard_errors in load_batches(model_class, key, shards(list(rows)), batch_size, set()):
+        inserted.extend(shard_inserted)
+        errors.extend(shard_errors)
+    return inserted
+
+
+def load_stream(records, model_class, key, batch_size):
+    """
+    Validate and write a stream of records one VALIDATION_SHARD_SIZE shard at a time.
+
+    Only the shards in the pool and the one being written are kept in memory.
+
+    Args:
+    - records: Iterator of raw records, e.g. from streaming.iter_records
+    - batch_size: Rows per `insert_many` chunk
+
+    Returns:
+    - (inserted count, failed count, reported errors) with at most
+      BULK_MAX_REPORTED_ERRORS errors kept
+    """
+    inserted_count, failed_count = 0, 0
+    errors, parse_errors = [], []
+    batches = payload_batches(records, max(settings.VALIDATION_SHARD_SIZE, 1), parse_errors)
+    for _, inserted, batch_errors in load_batches(model_class, key, batches, batch_size):
+        inserted_count += len(inserted)
+        failed_count += len(batch_errors)
+        errors.extend(batch_errors[:max(settings.BULK_MAX_REPORTED_ERRORS - len(errors), 0)])
+
+    # A body that stopped parsing halfway, after its last complete record
+    failed_count += len(parse_errors)
+    errors.extend(parse_errors)
+    return inserted_count, failed_count, errors
+
+
+def stream_upload(request, target):
+    """
+    Run a streamed bulk upload and build its response.
+
+    Inserted keys are not echoed back since that list would grow with the payload.
+    """
+    model_class, key = UPLOADS[target]
+    inserted_count, failed_count, errors = load_stream(
+        iter_records(request), model_class, key, get_batch_size(request)
+    )
+    return bulk_response({
+        "inserted_count": inserted_count,
+        "failed_count": failed_count
+    }, inserted_count, errors)
+
+
+def bulk_response(body, inserted, errors, success=status.HTTP_201_CREATED):
+    """
+    Build the response for a bulk write; `inserted` may be the written rows or their count.
+
+    Returns `success` (201 by default) when every row was written, 207 when
+    only some were and 400 when nothing was written.
+    """
+    body["errors"] = sorted(errors, key=lambda error: error["index"])
+    if errors and not inserted:
+        return Response(body, status=status.HTTP_400_BAD_REQUEST)
+    if errors:
+        return Response(body, status=status.HTTP_207_MULTI_STATUS)
+    return Response(body, status=success)
+
+
+#############
+# Background jobs
+#############
+
+# Upload targets: model and natural key
+UPLOADS = {
+    'customers': (Customer, 'user_id'),
+    'products': (Product, 'item_id'),
+    'feedback': (Feedback, 'review_id'),
+}
+
+# Update targets: model, natural key, changes validator, per-key cache invalidation
+# and the detail cache namespace a filter update drops
+UPDATES = {
+    'customers': (Customer, 'user_id', validate_customers, invalidate_customers, 'customer'),
+    'products': (Product, 'item_id', validate_products, invalidate_products, 'product'),
+    'feedback': (Feedback, 'review_id', validate_feedback_changes, invalidate_feedbacks, 'feedback'),
+}
+
+
+def payload_batches(records, batch_size, errors):
+    """
+    Number the batches of a payload for storage; a stream that stops parsing
+    halfway is reported in `errors` after its last complete record.
+    """
+    read = 0
+
+    def guarded():
+        nonlocal read
+        try:
+            for record in records:
+                read += 1
+                yield record
+        except StreamParseError as e:
+            # The records read before it still make up a last, shorter batch
+            errors.append({"index": read, "errors": [str(e)]})
+
+    start = 0
+    for rows in chunked(guarded(), batch_size):
+        yield start, rows
+        start += len(rows)
+
+
+def enqueue_upload(request, target):
+    """
+    Queue a bulk upload (JSON list or streamed body) as a background job.
+    """
+    records = iter_records(request) if is_streaming_upload(request) else request.data
+    batch_size = get_batch_size(request)
+    errors = []
+    return enqueue(request, 'upload', target, {"batch_size": batch_size},
+                   payload_batches(records, batch_size, errors), errors)
+
+
+def enqueue_update(request, target, scan=False):
+    """
+    Queue a bulk update, in either filter or items mode, as a background job.
+
+    Args:
+    - scan: The filter has no index (allowed with ?allow_scan=1); the job pauses between chunks
+    """
+    batch_size = get_batch_size(request)
+    if 'items' in request.data:
+        items = request.data.get('items')
+        if not isinstance(items, list) or not items:
+            return Response({"error": "'items' must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        return enqueue(request, 'bulk_update', target, {"mode": "items", "batch_size": batch_size},
+                       payload_batches(items, batch_size, []))
+    return enqueue(request, 'bulk_update', target, {
+        "mode": "filter",
+        "filter": request.data.get('filter'),
+        "update": request.data.get('update'),
+        "batch_size": batch_size,
+        "scan": scan
+    })
+
+
+def run_upload_job(job, progress):
+    """
+    Validate and insert a queued upload batch by batch, committing after each one.
+
+    Every stored batch is one validation shard, so the pool validates the
+    next batches while one is inserted and committed. A batch interrupted
+    between its insert and its commit is replayed on resume; its rows that
+    were already written are then reported as existing.
+    """
+    model_class, key = UPLOADS[job.target]
+    batch_size = job.params.get('batch_size') or settings.BULK_BATCH_SIZE
+    sequences = deque()
+
+    def batches():
+        for sequence, start, rows in iter_batches(job, job.cursor or 0):
+            sequences.append(sequence)
+            yield start, rows
+
+    for count, inserted, errors in load_batches(model_class, key, batches(), batch_size):
+        progress.commit(sequences.popleft() + 1, processed=count, failed=len(errors), errors=errors,
+                        succeeded=len(inserted))
+
+
+def run_update_job(job, progress):
+    """
+    Run a queued bulk update.
+
+    Items mode applies the stored items batch by batch. Filter mode walks the
+    matching documents in `_id` order, updating one chunk with `update_many`
+    per commit, so a resumed job continues after the last updated `_id`. A
+    filter no index answers waits BULK_SCAN_PAUSE between chunks.
+    """
+    model_class, key, validator, invalidate, namespace = UPDATES[job.target]
+    batch_size = job.params.get('batch_size') or settings.BULK_BATCH_SIZE
+
+    if job.params.get('mode') == 'items':
+        for sequence, start, items in iter_batches(job, job.cursor or 0):
+            errors = []
+            _, modified_count, updated = apply_items(model_class, key, validator, items, batch_size, errors, start)
+            if updated:
+                invalidate(*updated)
+            progress.commit(sequence + 1, processed=len(items), failed=len(errors), errors=errors,
+                            succeeded=modified_count)
+        return
+
+    filter_data, update_data = job.params['filter'], job.params['update']
+    after = job.cursor
+    while True:
+        queryset = model_class.objects.filter(**filter_data).order_by('id')
+        if after is not None:
+            queryset = queryset.filter(id__gt=after)
+        ids = list(queryset.limit(batch_size).scalar('id'))
+        if not ids:
+            return
+        update = counted_update if model_class is Feedback else tracked_update
+        result = update(model_class.objects(id__in=ids).filter(**filter_data),
+                        inc__version=1, set__updated_at=utc_now(), **update_data)
+        detail_cache.invalidate_all(namespace)
+        bump_collection(model_class)
+        after = ids[-1]
+        progress.commit(after, processed=len(ids), succeeded=result.modified_count)
+        if job.params.get('scan'):
+            time.sleep(settings.BULK_SCAN_PAUSE)
+
+
+def run_delete_job(job, progress):
+    """
+    Run a queued bulk delete, one chunk of matching documents per commit,
+    pausing between chunks like run_update_job.
+
+    Customers and products are tombstoned chunk by chunk, then removed with
+    their feedback like a cascade delete.
+    """
+    if job.target in PARENTS:
+        tombstone_matching(job, progress)
+        return reap(job, progress)
+    batch_size = job.params.get('batch_size') or settings.BULK_BATCH_SIZE
+    while True:
+        batch = list(Feedback.objects.filter(**job.params['filter']).only('review_id', *COUNTED_FIELDS)
+                     .limit(batch_size).as_pymongo())
+        if not batch:
+            return
+        Feedback.objects(id__in=[document['_id'] for document in batch]).delete()
+        count_feedback(removed=batch)
+        invalidate_feedbacks(*[document['review_id'] for document in batch])
+        bump_collection(Feedback)
+        progress.commit(None, processed=len(batch), succeeded=len(batch))
+        if job.params.get('scan'):
+            time.sleep(settings.BULK_SCAN_PAUSE)
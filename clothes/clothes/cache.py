@@ -0,0 +1,331 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from pymongo import ReturnDocument
+from .metrics import cache_lookups
+from .models import CacheDrop, CollectionVersion, utc_now
+
+MISSING = object()
+
+# Prefix of the collection_versions counters holding shared namespace generations
+GENERATION_PREFIX = 'cache:'
+
+# How far back each read of the dropped keys reaches before the previous one
+DROP_OVERLAP = timedelta(seconds=5)
+
+
+class SharedGenerations:
+    """
+    Namespace generations and invalidated keys kept in Mongo, so an
+    invalidation by any process (another web worker, run_jobs, the reaper)
+    reaches every in-process cache.
+
+    Both are re-read, all at once, at most every `interval` seconds; an
+    invalidation by this process is seen here right away. Keys dropped by
+    other processes are collected until their cache takes them (see
+    LRUCache.get_generation).
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.origin = uuid.uuid4().hex
+        self._generations = {}
+        self._synced_at = None
+        self._drops_since = None
+        self._replayed = {}
+        self._dropped = []
+        self._lock = threading.Lock()
+
+    def get(self, namespace):
+        now = time.monotonic()
+        if self._synced_at is None or now - self._synced_at >= self.interval:
+            self._sync(now)
+        return self._generations.get(namespace, 0)
+
+    def _sync(self, now):
+        stored = CollectionVersion._get_collection().find(
+            {'_id': {'$regex': f'^{GENERATION_PREFIX}'}}, {'version': 1})
+        generations = {document['_id'][len(GENERATION_PREFIX):]: document['version'] for document in stored}
+
+        # Windows overlap, so a drop recorded just before the last read but
+        # written after it is still found; each one is replayed once
+        started_at = utc_now()
+        dropped, replayed = [], {}
+        if self._drops_since is not None:
+            drops = CacheDrop._get_collection().find(
+                {'created_at': {'$gte': self._drops_since - DROP_OVERLAP}, 'origin': {'$ne': self.origin}},
+                {'keys': 1, 'created_at': 1})
+            for drop in drops:
+                replayed[drop['_id']] = drop['created_at']
+                if drop['_id'] not in self._replayed:
+                    dropped += drop['keys']
+        with self._lock:
+            self._generations, self._synced_at = generations, now
+            self._drops_since, self._replayed = started_at, replayed
+            self._dropped += dropped
+
+    def bump(self, namespace):
+        document = CollectionVersion._get_collection().find_one_and_update(
+            {'_id': f'{GENERATION_PREFIX}{namespace}'},
+            {'$inc': {'version': 1}, '$set': {'updated_at': utc_now()}},
+            upsert=True, return_document=ReturnDocument.AFTER)
+        with self._lock:
+            self._generations[namespace] = document['version']
+
+    def drop(self, keys):
+        """
+        Tell the other processes to drop `keys`, with one insert.
+        """
+        CacheDrop._get_collection().insert_one({'origin': self.origin, 'keys': list(keys), 'created_at': utc_now()})
+
+    def take_dropped(self):
+        """
+        Keys other processes dropped since the last call.
+        """
+        with self._lock:
+            dropped, self._dropped = self._dropped, []
+        return dropped
+
+
+class LRUCache:
+    """
+    In-process cache evicting the least recently used entry, with a TTL per entry.
+
+    Entries are not shared, but their invalidations are (see SharedGenerations):
+    a key dropped here is dropped by every other process within
+    DETAIL_CACHE_SYNC_SECONDS, and a namespace moved to a new generation
+    leaves all of its entries behind.
+    """
+
+    def __init__(self, max_entries, ttl, generations):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generations = generations
+        self.replays = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_generation(self, namespace):
+        generation = self.generations.get(namespace)
+        dropped = self.generations.take_dropped()
+        if dropped:
+            with self._lock:
+                for key in dropped:
+                    self._entries.pop(key, None)
+                self.replays += 1
+        return generation
+
+    def bump_generation(self, namespace):
+        self.generations.bump(namespace)
+
+    def deleted(self, keys):
+        # Other processes may hold the deleted entries; drop theirs too
+        self.generations.drop(keys)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCacheBackend:
+    """
+    Adapter storing entries in a configured Django cache, shared across processes.
+    """
+
+    # Invalidations reach the shared cache itself, none are replayed
+    replays = 0
+
+    def __init__(self, alias, ttl):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def get(self, key, default=MISSING):
+        return self.cache.get(key, default)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def get_generation(self, namespace):
+        return self.cache.get(f"{namespace}:generation", 0)
+
+    def bump_generation(self, namespace):
+        # Generations never expire, otherwise dropped entries could come back
+        key = f"{namespace}:generation"
+        self.cache.add(key, 0, None)
+        self.cache.incr(key)
+
+    def deleted(self, keys):
+        # The entries were deleted from the shared cache itself
+        pass
+
+
+class _Flight:
+    """
+    A load in progress that concurrent misses on the same key wait for.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.stale = False
+
+
+class DetailCache:
+    """
+    Read-through cache for serialized detail payloads, keyed by natural key.
+
+    Concurrent misses on one key are coalesced so only the first request
+    queries Mongo; the others wait for its result. Writes drop the keys of
+    the documents they changed; each namespace also carries a generation
+    number so filter-mode bulk writes can drop all of its entries at once.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _key(self, namespace, identifier):
+        return f"{namespace}:{self.backend.get_generation(namespace)}:{identifier}"
+
+    def peek(self, namespace, identifier):
+        """
+        Return a cached payload without loading it, or None.
+        """
+        value = self.backend.get(self._key(namespace, identifier))
+        if value is MISSING:
+            # Callers fall back to get_or_load, which counts the miss
+            return None
+        with self._lock:
+            self.hits += 1
+        cache_lookups.labels('hit').inc()
+        return value
+
+    def get_or_load(self, namespace, identifier, loader):
+        """
+        Return the cached payload, calling `loader` once on a miss.
+
+        A loader returning None (not found) is not cached.
+        """
+        key = self._key(namespace, identifier)
+        value = self.backend.get(key)
+        if value is not MISSING:
+            with self._lock:
+                self.hits += 1
+            cache_lookups.labels('hit').inc()
+            return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        cache_lookups.labels('miss' if leader else 'coalesced').inc()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            # Keys dropped by other processes meanwhile may include this one
+            replays = self.backend.replays
+            flight.value = loader()
+            if flight.value is not None and not flight.stale and self.backend.replays == replays:
+                self.backend.set(key, flight.value)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def invalidate(self, namespace, *identifiers):
+        """
+        Drop the entries of specific documents, in every process; other
+        entries of the namespace stay cached.
+        """
+        if not identifiers:
+            return
+        keys = [self._key(namespace, identifier) for identifier in identifiers]
+        for key in keys:
+            with self._lock:
+                flight = self._flights.get(key)
+                if flight is not None:
+                    # The value being loaded may predate this write
+                    flight.stale = True
+            self.backend.delete(key)
+        self.backend.deleted(keys)
+
+    def invalidate_all(self, namespace):
+        """
+        Drop every entry of a namespace by moving it to a new generation.
+        """
+        self.backend.bump_generation(namespace)
+
+    def stats(self):
+        """
+        Hit/miss counters of this process.
+        """
+        with self._lock:
+            hits, misses, coalesced = self.hits, self.misses, self.coalesced
+        lookups = hits + misses + coalesced
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": hits,
+            "misses": misses,
+            "coalesced": coalesced,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+        }
+
+
+def build_backend():
+    """
+    Create the backend selected by DETAIL_CACHE_BACKEND ('lru' or 'django').
+    """
+    if settings.DETAIL_CACHE_BACKEND == 'django':
+        return DjangoCacheBackend(settings.DETAIL_CACHE_ALIAS, settings.DETAIL_CACHE_TTL)
+    return LRUCache(settings.DETAIL_CACHE_MAX_ENTRIES, settings.DETAIL_CACHE_TTL,
+                    SharedGenerations(settings.DETAIL_CACHE_SYNC_SECONDS))
+
+
+detail_cache = DetailCache(build_backend())
@@ -0,0 +1,174 @@
+from collections import Counter, defaultdict
+from itertools import islice
+from pymongo import UpdateOne
+from .cache import detail_cache
+from .models import Customer, Product, Feedback, utc_now
+from .serializers import FeedbackSerializer
+
+FITS = tuple(FeedbackSerializer().fields['fit'].choices)
+LENGTHS = tuple(FeedbackSerializer().fields['length'].choices)
+
+# Feedback fields the counters of its customer and product are built from
+COUNTED_FIELDS = ('user_id', 'item_id', 'fit', 'length')
+
+# Models carrying counters, the feedback key referring to them and their detail cache namespace
+PARENTS = ((Customer, 'user_id', 'customer'), (Product, 'item_id', 'product'))
+
+
+def field(document, name):
+    return document.get(name) if isinstance(document, dict) else getattr(document, name, None)
+
+
+def counter_paths(document):
+    """
+    Counters of `feedback_counts` one feedback adds to: its review, and its
+    fit and length when they are one of the choices.
+    """
+    paths = ['feedback_counts.reviews']
+    if field(document, 'fit') in FITS:
+        paths.append(f"feedback_counts.fit.{field(document, 'fit')}")
+    if field(document, 'length') in LENGTHS:
+        paths.append(f"feedback_counts.length.{field(document, 'length')}")
+    return paths
+
+
+def count_feedback(added=(), removed=()):
+    """
+    Add feedback that was written (or remove feedback that was deleted) to
+    the counters of its customer and product, with one unordered `$inc` per
+    changed parent.
+
+    An update is a removal of the old values plus an addition of the new
+    ones; counters it leaves alone cancel out and are not written. A counter
+    change is a change of the parent, so its version moves too.
+    """
+    deltas = {model_class: defaultdict(Counter) for model_class, _, _ in PARENTS}
+    for documents, sign in ((added, 1), (removed, -1)):
+        for document in documents:
+            for model_class, key, _ in PARENTS:
+                if field(document, key) is None:
+                    continue
+                for path in counter_paths(document):
+                    deltas[model_class][field(document, key)][path] += sign
+
+    now = utc_now()
+    for model_class, key, namespace in PARENTS:
+        changed = {identifier: {path: delta for path, delta in counts.items() if delta}
+                   for identifier, counts in deltas[model_class].items()}
+        changed = {identifier: counts for identifier, counts in changed.items() if counts}
+        if not changed:
+            continue
+        model_class._get_collection().bulk_write([
+            UpdateOne({key: identifier}, {"$inc": {**counts, "version": 1}, "$set": {"updated_at": now}})
+            for identifier, counts in changed.items()
+        ], ordered=False)
+        detail_cache.invalidate(namespace, *changed)
+
+
+def touches_counters(changes):
+    """
+    Whether validated changes or MongoEngine update kwargs (e.g. `set__fit`)
+    may move feedback between counters.
+    """
+    return any(set(name.split('__')) & set(COUNTED_FIELDS) for name in changes)
+
+
+def counted(review_ids):
+    """
+    Counted fields of the feedback about to be updated, by review_id.
+    """
+    if not review_ids:
+        return {}
+    documents = Feedback.objects(review_id__in=list(review_ids)).only('review_id', *COUNTED_FIELDS).as_pymongo()
+    return {document['review_id']: document for document in documents}
+
+
+def count_updates(before, changes):
+    """
+    Move updated feedback between counters.
+
+    Args:
+    - before: counted() taken before the update
+    - changes: Dict mapping the review_ids that were updated to their validated changes
+    """
+    removed = [document for review_id, document in before.items() if review_id in changes]
+    added = [{**document, **{name: value for name, value in changes[review_id].items() if name in COUNTED_FIELDS}}
+             for review_id, document in before.items() if review_id in changes]
+    count_feedback(added, removed)
+
+
+def counted_update(queryset, **update):
+    """
+    Run `queryset.update(full_result=True, **update)` on feedback and move
+    the matched feedback between counters when the update may change them.
+
+    Like facets.tracked_update, the feedback is read before and after the
+    update, so a write from elsewhere in between can leave a counter off
+    until the next reconcile.
+    """
+    if not touches_counters(update):
+        return queryset.update(full_result=True, **update)
+    before = list(queryset.clone().only(*COUNTED_FIELDS).as_pymongo())
+    result = queryset.update(full_result=True, **update)
+    after = Feedback.objects(id__in=[document['_id'] for document in before]).only(*COUNTED_FIELDS).as_pymongo()
+    count_feedback(list(after), before)
+    return result
+
+
+def counts_body(counts):
+    """
+    Render stored counters with every fit and length choice (0 when absent).
+    """
+    counts = counts or {}
+    return {
+        "reviews": counts.get('reviews', 0),
+        "fit": {fit: counts.get('fit', {}).get(fit, 0) for fit in FITS},
+        "length": {length: counts.get('length', {}).get(length, 0) for length in LENGTHS},
+    }
+
+
+def reconcile(model_class, key, namespace, batch_size=1000):
+    """
+    Recount the feedback of every customer or product and rewrite the
+    counters that drifted.
+
+    Parents are read a batch at a time, then their feedback is counted with
+    one aggregation on the indexed key. A counter is only rewritten if it
+    still holds the value read first, so one changed meanwhile is left for
+    the next run instead of overwritten.
+
+    Returns:
+    - Number of parents repaired
+    """
+    collection = model_class._get_collection()
+    repaired = 0
+    stored = collection.find({}, {key: 1, 'feedback_counts': 1}).sort('_id', 1).batch_size(batch_size)
+    while True:
+        batch = list(islice(stored, batch_size))
+        if not batch:
+            return repaired
+        expected = defaultdict(dict)
+        pipeline = [
+            {"$match": {key: {"$in": [document[key] for document in batch]}}},
+            {"$group": {"_id": {"key": f"${key}", "fit": "$fit", "length": "$length"}, "count": {"$sum": 1}}},
+        ]
+        for group in Feedback._get_collection().aggregate(pipeline):
+            counts = expected[group['_id']['key']]
+            counts['reviews'] = counts.get('reviews', 0) + group['count']
+            for name in ('fit', 'length'):
+                value = group['_id'].get(name)
+                values = counts.setdefault(name, {})
+                values[value] = values.get(value, 0) + group['count']
+
+        now = utc_now()
+        operations, identifiers = [], []
+        for document in batch:
+            counts = counts_body(expected.get(document[key]))
+            if counts_body(document.get('feedback_counts')) != counts:
+                operations.append(UpdateOne(
+                    {"_id": document['_id'], "feedback_counts": document.get('feedback_counts')},
+                    {"$set": {"feedback_counts": counts, "updated_at": now}, "$inc": {"version": 1}}))
+                identifiers.append(document[key])
+        if operations:
+            repaired += collection.bulk_write(operations, ordered=False).modified_count
+            detail_cache.invalidate(namespace, *identifiers)
@@ -10,3 +10,69 @@ MONGO_DB_HOST = os.getenv('MONGO_DB_HOST', 'localhost')
 MONGO_DB_PORT = int(os.getenv('MONGO_DB_PORT', 27017))
 MONGO_DB_USERNAME = os.getenv('MONGO_DB_USERNAME', 'root')
 MONGO_DB_PASSWORD = os.getenv('MONGO_DB_PASSWORD', '1234')  
+
+# Bulk upload settings
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', 1000))
+BULK_MAX_REPORTED_ERRORS = int(os.getenv('BULK_MAX_REPORTED_ERRORS', 1000))
+
+# List pagination settings
+LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', 100))
+LIST_MAX_PAGE_SIZE = int(os.getenv('LIST_MAX_PAGE_SIZE', 1000))
+
+# Detail cache settings ('lru' keeps entries in-process, 'django' uses DETAIL_CACHE_ALIAS)
+DETAIL_CACHE_BACKEND = os.getenv('DETAIL_CACHE_BACKEND', 'lru')
+DETAIL_CACHE_ALIAS = os.getenv('DETAIL_CACHE_ALIAS', 'default')
+DETAIL_CACHE_MAX_ENTRIES = int(os.getenv('DETAIL_CACHE_MAX_ENTRIES', 10000))
+DETAIL_CACHE_TTL = int(os.getenv('DETAIL_CACHE_TTL', 300))
+# Seconds an 'lru' cache may go without re-reading the shared generations and dropped keys, i.e. how long
+# a write by another process (web worker, run_jobs, reaper) can take to reach it
+DETAIL_CACHE_SYNC_SECONDS = float(os.getenv('DETAIL_CACHE_SYNC_SECONDS', 1))
+
+# Serve the read endpoints from the async views (requires an ASGI server)
+ASYNC_READS = os.getenv('ASYNC_READS', 'false').lower() in ('1', 'true', 'yes')
+
+# Connection pool settings of the shared Mongo client (0 / empty leaves the driver default)
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 300000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 10000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 0))
+# Comma separated, in order of preference, e.g. 'zstd,snappy,zlib'
+MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', '')
+
+# Parents per step of the background cascade delete, and feedback per delete_many
+REAPER_CHUNK_SIZE = int(os.getenv('REAPER_CHUNK_SIZE', 1000))
+
+# Background jobs: worker threads per process, lease length, stale job sweep interval,
+# and the payload size (rows) above which bulk requests are queued (0 = only on request)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 60))
+JOB_SWEEP_SECONDS = int(os.getenv('JOB_SWEEP_SECONDS', 30))
+BULK_ASYNC_ROWS = int(os.getenv('BULK_ASYNC_ROWS', 10000))
+
+# Parallel validation of bulk payloads: worker processes (1 disables the pool)
+# and rows per shard of request and streamed bodies (a job's stored batches
+# are its shards); payloads of a single shard are validated in-process
+VALIDATION_WORKERS = int(os.getenv('VALIDATION_WORKERS', os.cpu_count() or 1))
+VALIDATION_SHARD_SIZE = int(os.getenv('VALIDATION_SHARD_SIZE', 5000))
+
+# Per-request query budgets; requests over any of them are logged (0 disables a budget)
+QUERY_BUDGET_COMMANDS = int(os.getenv('QUERY_BUDGET_COMMANDS', 20))
+QUERY_BUDGET_DB_MS = float(os.getenv('QUERY_BUDGET_DB_MS', 200))
+QUERY_BUDGET_DOCUMENTS = int(os.getenv('QUERY_BUDGET_DOCUMENTS', 10000))
+
+# Directory shared by all worker processes for Prometheus metrics (empty = single process);
+# it must be set in the environment before start-up and emptied on every deploy
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR', '')
+
+# Fit prediction: reviewers compared by default and at most (the `k` query param)
+FIT_NEIGHBOURS = int(os.getenv('FIT_NEIGHBOURS', 25))
+FIT_MAX_NEIGHBOURS = int(os.getenv('FIT_MAX_NEIGHBOURS', 200))
+
+# Rows per cursor batch (and per streamed chunk) of the /export/ endpoints
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 2000))
+
+# Seconds a bulk job run with ?allow_scan=1 waits between chunks, so its scan yields to other writes
+BULK_SCAN_PAUSE = float(os.getenv('BULK_SCAN_PAUSE', 0.1))
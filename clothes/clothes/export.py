@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, time, timezone
+from itertools import islice
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from .models import Customer, Product, Feedback
+from .projection import get_fields, db_fields, render_rows
+from .serializers import CustomerSerializer, ProductSerializer, FeedbackSerializer
+from .streaming import NDJSON_MEDIA_TYPE
+
+# Exported collections: model, serializer, natural key (the export order) and
+# the query params filtering on a stored field: param -> (field, type)
+EXPORTS = {
+    'customers': (Customer, CustomerSerializer, 'user_id', {'cup_size': ('cup_size', str)}),
+    'products': (Product, ProductSerializer, 'item_id', {
+        'keyword': ('keywords', str),
+        'cloth_size_category': ('cloth_size_category', str),
+    }),
+    'feedbacks': (Feedback, FeedbackSerializer, 'review_id', {
+        'customer_id': ('user_id', int),
+        'product_id': ('item_id', int),
+        'fit': ('fit', str),
+        'length': ('length', str),
+    }),
+}
+
+FORMATS = {'ndjson': NDJSON_MEDIA_TYPE, 'csv': 'text/csv'}
+
+# Same compact output as the API's JSON responses
+JSON_OPTIONS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def parse_since(value):
+    """
+    Parse `updated_since` as an ISO datetime or date; naive values are UTC.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.combine(day, time.min)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def export_query(model_class, key, filters, params):
+    """
+    Build the raw filter of an export from its query params.
+
+    Query params:
+    - updated_since: Only documents written at or after this ISO date/datetime
+    - after: Resume after this natural key, e.g. the last one of a broken
+      transfer; exports ordered by natural key only, not with updated_since
+    - The collection's filters (see EXPORTS), matched exactly
+    """
+    query = {'deleted_at': None} if 'deleted_at' in model_class._fields else {}
+    try:
+        if params.get('updated_since'):
+            query['updated_at'] = {'$gte': parse_since(params['updated_since'])}
+    except ValueError:
+        raise ValidationError({"updated_since": "Use an ISO 8601 date or datetime."})
+    if params.get('after') and params.get('updated_since'):
+        raise ValidationError({"after": "Resume an updated_since export with a later updated_since instead."})
+    try:
+        if params.get('after'):
+            query[key] = {'$gt': int(params['after'])}
+    except ValueError:
+        raise ValidationError({"after": "Must be an integer."})
+    for param, (field, cast) in filters.items():
+        if params.get(param):
+            try:
+                query[field] = cast(params[param])
+            except ValueError:
+                raise ValidationError({param: "Must be an integer."})
+    return query
+
+
+def batches(cursor, size):
+    while True:
+        batch = list(islice(cursor, size))
+        if not batch:
+            return
+        yield batch
+
+
+def ndjson_chunks(model_class, cursor, fields):
+    for batch in batches(cursor, settings.EXPORT_BATCH_SIZE):
+        yield ''.join(json.dumps(row, **JSON_OPTIONS) + '\n' for row in render_rows(model_class, batch, fields))
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ';'.join(str(item) for item in value)
+    return value
+
+
+def csv_chunks(model_class, cursor, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for batch in batches(cursor, settings.EXPORT_BATCH_SIZE):
+        writer.writerows([csv_value(row[field]) for field in fields] for row in render_rows(model_class, batch, fields))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """
+    Compress text chunks into one gzip stream as they are produced.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_sort(key, params):
+    """
+    Natural key order, or with `updated_since` the order of the
+    (updated_at, key) index, which then answers the range without a sort.
+    """
+    if params.get('updated_since'):
+        return [('updated_at', 1), (key, 1)]
+    return [(key, 1)]
+
+
+def export_response(collection, params):
+    """
+    Stream the live documents of a collection as NDJSON (default) or CSV,
+    ordered by natural key, or by write time then natural key with
+    `updated_since` (see export_sort).
+
+    Documents are read with a raw pymongo cursor, projected in the database
+    and fetched EXPORT_BATCH_SIZE at a time; each batch is rendered and sent
+    before the next is read, so neither the result nor the body is ever
+    held in full. `?gzip=1` compresses the stream (Content-Encoding: gzip).
+
+    Returns:
+    - StreamingHttpResponse
+    """
+    model_class, serializer_class, key, filters = EXPORTS[collection]
+    export_format = params.get('format') or 'ndjson'
+    if export_format not in FORMATS:
+        raise ValidationError({"format": f"Choose one of {', '.join(FORMATS)}."})
+    fields = get_fields(params, serializer_class) or list(serializer_class().fields)
+    query = export_query(model_class, key, filters, params)
+
+    projection = {'_id': 0, **dict.fromkeys(db_fields(model_class, fields), 1)}
+    cursor = model_class._get_collection().find(query, projection, sort=export_sort(key, params),
+                                                batch_size=settings.EXPORT_BATCH_SIZE)
+    chunks = (csv_chunks if export_format == 'csv' else ndjson_chunks)(model_class, cursor, fields)
+    compress = params.get('gzip') in ('1', 'true')
+    if compress:
+        chunks = gzip_chunks(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{collection}.{export_format}"'
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    return response
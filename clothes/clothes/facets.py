@@ -0,0 +1,162 @@
+from collections import Counter
+from pymongo import UpdateOne
+from .batch_validation import CLOTH_SIZE_CATEGORIES, VALID_CATEGORIES
+from .models import Product, ProductFacet
+
+# Product fields the facet counts are built from
+FACET_FIELDS = ('keywords', 'cloth_size_category')
+
+
+def field(document, name):
+    return document.get(name) if isinstance(document, dict) else getattr(document, name, None)
+
+
+def facet_keys(document):
+    """
+    Facets one product counts towards: each distinct keyword, its size
+    category and every keyword/size pair.
+
+    Returns:
+    - List of (facet key, keyword, size category)
+    """
+    keywords = set(field(document, 'keywords') or ())
+    size = field(document, 'cloth_size_category')
+    keys = [(f"keyword:{keyword}", keyword, None) for keyword in keywords]
+    if size:
+        keys.append((f"size:{size}", None, size))
+        keys += [(f"keyword:{keyword}|size:{size}", keyword, size) for keyword in keywords]
+    return keys
+
+
+def record(added=(), removed=()):
+    """
+    Count products that became live (created) or stopped being so (deleted)
+    with one unordered `$inc` per changed facet.
+
+    An update is a removal of the old values plus an addition of the new
+    ones; facets it leaves alone cancel out and are not written.
+    """
+    deltas, labels = Counter(), {}
+    for documents, sign in ((added, 1), (removed, -1)):
+        for document in documents:
+            for key, keyword, size in facet_keys(document):
+                deltas[key] += sign
+                labels[key] = (keyword, size)
+    operations = [
+        UpdateOne({"_id": key},
+                  {"$inc": {"count": delta},
+                   "$setOnInsert": {"keyword": labels[key][0], "cloth_size_category": labels[key][1]}},
+                  upsert=True)
+        for key, delta in deltas.items() if delta
+    ]
+    if operations:
+        ProductFacet._get_collection().bulk_write(operations, ordered=False)
+
+
+def touches_facets(changes):
+    """
+    Whether validated changes or MongoEngine update kwargs (e.g. `push__keywords`)
+    may move a product between facets.
+    """
+    return any(set(name.split('__')) & set(FACET_FIELDS) for name in changes)
+
+
+def snapshot(key, identifiers):
+    """
+    Facet fields of the products about to be updated, by natural key.
+    """
+    if not identifiers:
+        return {}
+    documents = Product.objects(**{f"{key}__in": list(identifiers)}).only(key, *FACET_FIELDS).as_pymongo()
+    return {document[key]: document for document in documents}
+
+
+def record_updates(before, changes):
+    """
+    Move updated products between facets.
+
+    Args:
+    - before: snapshot() taken before the update
+    - changes: Dict mapping the natural keys that were updated to their validated changes
+    """
+    removed = [document for identifier, document in before.items() if identifier in changes]
+    added = [{**document, **changes[identifier]} for identifier, document in before.items() if identifier in changes]
+    record(added, removed)
+
+
+def tracked_update(queryset, **update):
+    """
+    Run `queryset.update(full_result=True, **update)` on products and move the
+    matched ones between facets when the update may change them.
+
+    The matched products are read before and after the update, so a write
+    from elsewhere in between can leave a count off until the next rebuild.
+    """
+    if queryset._document is not Product or not touches_facets(update):
+        return queryset.update(full_result=True, **update)
+    before = list(queryset.clone().only(*FACET_FIELDS).as_pymongo())
+    result = queryset.update(full_result=True, **update)
+    after = Product.objects(id__in=[document['_id'] for document in before]).only(*FACET_FIELDS).as_pymongo()
+    record(list(after), before)
+    return result
+
+
+def rebuild():
+    """
+    Recompute every facet count from the live products with one aggregation
+    and swap the result in with a rename, so readers never see a partial set.
+
+    Returns:
+    - Number of facets written
+    """
+    pipeline = [
+        {"$match": {"deleted_at": None}},
+        {"$project": {"_id": 0, "size": "$cloth_size_category",
+                      "keywords": {"$setUnion": [{"$ifNull": ["$keywords", []]}, []]}}},
+        {"$facet": {
+            "sizes": [{"$group": {"_id": "$size", "count": {"$sum": 1}}}],
+            "keywords": [{"$unwind": "$keywords"}, {"$group": {"_id": "$keywords", "count": {"$sum": 1}}}],
+            "pairs": [{"$unwind": "$keywords"},
+                      {"$group": {"_id": {"keyword": "$keywords", "size": "$size"}, "count": {"$sum": 1}}}],
+        }},
+    ]
+    result = next(Product._get_collection().aggregate(pipeline))
+    documents = [{"_id": f"size:{group['_id']}", "keyword": None, "cloth_size_category": group['_id'],
+                  "count": group['count']} for group in result['sizes'] if group['_id']]
+    documents += [{"_id": f"keyword:{group['_id']}", "keyword": group['_id'], "cloth_size_category": None,
+                   "count": group['count']} for group in result['keywords']]
+    documents += [{"_id": f"keyword:{group['_id']['keyword']}|size:{group['_id']['size']}",
+                   "keyword": group['_id']['keyword'], "cloth_size_category": group['_id']['size'],
+                   "count": group['count']} for group in result['pairs'] if group['_id'].get('size')]
+
+    collection = ProductFacet._get_collection()
+    staging = collection.database[f"{collection.name}_rebuild"]
+    staging.drop()
+    if documents:
+        staging.insert_many(documents)
+        staging.rename(collection.name, dropTarget=True)
+    else:
+        collection.delete_many({})
+    return len(documents)
+
+
+def facet_body(documents):
+    """
+    Render facet documents: every category and size (0 when no product has
+    it), their combinations and the number of live products.
+    """
+    keywords = dict.fromkeys(sorted(VALID_CATEGORIES), 0)
+    sizes = dict.fromkeys(CLOTH_SIZE_CATEGORIES, 0)
+    pairs = {}
+    for document in documents:
+        keyword, size, count = document.get('keyword'), document.get('cloth_size_category'), document.get('count', 0)
+        if count <= 0:
+            continue
+        if keyword and size:
+            pairs.setdefault(keyword, {})[size] = count
+        elif keyword:
+            keywords[keyword] = count
+        elif size:
+            sizes[size] = count
+    return {"total": sum(sizes.values()), "keywords": keywords, "cloth_size_categories": sizes,
+            "keyword_sizes": pairs}
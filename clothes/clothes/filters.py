@@ -0,0 +1,173 @@
+from mongoengine.errors import InvalidQueryError, LookUpError, ValidationError as DocumentValidationError
+from pymongo.errors import OperationFailure
+from rest_framework import status
+from rest_framework.response import Response
+from .models import Customer, Product, Feedback
+
+# Fields a bulk `filter` may select on, per model
+FIELDS = {
+    Customer: ('user_id', 'user_name', 'waist', 'hips', 'bust', 'bra_size', 'height', 'cup_size', 'updated_at'),
+    Product: ('item_id', 'product_name', 'size', 'quality', 'keywords', 'cloth_size_category',
+              'last_update_date', 'updated_at'),
+    Feedback: ('review_id', 'user_id', 'item_id', 'fit', 'length', 'updated_at'),
+}
+
+# MongoEngine operators a bulk `filter` may use ('' is equality), and those an index can answer
+OPERATORS = ('', 'ne', 'lt', 'lte', 'gt', 'gte', 'in', 'nin', 'all', 'exists')
+INDEX_OPERATORS = ('', 'lt', 'lte', 'gt', 'gte', 'in', 'all')
+
+# Keys of an explain plan stage holding the stages it reads from
+PLAN_CHILDREN = ('inputStage', 'inputStages', 'queryPlan', 'shards', 'winningPlan')
+
+
+def declared_indexes(model_class):
+    """
+    Name -> leading field of the indexes in a model's meta['indexes'] (and `_id`).
+
+    Text indexes are left out; they only answer $text searches.
+    """
+    indexes = {'_id_': '_id'}
+    for spec in model_class._meta['index_specs']:
+        if any(direction not in (1, -1) for _, direction in spec['fields']):
+            continue
+        name = spec.get('name') or '_'.join(f"{field}_{direction}" for field, direction in spec['fields'])
+        indexes[name] = spec['fields'][0][0]
+    return indexes
+
+
+def compile_filter(model_class, filter_data):
+    """
+    Check a bulk `filter` against the whitelist and build its queryset.
+
+    Args:
+    - filter_data: MongoEngine lookups, e.g. {"waist__gte": 28, "cup_size": "B"}
+
+    Returns:
+    - (queryset, errors): errors maps each rejected lookup to the reason, or is empty
+    """
+    if not isinstance(filter_data, dict) or not filter_data:
+        return None, {"filter": "Must be a non-empty object of field lookups."}
+    errors = {}
+    for name in filter_data:
+        field, _, operator = name.partition('__')
+        if field not in FIELDS[model_class]:
+            errors[name] = f"Filter on one of {', '.join(FIELDS[model_class])}."
+        elif operator not in OPERATORS:
+            errors[name] = f"Use no operator or one of {', '.join(OPERATORS[1:])}."
+    if errors:
+        return None, errors
+    try:
+        queryset = model_class.objects.filter(**filter_data)
+        # Building the raw query casts every value, so bad ones are caught here
+        queryset._query
+    except (InvalidQueryError, LookUpError, DocumentValidationError, TypeError, ValueError) as e:
+        return None, {"filter": str(e)}
+    return queryset, {}
+
+
+def plan_stages(stage):
+    """
+    Yield every stage of an explain plan, however it's nested (classic, slot
+    based or sharded).
+    """
+    if isinstance(stage, list):
+        for child in stage:
+            yield from plan_stages(child)
+        return
+    if not isinstance(stage, dict):
+        return
+    if 'stage' in stage:
+        yield stage
+    for key in PLAN_CHILDREN:
+        if key in stage:
+            yield from plan_stages(stage[key])
+
+
+def query_plan(queryset, filter_data):
+    """
+    Plan of a bulk filter: the planner's winning plan when the server explains
+    it (queryPlanner verbosity, nothing is executed), else the declared index
+    the filter's lookups can lead with.
+
+    A plan is indexed when it reads through an index of meta['indexes'] and
+    has no COLLSCAN stage.
+
+    Returns:
+    - Dict with the query, stages, indexes used and whether it is `indexed`
+    """
+    model_class = queryset._document
+    query = queryset._query
+    declared = declared_indexes(model_class)
+    collection = model_class._get_collection()
+    try:
+        explained = collection.database.command(
+            {'explain': {'find': collection.name, 'filter': query}, 'verbosity': 'queryPlanner'})
+        stages = list(plan_stages(explained['queryPlanner']['winningPlan']))
+        source = 'explain'
+    except OperationFailure:
+        # e.g. a user without the explain privilege: fall back to the index declarations
+        leading = {model_class._fields[name.partition('__')[0]].db_field for name in filter_data
+                   if name.partition('__')[2] in INDEX_OPERATORS}
+        stages = [{'stage': 'IXSCAN', 'indexName': name} for name, field in declared.items() if field in leading][:1]
+        stages = stages or [{'stage': 'COLLSCAN'}]
+        source = 'declared_indexes'
+
+    indexes = [stage['indexName'] for stage in stages if 'indexName' in stage]
+    names = [stage['stage'] for stage in stages]
+    return {
+        "query": query,
+        "source": source,
+        "stages": names,
+        "indexes": indexes,
+        "indexed": 'COLLSCAN' not in names and any(index in declared for index in indexes),
+    }
+
+
+def allows_scan(request):
+    return request.query_params.get('allow_scan') in ('1', 'true')
+
+
+def explain_body(queryset, plan):
+    """
+    `?explain=1` dry run of a bulk filter: its plan and how many documents it
+    would match. Matches are only counted for an indexed plan, since counting
+    them would otherwise cost the very scan being checked for; a scan reports
+    the size of the collection instead.
+    """
+    collection = queryset._document._get_collection()
+    return {
+        "plan": plan,
+        "allowed": plan["indexed"],
+        "estimated_count": collection.count_documents(plan["query"]) if plan["indexed"] else None,
+        "collection_count": collection.estimated_document_count(),
+    }
+
+
+def guard_filter(request, model_class):
+    """
+    Compile the `filter` of a bulk update or delete and check its plan before
+    anything is written.
+
+    A filter that no declared index can answer would scan the whole
+    collection inside the write; it is refused unless `?allow_scan=1` is
+    given, and callers then run it as a throttled background job where they
+    have one. `?explain=1` returns the plan and estimated matches instead of
+    writing.
+
+    Returns:
+    - (response, queryset, scans): response is the dry run or refusal to return
+      as is, or None when the filter may run; scans tells it runs without an index
+    """
+    queryset, errors = compile_filter(model_class, request.data.get('filter'))
+    if errors:
+        return Response({"error": "Unsupported filter", "fields": errors}, status=status.HTTP_400_BAD_REQUEST), None, False
+    plan = query_plan(queryset, request.data['filter'])
+    if request.query_params.get('explain') in ('1', 'true'):
+        return Response(explain_body(queryset, plan)), queryset, not plan["indexed"]
+    if not plan["indexed"] and not allows_scan(request):
+        return Response({
+            "error": "No index answers this filter, so it would scan the whole collection. Filter on an "
+                     "indexed field, or add ?allow_scan=1 to run it anyway as a throttled job.",
+            "plan": plan,
+        }, status=status.HTTP_400_BAD_REQUEST), queryset, True
+    return None, queryset, not plan["indexed"]
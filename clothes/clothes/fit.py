@@ -0,0 +1,189 @@
+import threading
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from .batch_validation import height_inches
+from .models import Customer
+from .serializers import FeedbackSerializer
+from .versioning import collection_state
+
+FITS = tuple(FeedbackSerializer().fields['fit'].choices)
+LENGTHS = tuple(FeedbackSerializer().fields['length'].choices)
+MEASUREMENTS = ('waist', 'hips', 'bust', 'bra_size', 'height')
+
+# Re-read writes this close to the last one seen, in case app server clocks differ a little
+CLOCK_SKEW = timedelta(seconds=5)
+
+
+def measurement_vector(document):
+    """
+    Waist, hips, bust, bra band and height of a customer, all in inches.
+
+    Returns:
+    - Tuple of floats, or None when a measurement can't be read
+    """
+    try:
+        # Customers not converted by migrate_measurements yet still hold strings
+        return (float(document['waist']), float(document['hips']), float(document['bust']),
+                float(document['bra_size']), float(height_inches(document['height'])))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class CustomerIndex:
+    """
+    In-memory matrix of customer measurements, one row per live customer.
+
+    It is loaded on first use and then kept current incrementally: when the
+    customers collection version moved, only customers written since the
+    last refresh are read (by the indexed updated_at), so writes from every
+    process are picked up. Tombstoned customers are dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.keys = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, len(MEASUREMENTS)), dtype=np.float32)
+        self.rows = {}
+        self.scale = np.ones(len(MEASUREMENTS), dtype=np.float32)
+        self.version = None
+        self.watermark = None
+
+    def refresh(self):
+        version = collection_state(Customer)["version"]
+        if version == self.version:
+            return
+        with self._lock:
+            if version == self.version:
+                return
+            queryset = Customer.all_objects
+            if self.watermark is not None:
+                queryset = queryset(updated_at__gte=self.watermark - CLOCK_SKEW)
+            documents = queryset.only('user_id', 'updated_at', 'deleted_at', *MEASUREMENTS).as_pymongo()
+            live, removed = [], []
+            for document in documents:
+                vector = None if document.get('deleted_at') else measurement_vector(document)
+                if vector is None:
+                    removed.append(document['user_id'])
+                else:
+                    live.append((document['user_id'], vector))
+                if self.watermark is None or document['updated_at'] > self.watermark:
+                    self.watermark = document['updated_at']
+            self._remove(removed)
+            self._upsert(live)
+            if len(self.matrix):
+                self.scale = np.maximum(self.matrix.std(axis=0), 1e-3)
+            self.version = version
+
+    def _upsert(self, entries):
+        new_keys, new_vectors = [], []
+        for user_id, vector in entries:
+            row = self.rows.get(user_id)
+            if row is None:
+                self.rows[user_id] = len(self.keys) + len(new_keys)
+                new_keys.append(user_id)
+                new_vectors.append(vector)
+            else:
+                self.matrix[row] = vector
+        if new_keys:
+            self.keys = np.concatenate([self.keys, np.array(new_keys, dtype=np.int64)])
+            self.matrix = np.concatenate([self.matrix, np.array(new_vectors, dtype=np.float32)])
+
+    def _remove(self, user_ids):
+        rows = sorted((self.rows.pop(user_id) for user_id in user_ids if user_id in self.rows), reverse=True)
+        if not rows:
+            return
+        keep = np.ones(len(self.keys), dtype=bool)
+        keep[rows] = False
+        self.keys, self.matrix = self.keys[keep], self.matrix[keep]
+        self.rows = {int(user_id): row for row, user_id in enumerate(self.keys)}
+
+    def nearest(self, user_id, candidates, k):
+        """
+        The k candidates closest to a customer, by standardized Euclidean distance.
+
+        Args:
+        - candidates: user_ids to choose from; those not in the index are ignored
+
+        Returns:
+        - List of (user_id, distance) sorted by distance, or None when the customer isn't indexed
+        """
+        self.refresh()
+        with self._lock:
+            row = self.rows.get(user_id)
+            if row is None:
+                return None
+            rows = np.array([self.rows[candidate] for candidate in candidates
+                             if candidate in self.rows and candidate != user_id], dtype=np.int64)
+            if not len(rows):
+                return []
+            distances = np.linalg.norm((self.matrix[rows] - self.matrix[row]) / self.scale, axis=1)
+            keys = self.keys[rows]
+        nearest = np.argpartition(distances, k - 1)[:k] if len(rows) > k else np.arange(len(rows))
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(int(keys[position]), float(distances[position])) for position in nearest]
+
+
+customer_index = CustomerIndex()
+
+
+def get_neighbours(params):
+    """
+    Resolve the number of neighbours from the `k` query param, capped at FIT_MAX_NEIGHBOURS.
+    """
+    try:
+        k = int(params.get('k', settings.FIT_NEIGHBOURS))
+    except (TypeError, ValueError):
+        raise ValidationError({"k": "k must be an integer."})
+    if k < 1:
+        raise ValidationError({"k": "k must be positive."})
+    return min(k, settings.FIT_MAX_NEIGHBOURS)
+
+
+def predict_fit(item_id, user_id, reviews, k):
+    """
+    Aggregate the product's fit and length feedback of the k reviewers
+    measuring most like the customer.
+
+    Each neighbour's reviews weigh 1 / (1 + distance), so closer customers
+    count more towards the prediction; the counts are unweighted.
+
+    Args:
+    - reviews: Raw feedback documents of the product with user_id, fit and length
+
+    Returns:
+    - Response body, or None when the customer has no usable measurements
+    """
+    by_customer = {}
+    for review in reviews:
+        by_customer.setdefault(review.get('user_id'), []).append(review)
+    neighbours = customer_index.nearest(user_id, list(by_customer), k)
+    if neighbours is None:
+        return None
+
+    counts = {"fit": dict.fromkeys(FITS, 0), "length": dict.fromkeys(LENGTHS, 0)}
+    weights = {"fit": {}, "length": {}}
+    for neighbour, distance in neighbours:
+        for review in by_customer[neighbour]:
+            for field in ('fit', 'length'):
+                value = review.get(field)
+                if value:
+                    counts[field][value] = counts[field].get(value, 0) + 1
+                    weights[field][value] = weights[field].get(value, 0) + 1 / (1 + distance)
+
+    prediction = {}
+    for field in ('fit', 'length'):
+        total = sum(weights[field].values())
+        best = max(weights[field], key=weights[field].get) if total else None
+        prediction[field] = {"value": best, "confidence": round(weights[field][best] / total, 4) if best else None}
+    return {
+        "item_id": item_id,
+        "customer_id": user_id,
+        "k": k,
+        "neighbours": len(neighbours),
+        "mean_distance": round(float(np.mean([distance for _, distance in neighbours])), 4) if neighbours else None,
+        "fit": counts["fit"],
+        "length": counts["length"],
+        "prediction": prediction,
+    }
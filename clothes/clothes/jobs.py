@@ -0,0 +1,331 @@
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.urls import reverse
+from mongoengine import Q
+from mongoengine.errors import NotUniqueError
+from pymongo import ReturnDocument
+from rest_framework import status
+from rest_framework.response import Response
+from .models import Job, JobBatch, utc_now
+from .serializers import JobSerializer
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = ['pending', 'running']
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+_lock = threading.Lock()
+_executor = None
+_sweeper = None
+_pid = None
+_worker_id = None
+
+
+class JobCancelled(Exception):
+    """
+    Raised at a batch boundary once cancellation of the running job was requested.
+    """
+
+
+class LeaseLost(Exception):
+    """
+    Raised when another worker has taken over the job, e.g. after a long stall.
+    """
+
+
+def worker_id():
+    """
+    Identity of this process as a lease owner.
+    """
+    global _worker_id
+    if _worker_id is None or not _worker_id.startswith(f"{socket.gethostname()}:{os.getpid()}:"):
+        _worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    return _worker_id
+
+
+#############
+# Queueing
+#############
+
+
+def wants_async(request, rows=None):
+    """
+    Whether a bulk request should be queued: asked for with `?async=1` or
+    `Prefer: respond-async`, or larger than BULK_ASYNC_ROWS rows.
+    """
+    if request.query_params.get('async') in ('1', 'true'):
+        return True
+    if 'respond-async' in request.META.get('HTTP_PREFER', ''):
+        return True
+    return bool(settings.BULK_ASYNC_ROWS) and rows is not None and rows > settings.BULK_ASYNC_ROWS
+
+
+def create_job(request, kind, target, params=None):
+    """
+    Record a new pending job, or return the one a retried request already created.
+
+    Returns:
+    - (job, created)
+    """
+    key = request.META.get(IDEMPOTENCY_HEADER) or None
+    job = Job(job_id=uuid.uuid4().hex, kind=kind, target=target, params=params or {}, idempotency_key=key)
+    try:
+        job.save(force_insert=True)
+    except NotUniqueError:
+        return Job.objects(idempotency_key=key).first(), False
+    return job, True
+
+
+def store_batches(job, batches):
+    """
+    Persist a payload as numbered batches so a resumed job can re-read it.
+
+    Args:
+    - batches: Iterable of (first row index, rows)
+
+    Returns:
+    - Number of rows stored
+    """
+    collection = JobBatch._get_collection()
+    total = 0
+    for sequence, (start, rows) in enumerate(batches):
+        collection.insert_one({"job_id": job.job_id, "sequence": sequence, "start": start, "rows": rows})
+        total = start + len(rows)
+    return total
+
+
+def iter_batches(job, after=0):
+    """
+    Yield (sequence, first row index, rows) of a job's stored payload from
+    batch `after` on, reading one batch at a time.
+    """
+    batches = JobBatch.objects(job_id=job.job_id, sequence__gte=after).order_by('sequence').as_pymongo()
+    for batch in batches.batch_size(1):
+        yield batch['sequence'], batch['start'], batch['rows']
+
+
+def accepted(job):
+    """
+    202 response pointing at the job's status endpoint.
+    """
+    response = Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+    response['Location'] = reverse('job_detail', args=[job.job_id])
+    return response
+
+
+def enqueue(request, kind, target, params=None, batches=None, errors=None):
+    """
+    Create a job for a bulk request, store its payload and queue it.
+
+    Args:
+    - batches: Iterable of (first row index, rows) to store, see store_batches
+    - errors: Errors found while reading the payload, filled once `batches` is consumed
+
+    Returns:
+    - 202 response with the job (the existing one for a repeated Idempotency-Key)
+    """
+    job, created = create_job(request, kind, target, params)
+    if not created:
+        return accepted(job)
+    if batches is not None:
+        job.total = store_batches(job, batches)
+        Job.objects(job_id=job.job_id).update_one(set__total=job.total)
+    if errors:
+        job.failed, job.errors = len(errors), errors
+        Job.objects(job_id=job.job_id).update_one(inc__failed=len(errors), push_all__errors=errors)
+    submit(job.job_id)
+    return accepted(job)
+
+
+#############
+# Running
+#############
+
+
+def ensure_started():
+    """
+    Start this process's worker pool and stale job sweeper if needed.
+    """
+    global _executor, _sweeper, _pid
+    with _lock:
+        # A forked child inherits neither the threads nor their queue
+        if _executor is None or _pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=settings.JOB_WORKERS, thread_name_prefix='job')
+            _sweeper = threading.Thread(target=_sweep_forever, name='job-sweeper', daemon=True)
+            _pid = os.getpid()
+            _sweeper.start()
+    return _executor
+
+
+def submit(job_id):
+    """
+    Queue a job on this process's bounded worker pool.
+    """
+    return ensure_started().submit(run, job_id)
+
+
+def _sweep_forever():
+    stop = threading.Event()
+    while not stop.wait(settings.JOB_SWEEP_SECONDS):
+        try:
+            resume_stale()
+        except Exception:
+            logger.exception("Job sweep failed")
+
+
+def stale_jobs():
+    """
+    IDs of active jobs no worker holds a valid lease on.
+    """
+    return list(Job.objects(Q(lease_expires_at=None) | Q(lease_expires_at__lt=utc_now()),
+                            status__in=ACTIVE).scalar('job_id'))
+
+
+def resume_stale():
+    """
+    Queue jobs whose worker died (or that were never picked up); they resume
+    from their last committed batch.
+    """
+    job_ids = stale_jobs()
+    for job_id in job_ids:
+        submit(job_id)
+    return job_ids
+
+
+def claim(job_id):
+    """
+    Take the lease on an active job unless a live worker holds it.
+
+    Returns:
+    - The claimed Job, or None
+    """
+    now = utc_now()
+    document = Job._get_collection().find_one_and_update(
+        {"_id": job_id, "status": {"$in": ACTIVE},
+         "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lt": now}}]},
+        {"$set": {"status": "running", "lease_owner": worker_id(), "heartbeat_at": now,
+                  "lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SECONDS)},
+         "$inc": {"attempts": 1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if document is None:
+        return None
+    job = Job._from_son(document)
+    if job.started_at is None:
+        job.started_at = now
+        Job.objects(job_id=job_id).update_one(set__started_at=now)
+    return job
+
+
+class Progress:
+    """
+    What a job handler reports through: every commit records a finished batch,
+    renews the lease and checks for cancellation.
+    """
+
+    def __init__(self, job):
+        self.job = job
+
+    def commit(self, cursor, processed=0, failed=0, errors=(), **counters):
+        """
+        Record one finished batch atomically.
+
+        Args:
+        - cursor: Where a resumed run continues, e.g. the next batch number
+        - errors: Row errors of the batch; at most BULK_MAX_REPORTED_ERRORS are kept per job
+        - counters: Other job counters to increment, e.g. succeeded=10
+        """
+        now = utc_now()
+        update = {
+            "$set": {"cursor": cursor, "heartbeat_at": now,
+                     "lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SECONDS)},
+            "$inc": {"processed": processed, "failed": failed, **counters},
+        }
+        if errors:
+            # Round trip through JSON for string keys and plain str error messages
+            update["$push"] = {"errors": {"$each": json.loads(json.dumps(list(errors))),
+                                          "$slice": settings.BULK_MAX_REPORTED_ERRORS}}
+        document = Job._get_collection().find_one_and_update(
+            {"_id": self.job.job_id, "lease_owner": worker_id(), "status": "running"},
+            update, projection={"cancel_requested": 1}, return_document=ReturnDocument.AFTER,
+        )
+        if document is None:
+            raise LeaseLost(self.job.job_id)
+        self.job.cursor = cursor
+        if document.get("cancel_requested"):
+            raise JobCancelled(self.job.job_id)
+
+    def check(self):
+        """
+        Renew the lease and honour cancellation without recording progress.
+        """
+        self.commit(self.job.cursor)
+
+
+def handlers():
+    """
+    Job kinds and the functions running them.
+    """
+    from .bulk import run_upload_job, run_update_job, run_delete_job
+    from .reaper import reap
+    return {
+        'upload': run_upload_job,
+        'bulk_update': run_update_job,
+        'bulk_delete': run_delete_job,
+        'cascade_delete': reap,
+    }
+
+
+def run(job_id):
+    """
+    Claim and run a job to completion, cancellation or failure.
+    """
+    job = claim(job_id)
+    if job is None:
+        return None
+    try:
+        handlers()[job.kind](job, Progress(job))
+    except LeaseLost:
+        logger.warning("Lost the lease on job %s", job_id)
+        return None
+    except JobCancelled:
+        return finish(job_id, 'cancelled')
+    except Exception as e:
+        logger.exception("Job %s failed", job_id)
+        return finish(job_id, 'failed', str(e))
+    return finish(job_id, 'done')
+
+
+def finish(job_id, final_status, error=None):
+    """
+    Record the outcome of a job and drop its stored payload.
+
+    A failed job keeps its payload so it can be inspected.
+    """
+    Job.objects(job_id=job_id, lease_owner=worker_id()).update_one(
+        set__status=final_status, set__error=error, set__finished_at=utc_now(),
+        unset__lease_owner=True, unset__lease_expires_at=True,
+    )
+    if final_status != 'failed':
+        JobBatch.objects(job_id=job_id).delete()
+    return Job.objects(job_id=job_id).first()
+
+
+def cancel(job):
+    """
+    Cancel a job: a pending one right away, a running one at its next batch boundary.
+    """
+    if job.status == 'pending':
+        Job.objects(job_id=job.job_id, status='pending').update_one(
+            set__status='cancelled', set__cancel_requested=True, set__finished_at=utc_now()
+        )
+        JobBatch.objects(job_id=job.job_id).delete()
+    Job.objects(job_id=job.job_id, status__in=ACTIVE).update_one(set__cancel_requested=True)
+    return Job.objects(job_id=job.job_id).first()
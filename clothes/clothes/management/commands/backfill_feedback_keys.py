@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from clothes.bulk import chunked
+from clothes.models import Customer, Product, Feedback
+
+
+class Command(BaseCommand):
+    """
+    Copy user_id/item_id from the referenced documents onto existing feedback.
+    """
+    help = "Backfill the user_id and item_id natural keys on feedback documents."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        collection = Feedback._get_collection()
+        pending = collection.find(
+            {"$or": [{"user_id": {"$exists": False}}, {"item_id": {"$exists": False}}]},
+            {"customer": 1, "product": 1}
+        ).batch_size(options['batch_size'])
+
+        updated, orphaned = 0, 0
+        for batch in chunked(pending, options['batch_size']):
+            # One lookup per referenced collection for the whole batch
+            user_ids = dict(Customer.all_objects(id__in=[doc.get('customer') for doc in batch]).scalar('id', 'user_id'))
+            item_ids = dict(Product.all_objects(id__in=[doc.get('product') for doc in batch]).scalar('id', 'item_id'))
+
+            operations = []
+            for doc in batch:
+                user_id, item_id = user_ids.get(doc.get('customer')), item_ids.get(doc.get('product'))
+                if user_id is None or item_id is None:
+                    orphaned += 1
+                    continue
+                operations.append(UpdateOne({"_id": doc['_id']}, {"$set": {"user_id": user_id, "item_id": item_id}}))
+            if operations:
+                updated += collection.bulk_write(operations, ordered=False).modified_count
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} feedback documents ({orphaned} with missing references)."))
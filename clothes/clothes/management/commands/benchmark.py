@@ -0,0 +1,324 @@
+import http.client
+import itertools
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import get_resolver
+from clothes.models import Customer, Product, Feedback, Job
+from clothes.synthetic import FITS, customer_rows, product_rows, feedback_rows
+
+SAMPLE_SIZE = 1000
+SEARCH_TERMS = ('small', 'fabric', 'colour', 'washes', '%22true+to+size%22')
+
+# GET routes, the only ones --read-only runs
+READ_ROUTES = frozenset([
+    'customer_list', 'customer_range', 'product_list', 'product_facets', 'feedback_list', 'feedback_search',
+    'customer_detail', 'product_detail', 'feedback_detail', 'customer_feedbacks', 'product_feedbacks',
+    'product_fit_prediction', 'cache_stats', 'connection_pool_stats', 'metrics', 'export', 'job_detail',
+])
+
+
+class Workload:
+    """
+    Sampled keys of the benchmarked database and the requests of every route.
+
+    Each scenario returns (method, path, body), or None when it has nothing
+    to do, e.g. a delete before anything was created to delete. Write routes
+    only delete what the create and upload routes of the same run created.
+    """
+
+    def __init__(self, seed, upload_rows):
+        self.rng = random.Random(seed)
+        self.upload_rows = upload_rows
+        self.customers = list(Customer.objects.only('id', 'user_id').limit(SAMPLE_SIZE).scalar('id', 'user_id'))
+        self.products = list(Product.objects.only('id', 'item_id').limit(SAMPLE_SIZE).scalar('id', 'item_id'))
+        self.feedbacks = list(Feedback.objects.limit(SAMPLE_SIZE).scalar('review_id'))
+        if not (self.customers and self.products and self.feedbacks):
+            raise CommandError("Nothing to benchmark against; run generate_data first.")
+        self.next_ids = {
+            name: itertools.count(self.last_key(model_class, key) + 1)
+            for name, model_class, key in (('customer', Customer, 'user_id'), ('product', Product, 'item_id'),
+                                           ('feedback', Feedback, 'review_id'))
+        }
+        self.created = {'customer': deque(), 'product': deque(), 'feedback': deque()}
+        self.jobs = []
+        self.lock = threading.Lock()
+
+    def last_key(self, model_class, key):
+        last = model_class.all_objects.order_by(f'-{key}').only(key).first()
+        return getattr(last, key)
+
+    def refresh_jobs(self):
+        self.jobs = list(Job.objects.order_by('-created_at').limit(SAMPLE_SIZE).scalar('job_id'))
+
+    def fresh(self, name, count=1):
+        """
+        Consecutive unused keys; concurrent creates never collide.
+        """
+        with self.lock:
+            keys = [next(self.next_ids[name]) for _ in range(count)]
+        self.created[name].extend(keys)
+        return keys
+
+    def taken(self, name, count=1):
+        keys = []
+        for _ in range(count):
+            try:
+                keys.append(self.created[name].popleft())
+            except IndexError:
+                break
+        return keys
+
+    def customer(self):
+        return self.rng.choice(self.customers)
+
+    def product(self):
+        return self.rng.choice(self.products)
+
+    def waist_range(self):
+        low = self.rng.randint(22, 40)
+        return f'/customers/range/?waist__gte={low}&waist__lte={low + 4}'
+
+    def several(self, keys, count=10):
+        # Distinct, as a bulk update rejects repeated ids
+        return self.rng.sample(keys, min(count, len(keys)))
+
+    def feedback_payloads(self, keys):
+        user_ids = [user_id for _, user_id in self.customers]
+        item_ids = [item_id for _, item_id in self.products]
+        return list(feedback_rows(self.rng, keys[0], len(keys), user_ids, item_ids)) if keys else []
+
+    def scenarios(self):
+        rng = self.rng
+        return {
+            # Read (GET)
+            'customer_list': lambda: ('GET', '/customers/', None),
+            'customer_range': lambda: ('GET', self.waist_range(), None),
+            'product_list': lambda: ('GET', '/products/', None),
+            'product_facets': lambda: ('GET', '/products/facets/', None),
+            'feedback_list': lambda: ('GET', '/feedbacks/', None),
+            'feedback_search': lambda: ('GET', f'/feedbacks/search/?q={rng.choice(SEARCH_TERMS)}', None),
+            'customer_detail': lambda: ('GET', f'/customers/{self.customer()[1]}/', None),
+            'product_detail': lambda: ('GET', f'/products/{self.product()[1]}/', None),
+            'feedback_detail': lambda: ('GET', f'/feedbacks/{rng.choice(self.feedbacks)}/', None),
+            'customer_feedbacks': lambda: ('GET', f'/customers/{self.customer()[1]}/feedbacks/', None),
+            'product_feedbacks': lambda: ('GET', f'/products/{self.product()[1]}/feedbacks/', None),
+            'product_fit_prediction': lambda: (
+                'GET', f'/products/{self.product()[1]}/fit-prediction/?customer={self.customer()[1]}', None),
+            'cache_stats': lambda: ('GET', '/stats/cache/', None),
+            'connection_pool_stats': lambda: ('GET', '/stats/pool/', None),
+            'metrics': lambda: ('GET', '/metrics', None),
+            'export': lambda: ('GET', f'/export/feedbacks/?product_id={self.product()[1]}', None),
+
+            # Create (POST)
+            'customer_create': lambda: ('POST', '/customers/create/',
+                                        next(customer_rows(rng, self.fresh('customer')[0], 1))),
+            'product_create': lambda: ('POST', '/products/create/',
+                                       next(product_rows(rng, self.fresh('product')[0], 1))),
+            'feedback_create': lambda: ('POST', '/feedbacks/create/',
+                                        self.feedback_payloads(self.fresh('feedback'))[0]),
+            'bulk_upload_customers': lambda: ('POST', '/upload/customers/', list(
+                customer_rows(rng, self.fresh('customer', self.upload_rows)[0], self.upload_rows))),
+            'bulk_upload_products': lambda: ('POST', '/upload/products/', list(
+                product_rows(rng, self.fresh('product', self.upload_rows)[0], self.upload_rows))),
+            'bulk_upload_feedbacks': lambda: ('POST', '/upload/feedbacks/',
+                                              self.feedback_payloads(self.fresh('feedback', self.upload_rows))),
+
+            # Update (PATCH)
+            # CustomerSerializer.validate needs waist and hips even on a partial update
+            'customer_update': lambda: ('PATCH', f'/customers/{self.customer()[0]}/update/',
+                                        {"user_name": f"Bench {rng.randint(0, 999)}", "waist": "30", "hips": "40"}),
+            'bulk_update_customers': lambda: ('PATCH', '/customers/bulk_update/', {"items": [
+                {"id": user_id, "changes": {"user_name": f"Bench {rng.randint(0, 999)}"}}
+                for _, user_id in self.several(self.customers)]}),
+            'product_update': lambda: ('PATCH', f'/products/{self.product()[0]}/update/',
+                                       {"quality": rng.randint(1, 5)}),
+            'bulk_update_products': lambda: ('PATCH', '/products/bulk_update/', {"items": [
+                {"id": item_id, "changes": {"quality": rng.randint(1, 5)}} for _, item_id in self.several(self.products)]}),
+            'feedback_update': lambda: ('PATCH', f'/feedbacks/{rng.choice(self.feedbacks)}/update/',
+                                        {"fit": rng.choice(FITS)}),
+            'bulk_update_feedbacks': lambda: ('PATCH', '/feedbacks/bulk_update/', {"items": [
+                {"id": review_id, "changes": {"fit": rng.choice(FITS)}} for review_id in self.several(self.feedbacks)]}),
+
+            # Delete (DELETE)
+            'feedback_delete': lambda: self.delete('feedback', '/feedbacks/{}/delete/'),
+            'bulk_delete_feedbacks': lambda: self.bulk_delete('feedback', '/feedbacks/bulk_delete/', 'review_id'),
+            'customer_delete': lambda: self.delete('customer', '/customers/{}/delete/'),
+            'bulk_delete_customers': lambda: self.bulk_delete('customer', '/customers/bulk_delete/', 'user_id'),
+            'product_delete': lambda: self.delete('product', '/products/{}/delete/'),
+            'bulk_delete_products': lambda: self.bulk_delete('product', '/products/bulk_delete/', 'item_id'),
+
+            # Jobs, last so the deletes above have queued some
+            'job_detail': lambda: ('GET', f'/jobs/{rng.choice(self.jobs)}/', None) if self.jobs else None,
+            'job_cancel': lambda: ('POST', f'/jobs/{rng.choice(self.jobs)}/cancel/', None) if self.jobs else None,
+        }
+
+    def delete(self, name, path):
+        keys = self.taken(name)
+        return ('DELETE', path.format(keys[0]), None) if keys else None
+
+    def bulk_delete(self, name, path, key):
+        keys = self.taken(name, 10)
+        return ('DELETE', path, {"filter": {f"{key}__in": keys}}) if keys else None
+
+
+def run_route(base_url, scenario, requests, concurrency):
+    """
+    Send `requests` requests built by `scenario` from `concurrency` threads,
+    each on its own keep-alive connection.
+
+    Returns:
+    - (latencies in seconds, Counter of status codes, wall time in seconds)
+    """
+    url = urlsplit(base_url)
+    remaining = itertools.count()
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+
+    def worker():
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+        own_latencies, own_statuses = [], Counter()
+        while next(remaining) < requests:
+            request = scenario()
+            if request is None:
+                own_statuses['skipped'] += 1
+                continue
+            method, path, body = request
+            payload = json.dumps(body).encode() if body is not None else None
+            headers = {'Content-Type': 'application/json'} if payload is not None else {}
+            started = time.perf_counter()
+            try:
+                connection.request(method, url.path.rstrip('/') + path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                own_statuses[str(response.status)] += 1
+            except (OSError, http.client.HTTPException):
+                own_statuses['error'] += 1
+                connection.close()
+                continue
+            own_latencies.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            latencies.extend(own_latencies)
+            statuses.update(own_statuses)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def summarize(latencies, statuses, elapsed):
+    completed = len(latencies)
+    summary = {
+        "requests": completed,
+        "statuses": dict(statuses),
+        "server_errors": sum(count for status, count in statuses.items() if status.startswith('5') or status == 'error'),
+        "throughput_rps": round(completed / elapsed, 2) if elapsed else None,
+    }
+    if completed:
+        values = np.array(latencies) * 1000
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        summary["latency_ms"] = {"mean": round(float(values.mean()), 3), "p50": round(float(p50), 3),
+                                 "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+                                 "max": round(float(values.max()), 3)}
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    """
+    Load driver: throughput and latency percentiles of every route in urls.py
+    against a running server using the same database as this settings module.
+    """
+    help = "Benchmark every route of a running server and report throughput and p50/p95/p99 latency as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--requests', type=int, default=500, help="Requests per route.")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--upload-rows', type=int, default=100, help="Rows per bulk upload request.")
+        parser.add_argument('--routes', nargs='*', help="URL names to run; all by default.")
+        parser.add_argument('--read-only', action='store_true', help="Only run GET routes.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the JSON report to this file.")
+        parser.add_argument('--compare', help="Earlier JSON report to print the differences against.")
+
+    def handle(self, *args, **options):
+        workload = Workload(options['seed'], options['upload_rows'])
+        scenarios = workload.scenarios()
+        names = [pattern.name for pattern in get_resolver().url_patterns if getattr(pattern, 'name', None)]
+        missing = [name for name in names if name not in scenarios]
+        if missing:
+            raise CommandError(f"No benchmark scenario for {', '.join(missing)}.")
+        if options['routes']:
+            unknown = set(options['routes']) - set(names)
+            if unknown:
+                raise CommandError(f"Unknown routes: {', '.join(sorted(unknown))}.")
+            names = [name for name in names if name in options['routes']]
+
+        # Scenario order: reads, then creates before the deletes that consume them
+        order = list(scenarios)
+        names.sort(key=order.index)
+        if options['read_only']:
+            names = [name for name in names if name in READ_ROUTES]
+
+        report = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "base_url": options['base_url'],
+            "requests_per_route": options['requests'],
+            "concurrency": options['concurrency'],
+            "upload_rows": options['upload_rows'],
+            "data": {"customers": Customer.objects.count(), "products": Product.objects.count(),
+                     "feedbacks": Feedback.objects.count()},
+            "routes": {},
+        }
+        for name in names:
+            if name.startswith('job_'):
+                workload.refresh_jobs()
+            latencies, statuses, elapsed = run_route(options['base_url'], scenarios[name],
+                                                     options['requests'], options['concurrency'])
+            summary = report["routes"][name] = summarize(latencies, statuses, elapsed)
+            latency = summary.get("latency_ms", {})
+            self.stdout.write(f"{name:<24} {summary['throughput_rps'] or 0:>9.1f} req/s  "
+                              f"p50 {latency.get('p50', 0):>8.2f}  p95 {latency.get('p95', 0):>8.2f}  "
+                              f"p99 {latency.get('p99', 0):>8.2f} ms  {summary['statuses']}")
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.compare(json.load(file), report)
+
+    def compare(self, before, after):
+        self.stdout.write(f"\nAgainst {before.get('commit')} ({before.get('started_at')}):")
+        for name, summary in after["routes"].items():
+            previous = before.get("routes", {}).get(name)
+            if not previous or "latency_ms" not in previous or "latency_ms" not in summary:
+                continue
+            changes = []
+            for metric in ('p50', 'p95', 'p99'):
+                old, new = previous["latency_ms"][metric], summary["latency_ms"][metric]
+                changes.append(f"{metric} {(new - old) / old * 100 if old else 0:+6.1f}%")
+            old, new = previous["throughput_rps"], summary["throughput_rps"]
+            changes.append(f"req/s {(new - old) / old * 100 if old else 0:+6.1f}%")
+            self.stdout.write(f"{name:<24} " + "  ".join(changes))
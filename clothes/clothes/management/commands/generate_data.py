@@ -0,0 +1,113 @@
+import json
+import random
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from clothes.batch_validation import validate_customers, validate_products
+from clothes.bulk import chunked
+from clothes.cache import detail_cache
+from clothes.counters import PARENTS, reconcile
+from clothes.facets import rebuild
+from clothes.models import Customer, Product, Feedback
+from clothes.synthetic import MIN_KEY, check_range, customer_rows, product_rows, feedback_rows
+from clothes.synthetic import as_document, as_feedback_document
+from clothes.versioning import bump_collection
+
+
+class Command(BaseCommand):
+    """
+    Fill the database (or JSON files) with synthetic customers, products and
+    feedback for benchmarks.
+    """
+    help = "Generate valid synthetic customers, products and feedbacks for load benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=10000)
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--feedbacks', type=int, default=50000)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0, help="Same seed, same data.")
+        parser.add_argument('--drop', action='store_true',
+                            help="Empty the three collections first.")
+        parser.add_argument('--output',
+                            help="Write bulk_upload_*.txt files to this directory instead of inserting.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = max(options['batch_size'], 1)
+        output = Path(options['output']) if options['output'] else None
+
+        if output is None and options['drop']:
+            for model_class in (Feedback, Customer, Product):
+                model_class._get_collection().delete_many({})
+
+        # New keys follow the existing ones, so generating into a filled database adds to it
+        starts = {model_class: self.next_key(model_class, key) if output is None else MIN_KEY
+                  for model_class, key in ((Customer, 'user_id'), (Product, 'item_id'), (Feedback, 'review_id'))}
+        try:
+            check_range(starts[Customer], options['customers'])
+            check_range(starts[Product], options['products'])
+            check_range(starts[Feedback], options['feedbacks'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        customers = customer_rows(rng, starts[Customer], options['customers'])
+        products = product_rows(rng, starts[Product], options['products'])
+        if output is not None:
+            output.mkdir(parents=True, exist_ok=True)
+            customers = self.write(output / 'bulk_upload_customer.txt', customers)
+            products = self.write(output / 'bulk_upload_products.txt', products)
+            user_ids, item_ids = [row['user_id'] for row in customers], [row['item_id'] for row in products]
+            if options['feedbacks'] and not (user_ids and item_ids):
+                raise CommandError("Feedbacks need at least one customer and one product.")
+            self.write(output / 'bulk_upload_feedbacks.txt',
+                       feedback_rows(rng, starts[Feedback], options['feedbacks'], user_ids, item_ids))
+            self.stdout.write(self.style.SUCCESS(f"Wrote the upload files to {output}."))
+            return
+
+        self.insert(Customer, customers, batch_size, validate_customers)
+        self.insert(Product, products, batch_size, validate_products)
+
+        # Feedback may refer to any live customer or product, generated now or before
+        customer_ids = dict(Customer.objects.scalar('user_id', 'id'))
+        product_ids = dict(Product.objects.scalar('item_id', 'id'))
+        if options['feedbacks'] and not (customer_ids and product_ids):
+            raise CommandError("Feedbacks need at least one customer and one product.")
+        user_ids, item_ids = list(customer_ids), list(product_ids)
+        rows = feedback_rows(rng, starts[Feedback], options['feedbacks'], user_ids, item_ids)
+        self.insert(Feedback, (as_feedback_document(row, customer_ids, product_ids) for row in rows), batch_size)
+
+        detail_cache.invalidate_all('customer')
+        detail_cache.invalidate_all('product')
+        detail_cache.invalidate_all('feedback')
+        bump_collection(Customer, Product, Feedback)
+        rebuild()
+        for model_class, key, namespace in PARENTS:
+            reconcile(model_class, key, namespace, batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Inserted {options['customers']} customers, {options['products']} products "
+            f"and {options['feedbacks']} feedbacks."))
+
+    def next_key(self, model_class, key):
+        last = model_class.all_objects.order_by(f'-{key}').only(key).first()
+        return getattr(last, key) + 1 if last else MIN_KEY
+
+    def write(self, path, rows):
+        rows = list(rows)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(rows, file, indent=4, ensure_ascii=False)
+        return rows
+
+    def insert(self, model_class, rows, batch_size, validator=None):
+        """
+        Insert rows in `insert_many` batches, checking payloads against the
+        batch validator first when there is one.
+        """
+        collection = model_class._get_collection()
+        for batch in chunked(rows, batch_size):
+            if validator is not None:
+                _, failed = validator(batch)
+                if failed:
+                    position, errors = failed[0]
+                    raise CommandError(f"Generated an invalid {model_class.__name__}: {batch[position]} {errors}")
+                batch = [as_document(row) for row in batch]
+            collection.insert_many(batch, ordered=False)
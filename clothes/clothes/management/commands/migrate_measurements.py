@@ -0,0 +1,64 @@
+import time
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from clothes.batch_validation import MEASUREMENT_FIELDS, store_measurements
+from clothes.bulk import chunked
+from clothes.cache import detail_cache
+from clothes.models import Customer
+from clothes.versioning import bump_collection
+
+FIELDS = MEASUREMENT_FIELDS + ('bra_size', 'height')
+
+# Index on the string measurements, replaced by `measurements`
+LEGACY_INDEX = 'waist_1_hips_1_bust_1'
+
+
+class Command(BaseCommand):
+    """
+    Convert customer measurements stored as strings to numbers, with height
+    in inches, while the app keeps serving.
+    """
+    help = "Convert string customer measurements to numbers in batches, online."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0,
+                            help="Seconds to wait between batches, to limit the load on the database.")
+
+    def handle(self, *args, **options):
+        Customer.ensure_indexes()
+        collection = Customer._get_collection()
+        if LEGACY_INDEX in collection.index_information():
+            collection.drop_index(LEGACY_INDEX)
+
+        legacy = {"$or": [{field: {"$type": "string"}} for field in FIELDS]}
+        pending = collection.find(legacy, dict.fromkeys(FIELDS, 1)).batch_size(options['batch_size'])
+
+        converted, invalid = 0, 0
+        for batch in chunked(pending, options['batch_size']):
+            operations = []
+            for doc in batch:
+                strings = {field: doc[field] for field in FIELDS if isinstance(doc.get(field), str)}
+                try:
+                    changes = store_measurements(dict(strings))
+                    if isinstance(changes.get('height'), str):
+                        raise ValueError(changes['height'])
+                except ValueError:
+                    invalid += 1
+                    continue
+                # Matching the old strings too leaves customers updated in the meantime alone
+                operations.append(UpdateOne({"_id": doc['_id'], **strings}, {"$set": changes}))
+            if operations:
+                converted += collection.bulk_write(operations, ordered=False).modified_count
+            time.sleep(options['pause'])
+
+        if converted:
+            # Cached details and list ETags were built from the string documents
+            bump_collection(Customer)
+            detail_cache.invalidate_all('customer')
+
+        remaining = collection.count_documents(legacy)
+        self.stdout.write(self.style.SUCCESS(
+            f"Converted {converted} customers ({invalid} with unreadable measurements, {remaining} left)."))
+        if remaining > invalid:
+            self.stdout.write("Customers changed during the run were skipped; run the command again.")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from clothes.facets import rebuild
+
+
+class Command(BaseCommand):
+    """
+    Recompute the product facet counts from scratch.
+    """
+    help = "Rebuild the product keyword and size facet counts with one aggregation."
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} product facets."))
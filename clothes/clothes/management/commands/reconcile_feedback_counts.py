@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from clothes.counters import PARENTS, reconcile
+
+
+class Command(BaseCommand):
+    """
+    Recount the feedback of every customer and product and repair the
+    counters that drifted.
+    """
+    help = "Repair the review, fit and length counters of customers and products."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model_class, key, namespace in PARENTS:
+            repaired = reconcile(model_class, key, namespace, max(options['batch_size'], 1))
+            self.stdout.write(self.style.SUCCESS(f"Repaired the counters of {repaired} {model_class._meta['collection']}."))
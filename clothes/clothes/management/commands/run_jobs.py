@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from clothes.jobs import ensure_started, resume_stale, run, stale_jobs
+
+
+class Command(BaseCommand):
+    """
+    Run background jobs outside the web processes, resuming those left
+    behind by a stopped worker.
+    """
+    help = "Resume stale background jobs, then keep running queued and stale jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Run the currently stale jobs in this process and exit.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            for job_id in stale_jobs():
+                job = run(job_id)
+                if job is not None:
+                    self.stdout.write(f"{job_id}: {job.status}, {job.processed} processed, {job.failed} failed.")
+            self.stdout.write(self.style.SUCCESS("No stale jobs left."))
+            return
+
+        ensure_started()
+        self.stdout.write(f"Resumed {len(resume_stale())} stale jobs; watching for more.")
+        while True:
+            time.sleep(60)
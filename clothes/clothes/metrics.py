@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+from pymongo import monitoring
+from .env import PROMETHEUS_MULTIPROC_DIR
+
+# With PROMETHEUS_MULTIPROC_DIR set, prometheus_client keeps every value in a
+# per-process mmap file there and /metrics sums the files of all workers
+
+MONGO_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+
+requests_total = Counter('http_requests_total', 'Requests handled, by URL name',
+                         ['view', 'method', 'status'])
+request_duration = Histogram('http_request_duration_seconds', 'Request latency, by URL name',
+                             ['view', 'method'])
+mongo_command_duration = Histogram('mongo_command_duration_seconds', 'Mongo command latency',
+                                   ['collection', 'command'], buckets=MONGO_BUCKETS)
+mongo_command_failures = Counter('mongo_command_failures_total', 'Mongo commands that failed',
+                                 ['collection', 'command'])
+bulk_rows_ingested = Counter('bulk_rows_ingested_total', 'Rows written by bulk uploads and jobs',
+                             ['collection'])
+cache_lookups = Counter('detail_cache_lookups_total', 'Detail cache lookups, by result', ['result'])
+
+# Methods labelled as they are; anything else is counted as 'other'
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+# Started commands awaiting their reply; past this many, the oldest are
+# dropped, since a command whose connection dies may never get one
+MAX_PENDING_COMMANDS = 10000
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Observes the latency of every Mongo command by collection and command name.
+
+    The collection is only part of the started event; it is kept until the
+    matching reply in a map shared by every thread, hence locked and bounded
+    by MAX_PENDING_COMMANDS.
+    """
+
+    def __init__(self, max_pending=MAX_PENDING_COMMANDS):
+        self.max_pending = max_pending
+        self.reset()
+
+    def reset(self):
+        # Also called in a forked child, where the lock may be held by a thread that no longer exists
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()
+
+    def started(self, event):
+        collection = event.command.get('collection' if event.command_name == 'getMore' else event.command_name)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ''
+            if len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+
+    def _collection(self, event):
+        with self._lock:
+            return self._pending.pop((event.connection_id, event.request_id), '')
+
+    def succeeded(self, event):
+        collection = self._collection(event)
+        mongo_command_duration.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collection(event)
+        mongo_command_duration.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        mongo_command_failures.labels(collection, event.command_name).inc()
+
+
+command_metrics = CommandMetrics()
+
+
+class MetricsMiddleware:
+    """
+    Count requests and observe their latency by URL name.
+
+    Requests that resolve to no URL are counted under '<unresolved>', and
+    methods outside METHODS under 'other', so a scan of random paths or
+    methods cannot create new label values.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        return self.observe(request, response, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        return self.observe(request, response, started)
+
+    def observe(self, request, response, started):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else '<unresolved>'
+        method = request.method if request.method in METHODS else 'other'
+        request_duration.labels(view, method).observe(time.perf_counter() - started)
+        requests_total.labels(view, method, response.status_code).inc()
+        return response
+
+
+def exposition():
+    """
+    All metrics in the Prometheus text format, summed over worker processes
+    in multiprocess mode.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -1,22 +1,98 @@
-import re
-from mongoengine import Document, StringField, IntField, ListField, DateField, ReferenceField, CASCADE, ValidationError, Q
-from datetime import date
+from mongoengine import Document, StringField, IntField, ListField, DateField, DateTimeField, ReferenceField, ValidationError, Q
+from mongoengine import BooleanField, DictField, DynamicField, FloatField
+from mongoengine.queryset import QuerySetManager, queryset_manager
+from datetime import date, datetime, timezone
+from .batch_validation import height_inches
 
-def validate_measurement(value):
+class HeightField(IntField):
     """
-    Validates that the measurement is in the correct format.
+    Height in inches. Values and query values in the feet'inches notation
+    (e.g. 5'5) are converted, so documents written before the conversion
+    still load.
     """
-    if not re.match(r'^\d+(\.\d+)?$', value):
-        raise ValidationError(f"Invalid measurement format for '{value}'.")
+    def to_python(self, value):
+        return super().to_python(height_inches(value))
 
-def validate_height(value):
+    def prepare_query_value(self, op, value):
+        return super().prepare_query_value(op, height_inches(value))
+
+def utc_now():
+    """
+    Current time in UTC, as stored in Mongo.
+    """
+    return datetime.now(timezone.utc)
+
+class VersionedDocument(Document):
     """
-    Validates height format, e.g., 5'5.
+    Base document carrying a version counter and last modification time.
+
+    Every write bumps `version`, which is what the ETag of the document is built from.
     """
-    if not re.match(r'^\d\'\d+$', value):
-        raise ValidationError(f"Invalid height format '{value}'. Expected format is like 5'5.")
+    meta = {'abstract': True}
+
+    # Every document, including tombstoned ones
+    all_objects = QuerySetManager()
+
+    version = IntField(default=1, min_value=1)
+    updated_at = DateTimeField(default=utc_now)
+
+    def touch(self):
+        """
+        Record a modification before saving.
+        """
+        self.version = (self.version or 0) + 1
+        self.updated_at = utc_now()
+
+class TombstonedDocument(VersionedDocument):
+    """
+    Base document deleted in two steps: a request marks it with `deleted_at`
+    and the job in `delete_job`, and a background job removes it together
+    with its feedback. `objects` hides marked documents.
+
+    The feedback of a customer or product is marked by the job before it is
+    removed; until then, reads of one feedback or of a parent's feedback
+    check the parent.
+    """
+    meta = {'abstract': True}
+
+    deleted_at = DateTimeField()
+    delete_job = StringField()
+
+    @queryset_manager
+    def objects(doc_cls, queryset):
+        return queryset.filter(deleted_at=None)
+
+class CollectionVersion(Document):
+    """
+    Version counter of a whole collection, bumped by every write to it.
+
+    Counters named `cache:<namespace>` hold the shared generations of the
+    detail cache namespaces instead (see cache.SharedGenerations).
+    """
+    meta = {'collection': 'collection_versions'}
+
+    name = StringField(primary_key=True)
+    version = IntField(default=0)
+    updated_at = DateTimeField()
+
+class CacheDrop(Document):
+    """
+    Detail cache keys invalidated by one write, replayed by the caches of
+    the other processes (see cache.SharedGenerations). Expired by Mongo once
+    every process has long synced past them.
+    """
+    meta = {
+        'collection': 'cache_drops',
+        'indexes': [
+            {'fields': ['created_at'], 'expireAfterSeconds': 3600}
+        ]
+    }
+
+    origin = StringField(required=True)
+    keys = ListField(StringField())
+    created_at = DateTimeField(default=utc_now)
 
-class Customer(Document):
+class Customer(TombstonedDocument):
     """
     Enhanced Customer model with robust validation and indexing.
     """
@@ -25,18 +101,26 @@ class Customer(Document):
         'indexes': [
             {'fields': ['user_id'], 'unique': True},
             {'fields': ['user_name']},
-            {'fields': ['waist', 'hips', 'bust'], 'sparse': True}
+            # Serves measurement range queries in pages ordered by the same fields
+            {'fields': ['waist', 'hips', 'bust', 'user_id'], 'name': 'measurements'},
+            # Serves updated_since exports in their order, and reads by updated_at
+            {'fields': ['updated_at', 'user_id']},
+            {'fields': ['delete_job'], 'sparse': True}
         ]
     }
     
     user_id = IntField(required=True, unique=True, min_value=100000, max_value=999999)
     user_name = StringField(required=True, max_length=100, min_length=2)
-    waist = StringField(required=True, max_length=10, validation=validate_measurement)
+    # Measurements in inches, stored as numbers so indexes order them numerically
+    waist = FloatField(required=True, min_value=0)
     cup_size = StringField(required=True, max_length=5, choices=['AA', 'A', 'B', 'C', 'D', 'DD', 'E', 'F', 'G'])
-    bra_size = StringField(required=True, max_length=10, validation=validate_measurement)
-    hips = StringField(required=True, max_length=10, validation=validate_measurement)
-    bust = StringField(required=True, max_length=10, validation=validate_measurement)
-    height = StringField(required=True, max_length=10, validation=validate_height)
+    bra_size = IntField(required=True, min_value=0)
+    hips = FloatField(required=True, min_value=0)
+    bust = FloatField(required=True, min_value=0)
+    height = HeightField(required=True, min_value=0)
+
+    # Reviews, fit and length counts of the customer's feedback, kept by counters.count_feedback
+    feedback_counts = DictField()
 
     def clean(self):
         """
@@ -50,7 +134,7 @@ class Customer(Document):
             hips_val = float(self.hips)
             if waist_val >= hips_val:
                 errors.append("Waist measurement must be less than hip measurement.")
-        except ValueError:
+        except (TypeError, ValueError):
             errors.append("Invalid measurement format for waist or hips.")
         
         if errors:
@@ -58,7 +142,7 @@ class Customer(Document):
 
 
 
-class Product(Document):
+class Product(TombstonedDocument):
     """
     Enhanced Product model with robust validation and indexing.
     """
@@ -67,7 +151,9 @@ class Product(Document):
         'indexes': [
             {'fields': ['item_id'], 'unique': True},
             {'fields': ['product_name'], 'sparse': True},
-            {'fields': ['keywords'], 'sparse': True}
+            {'fields': ['keywords'], 'sparse': True},
+            {'fields': ['updated_at', 'item_id']},
+            {'fields': ['delete_job'], 'sparse': True}
         ]
     }
     
@@ -79,6 +165,9 @@ class Product(Document):
     cloth_size_category = StringField(required=True, choices=['XS', 'S', 'M', 'L', 'XL', 'XXL'])
     last_update_date = DateField(required=True)
 
+    # Reviews, fit and length counts of the product's feedback, kept by counters.count_feedback
+    feedback_counts = DictField()
+
     def clean(self):
         """
         Comprehensive validation with specific business rules.
@@ -87,12 +176,19 @@ class Product(Document):
         if self.last_update_date > date.today():
             raise ValidationError("Last update date cannot be in the future")
 
-class Feedback(Document):
+class Feedback(TombstonedDocument):
     meta = {
         'collection': 'feedback',
         'indexes': [
             {'fields': ['review_id'], 'unique': True},
-            {'fields': ['customer', 'product'], 'sparse': True}
+            {'fields': ['customer', 'product'], 'sparse': True},
+            {'fields': ['user_id']},
+            {'fields': ['item_id']},
+            {'fields': ['updated_at', 'review_id']},
+            {'fields': ['delete_job'], 'sparse': True},
+            # Review search, a summary match ranking above a match in the text
+            {'fields': ['$review_summary', '$review_text'], 'name': 'review_search',
+             'weights': {'review_summary': 3, 'review_text': 1}, 'default_language': 'english'}
         ]
     }
     
@@ -102,8 +198,13 @@ class Feedback(Document):
     review_text = StringField(max_length=1000)
     review_summary = StringField(max_length=255)
     
-    customer = ReferenceField(Customer, required=True, reverse_delete_rule=CASCADE)
-    product = ReferenceField(Product, required=True, reverse_delete_rule=CASCADE)
+    # Feedback of deleted customers and products is tombstoned with them and removed by the reaper
+    customer = ReferenceField(Customer, required=True)
+    product = ReferenceField(Product, required=True)
+
+    # Natural keys of the referenced documents, so reads never dereference
+    user_id = IntField()
+    item_id = IntField()
 
     def clean(self):
         """
@@ -111,4 +212,80 @@ class Feedback(Document):
         """
         # Ensure referenced documents exist
         if not self.customer or not self.product:
-            raise ValidationError("Both customer and product must exist")
\ No newline at end of file
+            raise ValidationError("Both customer and product must exist")
+
+        # Keep the natural keys in step with the references
+        self.user_id = self.customer.user_id
+        self.item_id = self.product.item_id
+
+JOB_STATUSES = ('pending', 'running', 'done', 'failed', 'cancelled')
+
+class Job(Document):
+    """
+    Background work started by a request, polled through jobs/<job_id>/.
+
+    A worker holds a lease on the job while running it and renews it with
+    every committed batch; `cursor` marks where a resumed run picks up.
+    """
+    meta = {
+        'collection': 'jobs',
+        'indexes': [
+            {'fields': ['status', 'lease_expires_at']},
+            {'fields': ['idempotency_key'], 'unique': True, 'sparse': True}
+        ]
+    }
+
+    job_id = StringField(primary_key=True)
+    kind = StringField(required=True)
+    target = StringField(required=True)
+    status = StringField(default='pending', choices=JOB_STATUSES)
+    params = DictField()
+    idempotency_key = StringField()
+
+    # Progress, committed once per batch
+    total = IntField(default=0)
+    processed = IntField(default=0)
+    failed = IntField(default=0)
+    succeeded = IntField(default=0)
+    deleted_dependents = IntField(default=0)
+    errors = ListField(DictField())
+    cursor = DynamicField()
+    error = StringField()
+
+    cancel_requested = BooleanField(default=False)
+    attempts = IntField(default=0)
+    lease_owner = StringField()
+    lease_expires_at = DateTimeField()
+
+    created_at = DateTimeField(default=utc_now)
+    started_at = DateTimeField()
+    heartbeat_at = DateTimeField()
+    finished_at = DateTimeField()
+
+class JobBatch(Document):
+    """
+    One batch of a queued request's payload, kept until its job is finished.
+    """
+    meta = {
+        'collection': 'job_batches',
+        'indexes': [
+            {'fields': ['job_id', 'sequence'], 'unique': True}
+        ]
+    }
+
+    job_id = StringField(required=True)
+    sequence = IntField(required=True)
+    start = IntField(required=True)
+    rows = ListField()
+
+class ProductFacet(Document):
+    """
+    Number of live products carrying a keyword, a size category or a
+    combination of both, kept current by every product write (see facets.py).
+    """
+    meta = {'collection': 'product_facets'}
+
+    key = StringField(primary_key=True)
+    keyword = StringField()
+    cloth_size_category = StringField()
+    count = IntField(default=0)
@@ -0,0 +1,186 @@
+import os
+import threading
+import mongoengine
+from mongoengine.connection import get_connection
+from pymongo import AsyncMongoClient, monitoring
+from .env import MONGO_DB_NAME, MONGO_DB_HOST, MONGO_DB_PORT, MONGO_DB_USERNAME, MONGO_DB_PASSWORD
+from .env import MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS
+from .env import MONGO_CONNECT_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS, MONGO_COMPRESSORS
+from .metrics import command_metrics
+from .profiling import command_profiler
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """
+    Connection pool counters per server, fed by pymongo's CMAP events.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers = {}
+
+    def _server(self, address):
+        server = self._servers.get(address)
+        if server is None:
+            server = self._servers[address] = {
+                "open": 0, "checked_out": 0, "waiting": 0, "created": 0, "closed": 0, "cleared": 0,
+                "checkouts": 0, "checkout_failures": 0, "wait_total": 0.0, "wait_max": 0.0,
+            }
+        return server
+
+    def _count(self, address, **deltas):
+        with self._lock:
+            server = self._server(address)
+            for name, delta in deltas.items():
+                server[name] += delta
+
+    def _checkout_done(self, address, duration, **deltas):
+        with self._lock:
+            server = self._server(address)
+            for name, delta in deltas.items():
+                server[name] += delta
+            server["waiting"] -= 1
+            if duration is not None:
+                server["wait_total"] += duration
+                server["wait_max"] = max(server["wait_max"], duration)
+
+    def pool_created(self, event):
+        self._count(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._count(event.address, cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._count(event.address, open=1, created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._count(event.address, open=-1, closed=1)
+
+    def connection_check_out_started(self, event):
+        self._count(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._checkout_done(event.address, event.duration, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._checkout_done(event.address, event.duration, checked_out=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._count(event.address, checked_out=-1)
+
+    def reset(self):
+        # Called in a forked child, where the lock may be held by a thread that no longer exists
+        self._lock = threading.Lock()
+        self._servers = {}
+
+    def snapshot(self):
+        """
+        Current pool state of this process, one entry per server.
+        """
+        with self._lock:
+            servers = []
+            for (host, port), server in self._servers.items():
+                attempts = server["checkouts"] + server["checkout_failures"]
+                servers.append({
+                    "address": f"{host}:{port}",
+                    "open": server["open"],
+                    "checked_out": server["checked_out"],
+                    "idle": server["open"] - server["checked_out"],
+                    "waiting": server["waiting"],
+                    "created": server["created"],
+                    "closed": server["closed"],
+                    "cleared": server["cleared"],
+                    "checkouts": server["checkouts"],
+                    "checkout_failures": server["checkout_failures"],
+                    "wait_ms_avg": round(server["wait_total"] / attempts * 1000, 3) if attempts else None,
+                    "wait_ms_max": round(server["wait_max"] * 1000, 3),
+                })
+        return {"pid": os.getpid(), "options": client_options(), "servers": servers}
+
+
+pool_stats = PoolStats()
+_lock = threading.Lock()
+_async_client = None
+
+
+def client_options():
+    """
+    Pool, timeout and compression options from env.py, as MongoClient kwargs.
+    """
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "compressors": MONGO_COMPRESSORS,
+    }
+    return {name: value for name, value in options.items() if value}
+
+
+def connect():
+    """
+    Register the process-wide client with MongoEngine.
+
+    The client is created with `connect=False`, so no socket or monitor thread
+    exists until the first query. A pre-fork server importing settings in its
+    master therefore hands every worker an unopened client.
+    """
+    return mongoengine.connect(db=MONGO_DB_NAME,
+                               host=MONGO_DB_HOST,
+                               port=MONGO_DB_PORT,
+                               username=MONGO_DB_USERNAME,
+                               password=MONGO_DB_PASSWORD,
+                               connect=False,
+                               event_listeners=[pool_stats, command_profiler, command_metrics],
+                               **client_options())
+
+
+def get_client():
+    """
+    The shared MongoClient, the same one MongoEngine documents use.
+    """
+    return get_connection()
+
+
+def get_async_client():
+    """
+    The shared AsyncMongoClient of the async views, created on first use so
+    it binds to the server's event loop.
+    """
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            _async_client = AsyncMongoClient(host=MONGO_DB_HOST,
+                                             port=MONGO_DB_PORT,
+                                             username=MONGO_DB_USERNAME,
+                                             password=MONGO_DB_PASSWORD,
+                                             event_listeners=[pool_stats, command_profiler, command_metrics],
+                                             **client_options())
+        return _async_client
+
+
+def _after_fork_in_child():
+    # Sockets and monitor threads of the parent's clients are unusable here;
+    # start over with unopened clients and empty counters
+    global _async_client, _lock
+    _lock = threading.Lock()
+    _async_client = None
+    pool_stats.reset()
+    command_metrics.reset()
+    mongoengine.disconnect_all()
+    connect()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
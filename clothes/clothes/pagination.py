@@ -0,0 +1,82 @@
+import base64
+import json
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+# Tombstoned documents all carry their delete job, so the sparse delete_job index counts them
+TOMBSTONED = {'delete_job': {'$exists': True}}
+
+
+def encode_cursor(value):
+    """
+    Wrap the last key of a page into an opaque, URL-safe cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps({"after": value}).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Recover the key a cursor points after; None when no cursor was given.
+    """
+    if not cursor:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))["after"]
+    except (ValueError, TypeError, KeyError):
+        raise ValidationError({"cursor": "Invalid cursor."})
+
+
+def get_limit(params):
+    """
+    Resolve the page size from the `limit` query param, capped at LIST_MAX_PAGE_SIZE.
+    """
+    try:
+        limit = int(params.get('limit', settings.LIST_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise ValidationError({"limit": "Limit must be an integer."})
+    if limit < 1:
+        raise ValidationError({"limit": "Limit must be positive."})
+    return min(limit, settings.LIST_MAX_PAGE_SIZE)
+
+
+def paginate(queryset, key, request):
+    """
+    Fetch one keyset page of a queryset.
+
+    Pages are ordered by a unique indexed key and continue with `key > last key`,
+    so every page costs the same index range scan no matter how deep it is.
+
+    Args:
+    - queryset: Base MongoEngine queryset, possibly `as_pymongo()`
+    - key: Unique indexed natural key to order by
+    - request: Request carrying `?limit=` and `?cursor=`
+
+    Returns:
+    - (documents on this page, cursor for the next page or None)
+    """
+    limit = get_limit(request.query_params)
+    after = decode_cursor(request.query_params.get('cursor'))
+    if after is not None:
+        queryset = queryset.filter(**{f"{key}__gt": after})
+
+    # Fetch one extra document to know whether another page exists
+    documents = list(queryset.order_by(key).limit(limit + 1))
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(last[key] if isinstance(last, dict) else getattr(last, key))
+    return documents, next_cursor
+
+
+def paginated_response(request, results, next_cursor, model_class):
+    """
+    Build a page response; `?count=1` adds the number of live documents: the
+    collection's estimated size less its tombstoned documents.
+    """
+    body = {"results": results, "next": next_cursor}
+    if request.query_params.get('count') in ('1', 'true'):
+        collection = model_class._get_collection()
+        body["count"] = collection.estimated_document_count() - collection.count_documents(TOMBSTONED)
+    return Response(body)
@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from django.conf import settings
+from mongoengine.errors import ValidationError as DocumentValidationError
+from .models import Customer, Product, Feedback
+
+# Shard functions run in worker processes started with `spawn`: they may only
+# use batch_validation and the document classes, never settings or the database.
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def get_pool():
+    """
+    This process's validation pool, created on first use.
+    """
+    global _pool, _pool_pid
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # Spawned workers start clean instead of inheriting Mongo clients and threads
+            _pool = ProcessPoolExecutor(max_workers=settings.VALIDATION_WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def shards(items, start=0):
+    """
+    Split a payload into VALIDATION_SHARD_SIZE slices.
+
+    Returns:
+    - List of (index of the first item, items)
+    """
+    size = max(settings.VALIDATION_SHARD_SIZE, 1)
+    return [(start + offset, items[offset:offset + size]) for offset in range(0, len(items), size)]
+
+
+def imap_shards(function, arguments):
+    """
+    Run `function(*args)` for every shard of an iterable, yielding the
+    results in shard order as each one is ready.
+
+    Shards are taken from `arguments` and handed to the process pool only as
+    results are consumed, at most twice VALIDATION_WORKERS ahead, so a caller
+    writing each result keeps the workers validating the next shards without
+    reading the whole input first. A single shard, or VALIDATION_WORKERS
+    below 2, runs in this process.
+    """
+    arguments = iter(arguments)
+    ahead = list(islice(arguments, 2))
+    if len(ahead) < 2 or settings.VALIDATION_WORKERS < 2:
+        for args in chain(ahead, arguments):
+            yield function(*args)
+        return
+
+    pool, pending = get_pool(), deque()
+    for args in chain(ahead, arguments):
+        pending.append(pool.submit(function, *args))
+        if len(pending) >= 2 * settings.VALIDATION_WORKERS:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def map_shards(function, arguments):
+    """
+    Run `function(*args)` for every shard, see imap_shards.
+
+    Results come back in shard order, so merged errors keep the row order.
+    """
+    return list(imap_shards(function, arguments))
+
+
+def document_errors(exc):
+    """
+    Flatten a MongoEngine ValidationError into something JSON serializable.
+    """
+    return exc.to_dict() or [str(exc.message)]
+
+
+def validate_shard(validator, model_class, rows, start):
+    """
+    Validate one shard column by column and build its documents.
+
+    Returns:
+    - (list of (row index, unsaved document), list of row errors)
+    """
+    validated, failed = validator(rows)
+    errors = [{"index": start + position, "errors": row_errors} for position, row_errors in failed]
+    # The batch validator already applies the model's rules
+    return [(start + position, model_class(**data)) for position, data in validated], errors
+
+
+def feedback_shard(entries, errors=()):
+    """
+    Build and validate Feedback documents whose references are already resolved.
+
+    Args:
+    - entries: List of (row index, row, (customer pk, user_id), (product pk, item_id))
+    - errors: Errors already found in the shard's rows, e.g. missing references
+
+    Returns:
+    - (list of (row index, unsaved Feedback), list of row errors)
+    """
+    validated, errors = [], list(errors)
+    for index, feedback_data, (customer_pk, user_id), (product_pk, item_id) in entries:
+        feedback = Feedback(
+            review_id=feedback_data.get('review_id'),
+            fit=feedback_data.get('fit'),
+            length=feedback_data.get('length'),
+            review_text=feedback_data.get('review_text'),
+            review_summary=feedback_data.get('review_summary'),
+            customer=Customer(id=customer_pk, user_id=user_id),
+            product=Product(id=product_pk, item_id=item_id)
+        )
+        try:
+            feedback.validate()
+        except DocumentValidationError as e:
+            errors.append({"index": index, "errors": document_errors(e)})
+            continue
+        validated.append((index, feedback))
+    return validated, errors
@@ -0,0 +1,155 @@
+import contextvars
+import logging
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('query_stats', default=None)
+
+
+class QueryStats:
+    """
+    Mongo commands issued within one request (or one `profile()` block).
+
+    Commands are counted in the enclosing block's stats as well, so a
+    request made by a test inside `assert_max_queries` still counts there.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.commands = 0
+        self.failed = 0
+        self.duration_ms = 0.0
+        self.documents = 0
+        self.names = []
+
+    def record(self, name, duration_micros, documents=0, failed=False):
+        self.commands += 1
+        self.failed += failed
+        self.duration_ms += duration_micros / 1000
+        self.documents += documents
+        self.names.append(name)
+        if self.parent is not None:
+            self.parent.record(name, duration_micros, documents, failed)
+
+    def over_budget(self):
+        """
+        Names of the QUERY_BUDGET_* limits this request exceeded.
+        """
+        budgets = (
+            ('commands', self.commands, settings.QUERY_BUDGET_COMMANDS),
+            ('db_ms', self.duration_ms, settings.QUERY_BUDGET_DB_MS),
+            ('documents', self.documents, settings.QUERY_BUDGET_DOCUMENTS),
+        )
+        return [name for name, value, budget in budgets if budget and value > budget]
+
+    def server_timing(self):
+        return (f'db;dur={self.duration_ms:.3f};desc="Mongo", db-commands;desc="{self.commands}", '
+                f'db-docs;desc="{self.documents}"')
+
+
+def returned_documents(reply):
+    cursor = reply.get('cursor') if isinstance(reply, dict) else None
+    if not isinstance(cursor, dict):
+        return 0
+    return len(cursor.get('firstBatch', cursor.get('nextBatch', ())))
+
+
+class CommandProfiler(monitoring.CommandListener):
+    """
+    Adds every command to the QueryStats of the request it was issued from.
+
+    Events are published in the thread or task running the command, so the
+    context variable set by the middleware is visible; commands of background
+    jobs are not attributed to any request.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        stats = _current.get()
+        if stats is not None:
+            stats.record(event.command_name, event.duration_micros, returned_documents(event.reply))
+
+    def failed(self, event):
+        stats = _current.get()
+        if stats is not None:
+            stats.record(event.command_name, event.duration_micros, failed=True)
+
+
+command_profiler = CommandProfiler()
+
+
+@contextmanager
+def profile():
+    """
+    Collect the Mongo commands issued inside the block.
+
+    Yields:
+    - The QueryStats being filled
+    """
+    stats = QueryStats(_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """
+    Fail when the block issues more than `limit` Mongo commands, e.g. to catch
+    a list view dereferencing references one document at a time:
+
+        with assert_max_queries(2):
+            client.get('/feedbacks/')
+    """
+    with profile() as stats:
+        yield stats
+    if stats.commands > limit:
+        raise AssertionError(f"{stats.commands} Mongo commands issued, expected at most {limit}: "
+                             f"{', '.join(stats.names)}")
+
+
+class QueryProfileMiddleware:
+    """
+    Report the Mongo commands, database time and documents returned of each
+    request in a `Server-Timing` header, and log requests over the
+    QUERY_BUDGET_* limits.
+
+    A streamed response is measured up to its first byte; the rows sent
+    afterwards are fetched outside the middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with profile() as stats:
+            response = self.get_response(request)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        with profile() as stats:
+            response = await self.get_response(request)
+        return self.report(request, response, stats)
+
+    def report(self, request, response, stats):
+        response['Server-Timing'] = stats.server_timing()
+        exceeded = stats.over_budget()
+        if exceeded:
+            logger.warning("%s %s over query budget (%s): %d commands, %.1f ms, %d documents",
+                           request.method, request.path, ', '.join(exceeded),
+                           stats.commands, stats.duration_ms, stats.documents)
+        return response
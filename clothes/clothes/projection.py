@@ -0,0 +1,71 @@
+from datetime import datetime
+from rest_framework.exceptions import ValidationError
+from .models import Customer, Feedback
+from .serializers import format_height, format_measurement
+
+# Serializer fields stored under a different name in the collection
+DB_FIELDS = {
+    Feedback: {'customer_id': 'user_id', 'product_id': 'item_id'},
+}
+
+# Stored values the serializers render differently: field -> formatter
+FORMATTERS = {
+    Customer: {'waist': format_measurement, 'bra_size': format_measurement, 'hips': format_measurement,
+               'bust': format_measurement, 'height': format_height},
+}
+
+
+def get_fields(params, serializer_class):
+    """
+    Parse the `fields` query param into a sparse fieldset.
+
+    Returns:
+    - List of requested serializer field names, or None when all fields are wanted
+    """
+    raw = params.get('fields')
+    if not raw:
+        return None
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    available = serializer_class().fields
+    unknown = [field for field in fields if field not in available]
+    if unknown or not fields:
+        raise ValidationError({"fields": f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}."})
+    return fields
+
+
+def db_fields(model_class, fields):
+    """
+    Map serializer field names to the stored field names of a model.
+    """
+    mapping = DB_FIELDS.get(model_class, {})
+    return [mapping.get(field, field) for field in fields]
+
+
+def project(queryset, model_class, key, fields):
+    """
+    Restrict a queryset to the requested fields and return raw pymongo documents.
+
+    The natural key is always included so keyset pagination keeps working.
+    """
+    return queryset.only(*set(db_fields(model_class, fields) + [key])).as_pymongo()
+
+
+def render_rows(model_class, documents, fields):
+    """
+    Render raw documents in the same shape the model's serializer would.
+    """
+    mapping = DB_FIELDS.get(model_class, {})
+    formatters = FORMATTERS.get(model_class, {})
+    rows = []
+    for document in documents:
+        row = {}
+        for field in fields:
+            value = document.get(mapping.get(field, field))
+            if isinstance(value, datetime):
+                value = value.date().isoformat()
+            elif field in formatters:
+                value = formatters[field](value)
+            row[field] = value
+        rows.append(row)
+    return rows
+
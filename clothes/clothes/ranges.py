@@ -0,0 +1,73 @@
+from rest_framework.exceptions import ValidationError
+from .batch_validation import height_inches
+from .models import Customer
+from .pagination import encode_cursor, decode_cursor, get_limit
+from .projection import get_fields, render_rows
+from .serializers import CustomerSerializer
+
+RANGE_FIELDS = ('waist', 'hips', 'bust', 'bra_size', 'height')
+OPERATORS = ('gt', 'gte', 'lt', 'lte')
+
+# Query params that aren't ranges
+PAGE_PARAMS = ('limit', 'cursor', 'fields')
+
+# Fields of the `measurements` index, in order; pages follow it so no sort happens in memory
+INDEX_ORDER = ('waist', 'hips', 'bust', 'user_id')
+
+
+def range_query(params):
+    """
+    Build the filter of a measurement range search from `<field>__<op>`
+    params, e.g. `waist__gte=28&waist__lte=32`.
+
+    Heights may be given in inches or as feet'inches (5'6).
+    """
+    query = {}
+    for name, value in params.items():
+        if name in PAGE_PARAMS:
+            continue
+        field, _, operator = name.partition('__')
+        if field not in RANGE_FIELDS or operator not in OPERATORS:
+            raise ValidationError({name: f"Unknown range. Use <field>__<op> with a field of "
+                                         f"{', '.join(RANGE_FIELDS)} and an op of {', '.join(OPERATORS)}."})
+        try:
+            query.setdefault(field, {})[f"${operator}"] = float(height_inches(value) if field == 'height' else value)
+        except ValueError:
+            raise ValidationError({name: "Must be a number."})
+    if not query:
+        raise ValidationError({"detail": "Give at least one range, e.g. waist__gte=28."})
+    return query
+
+
+def range_page(params):
+    """
+    Fetch one page of customers within the requested measurement ranges.
+
+    Pages are ordered like the `measurements` index and continue after the
+    (waist, hips, bust, user_id) of the cursor, so the index both narrows
+    the scan and orders it.
+
+    Returns:
+    - Response body with `results` and the `next` cursor
+    """
+    query = range_query(params)
+    after = decode_cursor(params.get('cursor'))
+    if after is not None:
+        if not (isinstance(after, list) and len(after) == len(INDEX_ORDER)):
+            raise ValidationError({"cursor": "Invalid cursor."})
+        # (w, h, b, u) > after: greater on one field, equal on every field before it
+        query = {"$and": [query, {"$or": [
+            {**dict(zip(INDEX_ORDER[:position], after)), INDEX_ORDER[position]: {"$gt": after[position]}}
+            for position in range(len(INDEX_ORDER))
+        ]}]}
+
+    fields = get_fields(params, CustomerSerializer) or list(CustomerSerializer().fields)
+    limit = get_limit(params)
+    # One extra document tells whether another page exists
+    documents = list(Customer.objects(__raw__=query).only(*set(fields) | set(INDEX_ORDER))
+                     .order_by(*INDEX_ORDER).hint('measurements').limit(limit + 1).as_pymongo())
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor([documents[-1][field] for field in INDEX_ORDER])
+    return {"results": render_rows(Customer, documents, fields), "next": next_cursor}
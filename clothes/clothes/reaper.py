@@ -0,0 +1,165 @@
+import logging
+import time
+from itertools import islice
+from django.conf import settings
+from .cache import detail_cache
+from .counters import COUNTED_FIELDS, count_feedback
+from .facets import FACET_FIELDS, record
+from .jobs import create_job, submit
+from .models import Customer, Product, Feedback, utc_now
+from .versioning import bump_collection
+
+logger = logging.getLogger(__name__)
+
+# Tombstoned collections and the natural key their feedback refers to them by
+PARENTS = {
+    'customers': (Customer, 'user_id'),
+    'products': (Product, 'item_id'),
+}
+
+# Detail cache namespace of each tombstoned collection
+NAMESPACES = {
+    'customers': 'customer',
+    'products': 'product',
+}
+
+
+def delete_in_background(request, queryset):
+    """
+    Tombstone every document of a customer or product queryset and queue a
+    job removing the documents and their feedback.
+
+    The request only pays for one `update_many` on the documents, which
+    readers stop seeing as soon as it returns; their feedback is tombstoned
+    by the job (see tombstone_dependents). A request repeated with the same
+    Idempotency-Key gets the original job back.
+
+    Returns:
+    - (number of documents tombstoned, the Job or None when nothing matched)
+    """
+    model_class = queryset._document
+    # Saved first so every tombstone points at a job that exists
+    job, created = create_job(request, 'cascade_delete', model_class._meta['collection'])
+    if not created:
+        return job.total, job
+
+    now = utc_now()
+    count = queryset.update(set__deleted_at=now, set__delete_job=job.job_id,
+                            set__updated_at=now, inc__version=1)
+    if not count:
+        job.delete()
+        return 0, None
+
+    job.total = count
+    job.save()
+    bump_collection(model_class)
+    submit(job.job_id)
+    return count, job
+
+
+def tombstone_dependents(job, progress):
+    """
+    Tombstone the feedback of a job's tombstoned documents, one `update_many`
+    per chunk of REAPER_CHUNK_SIZE natural keys, so lists and searches stop
+    showing it well before the reaper gets to it. Until then, reads of one
+    feedback or of a customer's or product's feedback check the parent.
+
+    Feedback already tombstoned is left alone, so a resumed run only
+    repeats the reads.
+    """
+    model_class, key = PARENTS[job.target]
+    chunk_size = settings.REAPER_CHUNK_SIZE
+    # One cursor over the job's tombstones, read a chunk at a time
+    tombstoned = model_class._get_collection().find({'delete_job': job.job_id}, {key: 1}).batch_size(chunk_size)
+    while True:
+        documents = list(islice(tombstoned, chunk_size))
+        if not documents:
+            return
+        now = utc_now()
+        Feedback.objects(**{f"{key}__in": [document[key] for document in documents]}).update(
+            set__deleted_at=now, set__delete_job=job.job_id, set__updated_at=now, inc__version=1)
+        bump_collection(Feedback)
+        progress.commit(job.cursor)
+
+
+def tombstone_matching(job, progress):
+    """
+    Tombstone the documents matching a bulk delete job's `filter`, walking
+    them in `_id` order one chunk of `batch_size` per commit and waiting
+    BULK_SCAN_PAUSE between chunks, so a filter no index answers never
+    scans the collection inside one request.
+
+    A resumed run continues after the last tombstoned `_id`.
+    """
+    model_class, _ = PARENTS[job.target]
+    namespace = NAMESPACES[job.target]
+    filter_data = job.params['filter']
+    batch_size = job.params.get('batch_size') or settings.BULK_BATCH_SIZE
+    after = job.cursor
+    while True:
+        queryset = model_class.objects.filter(**filter_data).order_by('id')
+        if after is not None:
+            queryset = queryset.filter(id__gt=after)
+        ids = list(queryset.limit(batch_size).scalar('id'))
+        if not ids:
+            return
+        now = utc_now()
+        count = model_class.objects(id__in=ids).filter(**filter_data).update(
+            set__deleted_at=now, set__delete_job=job.job_id, set__updated_at=now, inc__version=1)
+        detail_cache.invalidate_all(namespace)
+        bump_collection(model_class)
+        after = ids[-1]
+        progress.commit(after, total=count)
+        if job.params.get('scan'):
+            time.sleep(settings.BULK_SCAN_PAUSE)
+
+
+def reap(job, progress):
+    """
+    Run a cascade delete job: tombstone the feedback of its tombstoned
+    documents, then remove that feedback and the documents, one chunk of
+    REAPER_CHUNK_SIZE natural keys at a time. Products leave the facets as
+    they are removed.
+
+    What is left to do is the set of tombstones still carrying the job id,
+    so a resumed run simply carries on with those.
+    """
+    model_class, key = PARENTS[job.target]
+    chunk_size = settings.REAPER_CHUNK_SIZE
+    tombstone_dependents(job, progress)
+    fields = FACET_FIELDS if model_class is Product else ()
+    while True:
+        documents = list(model_class.all_objects(delete_job=job.job_id).only(key, *fields)
+                         .limit(chunk_size).as_pymongo())
+        if not documents:
+            return
+        keys = [document[key] for document in documents]
+        deleted = delete_dependents(key, keys, chunk_size)
+        model_class.all_objects(delete_job=job.job_id, **{f"{key}__in": keys}).delete()
+        if model_class is Product:
+            # Only after the delete, so a replayed chunk is never taken out twice
+            record(removed=documents)
+        bump_collection(model_class, Feedback)
+        # The cursor stays put: for a bulk delete it marks how far tombstoning got
+        progress.commit(job.cursor, processed=len(keys), succeeded=len(keys), deleted_dependents=deleted)
+
+
+def delete_dependents(key, values, chunk_size):
+    """
+    Delete the feedback referring to a set of natural keys in `$in` chunks on
+    the indexed key field, dropping their cached details as they go.
+
+    Returns:
+    - Number of feedback documents deleted
+    """
+    deleted = 0
+    while True:
+        batch = list(Feedback.all_objects(**{f"{key}__in": values}).only('review_id', *COUNTED_FIELDS)
+                     .limit(chunk_size).as_pymongo())
+        if not batch:
+            return deleted
+        Feedback.all_objects(id__in=[document['_id'] for document in batch]).delete()
+        # Keeps the counters of the side that stays, e.g. the product of a deleted customer's review
+        count_feedback(removed=batch)
+        detail_cache.invalidate('feedback', *[document['review_id'] for document in batch])
+        deleted += len(batch)
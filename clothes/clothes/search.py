@@ -0,0 +1,85 @@
+from rest_framework.exceptions import ValidationError
+from .models import Feedback
+from .pagination import encode_cursor, decode_cursor, get_limit
+from .projection import get_fields, db_fields, render_rows
+from .serializers import FeedbackSerializer
+
+FITS = tuple(FeedbackSerializer().fields['fit'].choices)
+MAX_QUERY_LENGTH = 200
+
+# Query params filtering on an indexed field: param -> stored field
+FILTERS = {'customer_id': 'user_id', 'product_id': 'item_id'}
+
+
+def int_param(params, name):
+    try:
+        return int(params[name])
+    except (TypeError, ValueError):
+        raise ValidationError({name: "Must be an integer."})
+
+
+def search_pipeline(params):
+    """
+    Build the aggregation for one page of a relevance ranked review search.
+
+    Pages are ordered by text score, then review_id, and continue after the
+    (score, review_id) pair in the cursor, so deep pages don't re-rank the
+    earlier ones into the response.
+
+    Returns:
+    - (pipeline, page size, requested serializer fields)
+    """
+    query = (params.get('q') or '').strip()
+    if not query:
+        raise ValidationError({"q": "A search term is required."})
+    if len(query) > MAX_QUERY_LENGTH:
+        raise ValidationError({"q": f"Ensure the search has no more than {MAX_QUERY_LENGTH} characters."})
+
+    # Feedback tombstoned with its customer or product is left out
+    match = {"$text": {"$search": query}, "deleted_at": None}
+    for param, field in FILTERS.items():
+        if params.get(param):
+            match[field] = int_param(params, param)
+    if params.get('fit'):
+        if params['fit'] not in FITS:
+            raise ValidationError({"fit": f"Choose one of {', '.join(FITS)}."})
+        match['fit'] = params['fit']
+
+    fields = get_fields(params, FeedbackSerializer) or list(FeedbackSerializer().fields)
+    limit = get_limit(params)
+    pipeline = [
+        {"$match": match},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    after = decode_cursor(params.get('cursor'))
+    if after is not None:
+        if not (isinstance(after, list) and len(after) == 2):
+            raise ValidationError({"cursor": "Invalid cursor."})
+        score, review_id = after
+        pipeline.append({"$match": {"$or": [{"score": {"$lt": score}},
+                                             {"score": score, "review_id": {"$gt": review_id}}]}})
+    # One extra document tells whether another page exists
+    projection = dict.fromkeys(set(db_fields(Feedback, fields) + ['review_id', 'score']), 1)
+    pipeline += [
+        {"$sort": {"score": -1, "review_id": 1}},
+        {"$limit": limit + 1},
+        {"$project": {"_id": 0, **projection}},
+    ]
+    return pipeline, limit, fields
+
+
+def search_page(documents, limit, fields):
+    """
+    Render a fetched search page with each result's score.
+
+    Returns:
+    - Response body with `results` and the `next` cursor
+    """
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor([documents[-1]['score'], documents[-1]['review_id']])
+    results = render_rows(Feedback, documents, fields)
+    for row, document in zip(results, documents):
+        row['score'] = round(document['score'], 4)
+    return {"results": results, "next": next_cursor}
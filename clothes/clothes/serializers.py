@@ -1,8 +1,38 @@
 from rest_framework import serializers
 from .models import Customer, Product, Feedback
+from .batch_validation import BRA_SIZE_RE, HEIGHT_RE, MEASUREMENT_RE, VALID_CATEGORIES, MAX_KEYWORDS, store_measurements
 from rest_framework.exceptions import ValidationError
-import re
-from datetime import timedelta, date
+from datetime import timedelta, date, datetime, timezone
+
+def format_measurement(value):
+    """
+    Render a stored measurement the way it is written, e.g. 28.0 as "28".
+    """
+    return value if isinstance(value, str) or value is None else f"{value:g}"
+
+
+def format_height(value):
+    """
+    Render a height stored in inches as feet'inches, e.g. 66 as "5'6".
+    """
+    return value if isinstance(value, str) or value is None else f"{value // 12}'{value % 12}"
+
+
+class MeasurementField(serializers.CharField):
+    """
+    Measurement written as a decimal string and stored as a number.
+    """
+    def to_representation(self, value):
+        return format_measurement(value)
+
+
+class HeightField(serializers.CharField):
+    """
+    Height written as feet'inches and stored in inches.
+    """
+    def to_representation(self, value):
+        return format_height(value)
+
 
 class CustomerSerializer(serializers.Serializer):
     """
@@ -10,12 +40,12 @@ class CustomerSerializer(serializers.Serializer):
     """
     user_id = serializers.IntegerField(min_value=100000, max_value=999999)
     user_name = serializers.CharField(min_length=2, max_length=100)
-    waist = serializers.CharField(max_length=10)
+    waist = MeasurementField(max_length=10)
     cup_size = serializers.ChoiceField(choices=['AA', 'A', 'B', 'C', 'D', 'DD', 'E', 'F', 'G'])
-    bra_size = serializers.CharField(max_length=10)
-    hips = serializers.CharField(max_length=10)
-    bust = serializers.CharField(max_length=10)
-    height = serializers.CharField(max_length=10)
+    bra_size = MeasurementField(max_length=10)
+    hips = MeasurementField(max_length=10)
+    bust = MeasurementField(max_length=10)
+    height = HeightField(max_length=10)
 
     def validate_waist(self, value):
         """
@@ -37,7 +67,7 @@ class CustomerSerializer(serializers.Serializer):
         - Ensure band size is even number between 28-52
         - Validate format (numeric + optional letter)
         """
-        if not re.match(r'^(28|30|32|34|36|38|40|42|44|46|48|50|52)(?:[A-D]{0,1})?$', value):
+        if not BRA_SIZE_RE.match(value):
             raise ValidationError("Invalid bra size. Use format like '34B' or '36'.")
         return value
 
@@ -46,7 +76,7 @@ class CustomerSerializer(serializers.Serializer):
         Enhanced height validation
         - Ensure feet and inches are within reasonable ranges
         """
-        match = re.match(r'^(\d)\'(\d{1,2})$', value)
+        match = HEIGHT_RE.match(value)
         if not match:
             raise ValidationError("Height must be in format 5'6")
         
@@ -57,13 +87,23 @@ class CustomerSerializer(serializers.Serializer):
 
     def validate(self, data):
         """
-        Cross-field validation for waist and hips.
+        Cross-field validation for waist and hips, then conversion of the
+        measurements to the numbers they are stored as.
         """
-        waist = float(data['waist'])
-        hips = float(data['hips'])
+        try:
+            waist = float(data['waist'])
+            hips = float(data['hips'])
+        except ValueError:
+            raise ValidationError("Invalid measurement format for waist or hips.")
         if waist >= hips:
             raise ValidationError("Waist measurement must be less than hip measurement.")
-        return data
+        # The model's rule: measurements are plain decimals
+        errors = {field: [f"Invalid measurement format for '{data[field]}'."]
+                  for field in ('waist', 'bra_size', 'hips', 'bust')
+                  if field in data and not MEASUREMENT_RE.match(data[field])}
+        if errors:
+            raise ValidationError(errors)
+        return store_measurements(data)
 
     def create(self, validated_data):
         """
@@ -77,6 +117,7 @@ class CustomerSerializer(serializers.Serializer):
         """
         for key, value in validated_data.items():
             setattr(instance, key, value)
+        instance.touch()
         instance.save()
         return instance
 
@@ -103,8 +144,8 @@ class ProductSerializer(serializers.Serializer):
         - Limit number of keywords
         - Normalize keywords
         """
-        if len(value) > 5:
-            raise ValidationError("Maximum 5 keywords allowed.")
+        if len(value) > MAX_KEYWORDS:
+            raise ValidationError(f"Maximum {MAX_KEYWORDS} keywords allowed.")
         
         # Normalize and clean keywords
         cleaned_keywords = [
@@ -113,14 +154,9 @@ class ProductSerializer(serializers.Serializer):
             if keyword.strip()
         ]
         
-        # Optional: Check against a predefined list of valid product categories
-        valid_categories = [
-            'clothing', 'accessories', 'tops', 'bottoms', 'dresses', 
-            'underwear', 'sportswear', 'formal', 'casual', 'shoes'
-        ]
-        
+        # Check against the predefined set of valid product categories
         for keyword in cleaned_keywords:
-            if keyword not in valid_categories:
+            if keyword not in VALID_CATEGORIES:
                 raise ValidationError(f"Keyword '{keyword}' is not a valid product category.")
         
         return cleaned_keywords
@@ -156,6 +192,7 @@ class ProductSerializer(serializers.Serializer):
         for key, value in validated_data.items():
             setattr(instance, key, value)
         instance.clean()  # Trigger model-level validation
+        instance.touch()
         instance.save()
         return instance
 
@@ -168,8 +205,8 @@ class FeedbackSerializer(serializers.Serializer):
     length = serializers.ChoiceField(choices=['Short', 'Regular', 'Long'], required=False)
     review_text = serializers.CharField(max_length=1000, required=False)
     review_summary = serializers.CharField(max_length=255, required=False)
-    customer_id = serializers.IntegerField(source='customer.user_id')
-    product_id = serializers.IntegerField(source='product.item_id')
+    customer_id = serializers.IntegerField(source='user_id')
+    product_id = serializers.IntegerField(source='item_id')
 
     def validate_review_text(self, value):
         """
@@ -217,9 +254,61 @@ class FeedbackSerializer(serializers.Serializer):
         """
         Create a new Feedback instance.
         """
-        validated_data['customer'] = Customer.objects.get(user_id=validated_data.pop('customer_id'))
-        validated_data['product'] = Product.objects.get(item_id=validated_data.pop('product_id'))
+        validated_data['customer'] = Customer.objects.get(user_id=validated_data['user_id'])
+        validated_data['product'] = Product.objects.get(item_id=validated_data['item_id'])
         feedback = Feedback(**validated_data)
         feedback.clean()
         feedback.save()
         return feedback
+
+    def update(self, instance, validated_data):
+        """
+        Update a Feedback instance, re-resolving references whose keys changed.
+        """
+        if 'user_id' in validated_data:
+            validated_data['customer'] = Customer.objects.get(user_id=validated_data['user_id'])
+        if 'item_id' in validated_data:
+            validated_data['product'] = Product.objects.get(item_id=validated_data['item_id'])
+        for key, value in validated_data.items():
+            setattr(instance, key, value)
+        instance.clean()
+        instance.touch()
+        instance.save()
+        return instance
+
+class JobSerializer(serializers.Serializer):
+    """
+    Read-only view of a background job and its progress.
+
+    Mongo hands back naive UTC datetimes, so times are rendered in UTC.
+    """
+    job_id = serializers.CharField(read_only=True)
+    kind = serializers.CharField(read_only=True)
+    target = serializers.CharField(read_only=True)
+    status = serializers.CharField(read_only=True)
+    total = serializers.IntegerField(read_only=True)
+    processed = serializers.IntegerField(read_only=True)
+    failed = serializers.IntegerField(read_only=True)
+    succeeded = serializers.IntegerField(read_only=True)
+    deleted_dependents = serializers.IntegerField(read_only=True)
+    rows_per_second = serializers.SerializerMethodField()
+    errors = serializers.ListField(read_only=True)
+    error = serializers.CharField(read_only=True)
+    cancel_requested = serializers.BooleanField(read_only=True)
+    attempts = serializers.IntegerField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True, default_timezone=timezone.utc)
+    started_at = serializers.DateTimeField(read_only=True, default_timezone=timezone.utc)
+    heartbeat_at = serializers.DateTimeField(read_only=True, default_timezone=timezone.utc)
+    finished_at = serializers.DateTimeField(read_only=True, default_timezone=timezone.utc)
+
+    def get_rows_per_second(self, job):
+        """
+        Throughput since the job started, up to now or its end.
+        """
+        if not job.started_at:
+            return None
+        end = job.finished_at or datetime.now(timezone.utc)
+        if job.started_at.tzinfo is None:
+            end = end.replace(tzinfo=None)
+        elapsed = (end - job.started_at).total_seconds()
+        return round(job.processed / elapsed, 1) if elapsed > 0 else None
@@ -10,6 +10,19 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 from .env import MONGO_DB_NAME, MONGO_DB_HOST, MONGO_DB_PORT, MONGO_DB_USERNAME, MONGO_DB_PASSWORD
+from .env import BULK_BATCH_SIZE, BULK_MAX_REPORTED_ERRORS
+from .env import LIST_PAGE_SIZE, LIST_MAX_PAGE_SIZE
+from .env import DETAIL_CACHE_BACKEND, DETAIL_CACHE_ALIAS, DETAIL_CACHE_MAX_ENTRIES, DETAIL_CACHE_TTL
+from .env import DETAIL_CACHE_SYNC_SECONDS
+from .env import ASYNC_READS
+from .env import REAPER_CHUNK_SIZE
+from .env import JOB_WORKERS, JOB_LEASE_SECONDS, JOB_SWEEP_SECONDS, BULK_ASYNC_ROWS
+from .env import VALIDATION_WORKERS, VALIDATION_SHARD_SIZE
+from .env import QUERY_BUDGET_COMMANDS, QUERY_BUDGET_DB_MS, QUERY_BUDGET_DOCUMENTS
+from .env import PROMETHEUS_MULTIPROC_DIR
+from .env import FIT_NEIGHBOURS, FIT_MAX_NEIGHBOURS
+from .env import EXPORT_BATCH_SIZE
+from .env import BULK_SCAN_PAUSE
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +55,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'clothes.metrics.MetricsMiddleware',
+    'clothes.profiling.QueryProfileMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,16 +94,10 @@ WSGI_APPLICATION = 'clothes.wsgi.application'
 # Head over to C:\Users\escob\Documents\Ateneo\db_app\multi_app\Lib\site-packages\djongo\base.py
 # change line 208 between: if self.connection is not None: (or ommit "is not None")
 
-# Import MongoEngine
-from mongoengine import connect
+# Register the process-wide Mongo client (pool options come from env.py)
+from .mongo import connect
 
-connect(
-    db=MONGO_DB_NAME,
-    host=MONGO_DB_HOST,
-    port=MONGO_DB_PORT,
-    username=MONGO_DB_USERNAME,
-    password=MONGO_DB_PASSWORD
-)
+connect()
 
 DATABASES = {}
 
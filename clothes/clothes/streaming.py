@@ -0,0 +1,149 @@
+import codecs
+import json
+from django.http import StreamingHttpResponse
+from .pagination import decode_cursor
+from .projection import project, render_rows
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+READ_CHUNK_SIZE = 64 * 1024
+STREAM_BATCH_SIZE = 500
+
+
+class StreamParseError(ValueError):
+    """
+    Raised when a streamed request body stops being valid NDJSON / JSON.
+    """
+
+
+def is_streaming_upload(request):
+    """
+    A bulk upload is streamed when it is NDJSON or a JSON array sent with `?stream=1`.
+    """
+    if request.content_type.startswith(NDJSON_MEDIA_TYPE):
+        return True
+    return request.query_params.get('stream') in ('1', 'true')
+
+
+def iter_records(request):
+    """
+    Parse records from the raw request body one at a time.
+
+    The body is read in fixed-size chunks straight from the request stream, so
+    only the record being decoded is held in memory, never the whole payload.
+    """
+    stream = request.stream
+    if stream is None:
+        return iter(())
+    if request.content_type.startswith(NDJSON_MEDIA_TYPE):
+        return iter_ndjson(stream)
+    return iter_json_array(stream)
+
+
+def iter_ndjson(stream):
+    """
+    Yield one decoded record per non-blank line.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise StreamParseError(f"Invalid JSON on line {line_number}: {e}")
+
+
+def iter_json_array(stream):
+    """
+    Yield the elements of a top-level JSON array without decoding it all at once.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer, position, eof = '', 0, False
+    expect = '['
+
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+
+        need_more = position == len(buffer)
+        if not need_more:
+            char = buffer[position]
+            if expect == '[':
+                if char != '[':
+                    raise StreamParseError("Expected a JSON array.")
+                position += 1
+                expect = 'first'
+                continue
+            if expect == ',' or (expect == 'first' and char == ']'):
+                if char == ']':
+                    return
+                if char != ',':
+                    raise StreamParseError(f"Expected ',' or ']' but found {char!r}.")
+                position += 1
+                expect = 'value'
+                continue
+
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                value, end = None, None
+            # A value touching the end of the buffer may continue in the next chunk
+            need_more = (end is None or end == len(buffer)) and not eof
+            if not need_more:
+                if end is None:
+                    raise StreamParseError("Invalid JSON value in array.")
+                yield value
+                position = end
+                expect = ','
+                continue
+
+        if eof:
+            raise StreamParseError("Unexpected end of JSON array.")
+        buffer, position = buffer[position:], 0
+        chunk = stream.read(READ_CHUNK_SIZE)
+        eof = not chunk
+        buffer += text.decode(chunk, final=eof)
+
+
+def is_streaming_list(request):
+    """
+    A list response is streamed when requested with `?stream=1`.
+    """
+    return request.query_params.get('stream') in ('1', 'true')
+
+
+def stream_list(request, model_class, serializer_class, key, fields=None):
+    """
+    Stream a whole collection as one JSON array, ordered by its natural key.
+
+    Documents are read as raw pymongo dicts in cursor batches and each batch is
+    written out as soon as it is rendered, so neither the queryset nor the
+    response body is ever held in memory in full. `?cursor=` resumes after a
+    previous page like the paginated lists do.
+    """
+    fields = fields or list(serializer_class().fields)
+    queryset = model_class.objects.all()
+    after = decode_cursor(request.query_params.get('cursor'))
+    if after is not None:
+        queryset = queryset.filter(**{f"{key}__gt": after})
+    documents = project(queryset.order_by(key), model_class, key, fields).batch_size(STREAM_BATCH_SIZE)
+
+    def generate():
+        yield '['
+        separator = ''
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) == STREAM_BATCH_SIZE:
+                yield separator + _dump_rows(model_class, batch, fields)
+                separator, batch = ',', []
+        if batch:
+            yield separator + _dump_rows(model_class, batch, fields)
+        yield ']'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
+
+
+def _dump_rows(model_class, documents, fields):
+    return ','.join(json.dumps(row) for row in render_rows(model_class, documents, fields))
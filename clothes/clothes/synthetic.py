@@ -0,0 +1,121 @@
+from datetime import date, datetime, timedelta
+from bson import ObjectId
+from .batch_validation import CUP_SIZES, CLOTH_SIZE_CATEGORIES, VALID_CATEGORIES, store_measurements
+from .models import utc_now
+
+# Synthetic rows for benchmarks. Every generated row passes the serializer and
+# model rules, so uploads of generated data measure the write path, not errors.
+
+MIN_KEY, MAX_KEY = 100000, 999999
+
+FIRST_NAMES = ('Alice', 'Bob', 'Charlie', 'David', 'Emma', 'Fatima', 'George', 'Hana', 'Ivan', 'Julia',
+               'Kenji', 'Laura', 'Mateo', 'Nora', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sven', 'Tara')
+LAST_NAMES = ('Smith', 'Garcia', 'Müller', 'Rossi', 'Kowalski', 'Silva', 'Tanaka', 'Nguyen', 'Brown', 'Dubois')
+PRODUCT_NAMES = ('T-Shirt', 'Jeans', 'Jacket', 'Dress', 'Sweater', 'Skirt', 'Shorts', 'Blouse', 'Hoodie',
+                 'Leggings', 'Coat', 'Sneakers', 'Scarf', 'Pajamas', 'Blazer')
+BRA_BANDS = ('28', '30', '32', '34', '36', '38', '40', '42', '44', '46', '48', '50', '52')
+FITS = ('Tight', 'Loose', 'Perfect')
+LENGTHS = ('Short', 'Regular', 'Long')
+CATEGORIES = sorted(VALID_CATEGORIES)
+
+# No 'free', 'buy now' or 'click here': FeedbackSerializer rejects them as spam
+FIT_PHRASES = {'Tight': 'runs a size small', 'Loose': 'runs a size large', 'Perfect': 'fits true to size'}
+LENGTH_PHRASES = {'Short': 'shorter than expected', 'Regular': 'just as described', 'Long': 'longer than expected'}
+OPINIONS = ('The fabric feels soft and well made.', 'The stitching came loose after a few washes.',
+            'The colour matches the photos.', 'It wrinkles easily but looks great.',
+            'Comfortable enough to wear all day.')
+
+
+def check_range(start, count):
+    """
+    Raise ValueError when `count` keys from `start` leave the models' six digit key range.
+    """
+    if start < MIN_KEY or start + count - 1 > MAX_KEY:
+        raise ValueError(f"Keys {start}..{start + count - 1} are outside {MIN_KEY}..{MAX_KEY}.")
+
+
+def customer_rows(rng, start, count):
+    """
+    Yield customer payloads with consecutive user_ids from `start`.
+    """
+    for user_id in range(start, start + count):
+        waist = rng.randint(22, 44)
+        yield {
+            "user_id": user_id,
+            "user_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "waist": str(waist),
+            "cup_size": rng.choice(CUP_SIZES),
+            "bra_size": rng.choice(BRA_BANDS),
+            "hips": str(waist + rng.randint(4, 14)),
+            "bust": str(rng.randint(30, 48)),
+            "height": f"{rng.randint(4, 6)}'{rng.randint(0, 11)}",
+        }
+
+
+def product_rows(rng, start, count, today=None):
+    """
+    Yield product payloads with consecutive item_ids from `start`, updated
+    within the last five years.
+    """
+    today = today or date.today()
+    for item_id in range(start, start + count):
+        yield {
+            "item_id": item_id,
+            "product_name": rng.choice(PRODUCT_NAMES),
+            "size": rng.randint(0, 50),
+            "quality": rng.randint(1, 5),
+            "keywords": rng.sample(CATEGORIES, rng.randint(1, 3)),
+            "cloth_size_category": rng.choice(CLOTH_SIZE_CATEGORIES),
+            "last_update_date": (today - timedelta(days=rng.randint(0, 365 * 5 - 1))).isoformat(),
+        }
+
+
+def feedback_rows(rng, start, count, user_ids, item_ids):
+    """
+    Yield feedback payloads with consecutive review_ids from `start`, each
+    referring to a customer and product picked from the given keys.
+    """
+    for review_id in range(start, start + count):
+        fit, length = rng.choice(FITS), rng.choice(LENGTHS)
+        yield {
+            "review_id": review_id,
+            "fit": fit,
+            "length": length,
+            "review_text": f"It {FIT_PHRASES[fit]} and the length is {LENGTH_PHRASES[length]}. {rng.choice(OPINIONS)}",
+            "review_summary": f"{fit} fit, {length.lower()} length",
+            "customer_id": rng.choice(user_ids),
+            "product_id": rng.choice(item_ids),
+        }
+
+
+def as_document(row, now=None):
+    """
+    Turn a customer or product payload into the raw document its model
+    would store, for inserting without building Document instances.
+    """
+    document = {"_id": ObjectId(), **row, "version": 1, "updated_at": now or utc_now()}
+    if "height" in document:
+        store_measurements(document)
+    if "last_update_date" in document:
+        document["last_update_date"] = datetime.combine(date.fromisoformat(document["last_update_date"]), datetime.min.time())
+    return document
+
+
+def as_feedback_document(row, customers, products, now=None):
+    """
+    Turn a feedback payload into the raw document Feedback would store.
+
+    Args:
+    - customers, products: Dicts mapping natural keys to ObjectIds
+    """
+    document = {key: value for key, value in row.items() if key not in ('customer_id', 'product_id')}
+    document.update({
+        "_id": ObjectId(),
+        "customer": customers[row["customer_id"]],
+        "product": products[row["product_id"]],
+        "user_id": row["customer_id"],
+        "item_id": row["product_id"],
+        "version": 1,
+        "updated_at": now or utc_now(),
+    })
+    return document
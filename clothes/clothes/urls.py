@@ -15,8 +15,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
-from . import views
+from . import views, async_views
+
+# The read endpoints have an async twin for ASGI deployments
+reads = async_views if settings.ASYNC_READS else views
 
 urlpatterns = [
     # Create (POST)
@@ -29,14 +33,24 @@ urlpatterns = [
 
 
     # Read (GET)
-    path('customers/', views.customer_list, name='customer_list'),
-    path('products/', views.product_list, name='product_list'),
-    path('feedbacks/', views.feedback_list, name='feedback_list'),
-    path('customers/<int:customer_id>/', views.customer_detail, name='customer_detail'),
-    path('products/<int:product_id>/', views.product_detail, name='product_detail'),
-    path('feedbacks/<int:feedback_id>/', views.feedback_detail, name='feedback_detail'),
-    path('customers/<int:user_id>/feedbacks/', views.customer_feedbacks, name='customer_feedbacks'),
-    path('products/<int:item_id>/feedbacks/', views.product_feedbacks, name='product_feedbacks'),
+    path('customers/', reads.customer_list, name='customer_list'),
+    path('customers/range/', views.customer_range, name='customer_range'),
+    path('products/', reads.product_list, name='product_list'),
+    path('products/facets/', reads.product_facets, name='product_facets'),
+    path('feedbacks/', reads.feedback_list, name='feedback_list'),
+    path('feedbacks/search/', reads.feedback_search, name='feedback_search'),
+    path('customers/<int:customer_id>/', reads.customer_detail, name='customer_detail'),
+    path('products/<int:product_id>/', reads.product_detail, name='product_detail'),
+    path('feedbacks/<int:feedback_id>/', reads.feedback_detail, name='feedback_detail'),
+    path('customers/<int:user_id>/feedbacks/', reads.customer_feedbacks, name='customer_feedbacks'),
+    path('products/<int:item_id>/feedbacks/', reads.product_feedbacks, name='product_feedbacks'),
+    path('products/<int:item_id>/fit-prediction/', views.product_fit_prediction, name='product_fit_prediction'),
+    path('jobs/<str:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<str:job_id>/cancel/', views.job_cancel, name='job_cancel'),
+    path('stats/cache/', views.cache_stats, name='cache_stats'),
+    path('stats/pool/', views.connection_pool_stats, name='connection_pool_stats'),
+    path('metrics', views.metrics, name='metrics'),
+    path('export/<str:collection>/', views.export, name='export'),
 
     # Update (PATCH)
     path('customers/<str:customer_id>/update/', views.customer_update, name='customer_update'),
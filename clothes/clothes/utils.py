@@ -1,11 +1,17 @@
-from pymongo import MongoClient
 from django.conf import settings
+from .mongo import get_client, get_async_client
 
-def get_db_handle(db_name=settings.MONGO_DB_NAME, 
-                  host=settings.MONGO_DB_HOST, 
-                  port=settings.MONGO_DB_PORT, 
-                  username=settings.MONGO_DB_USERNAME, 
-                  password=settings.MONGO_DB_PASSWORD):
-    client = MongoClient(host=host, port=port, username=username, password=password)
+def get_db_handle(db_name=settings.MONGO_DB_NAME):
+    """
+    Database handle on the process-wide client shared with MongoEngine.
+    """
+    client = get_client()
     db_handle = client[db_name]
     return db_handle, client
+
+def get_async_db_handle(db_name=settings.MONGO_DB_NAME):
+    """
+    Database handle on the async driver, shared by every request of the process.
+    """
+    client = get_async_client()
+    return client[db_name], client
@@ -0,0 +1,182 @@
+import calendar
+import hashlib
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from .cache import detail_cache
+from .counters import field
+from .models import CollectionVersion, utc_now
+
+
+def bump_collection(*model_classes):
+    """
+    Record a write to each collection so list ETags stop matching.
+    """
+    for model_class in model_classes:
+        name = model_class._meta['collection']
+        CollectionVersion.objects(name=name).update_one(inc__version=1, set__updated_at=utc_now(), upsert=True)
+
+
+def invalidate_customers(*user_ids):
+    """
+    Drop cached customer details. Feedback details are put together from
+    the cached customer entry, so they follow without being dropped.
+    """
+    detail_cache.invalidate('customer', *user_ids)
+
+def invalidate_products(*item_ids):
+    """
+    Drop cached product details; feedback details follow like for customers.
+    """
+    detail_cache.invalidate('product', *item_ids)
+
+def invalidate_feedbacks(*review_ids):
+    """
+    Drop cached feedback details.
+    """
+    detail_cache.invalidate('feedback', *review_ids)
+
+
+def collection_state(model_class):
+    """
+    Current version and modification time of a collection.
+
+    Read from its counter every time (one find by `_id`), never from a
+    cache: a write served by another process must change the next list ETag.
+    """
+    return state_of(CollectionVersion._get_collection().find_one({'_id': model_class._meta['collection']}))
+
+
+def state_of(counter):
+    """
+    Version and modification time of a raw collection_versions document (or None).
+    """
+    if counter is None:
+        return {"version": 0, "updated_at": None}
+    return {"version": counter['version'], "updated_at": counter.get('updated_at')}
+
+
+def make_etag(*parts):
+    return quote_etag('-'.join(str(part) for part in parts))
+
+
+def validators(namespace, identifier, *documents):
+    """
+    ETag and Last-Modified of a detail payload built from `documents`
+    (MongoEngine documents or raw dicts); the ETag changes whenever any of
+    their versions does.
+
+    Returns:
+    - (etag, last modified)
+    """
+    etag = make_etag(namespace, identifier, *(field(document, 'version') for document in documents))
+    modified = [field(document, 'updated_at') for document in documents if field(document, 'updated_at')]
+    return etag, max(modified) if modified else None
+
+
+def detail_entry(data, namespace, identifier, *documents):
+    """
+    Build a cacheable detail payload together with its validators.
+    """
+    etag, last_modified = validators(namespace, identifier, *documents)
+    versions = [field(document, 'version') for document in documents]
+    return {"data": dict(data), "etag": etag, "last_modified": last_modified, "versions": versions}
+
+
+def combined_entry(data, namespace, identifier, *entries):
+    """
+    A detail payload put together from other detail entries, with the
+    validators detail_entry would give it for all of their documents.
+    """
+    versions = [version for entry in entries for version in entry["versions"]]
+    modified = [entry["last_modified"] for entry in entries if entry["last_modified"]]
+    return {"data": data, "etag": make_etag(namespace, identifier, *versions),
+            "last_modified": max(modified) if modified else None, "versions": versions}
+
+
+def _timestamp(value):
+    return calendar.timegm(value.utctimetuple()) if value else None
+
+
+def with_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    return response
+
+
+def _has_validators(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def not_modified(request, etag, last_modified):
+    """
+    The 304 response when the client's If-None-Match / If-Modified-Since still match, else None.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=_timestamp(last_modified))
+    if response is not None:
+        return with_validators(response, etag, last_modified)
+    return None
+
+
+def conditional_response(request, etag, last_modified, build):
+    """
+    Answer 304 when the client's copy is current, otherwise call `build()`
+    for the full response.
+    """
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    response = build()
+    if response.status_code == 200:
+        with_validators(response, etag, last_modified)
+    return response
+
+
+def conditional_detail(request, namespace, identifier, load, model_class=None, key=None):
+    """
+    Serve a detail payload with ETag / Last-Modified support.
+
+    The validators come from the detail cache when it holds the entry. On a
+    miss with a conditional request, `model_class` and `key` allow checking
+    just the stored version (a projected query) before loading and serializing
+    the full document.
+
+    Args:
+    - load: Callable returning a `detail_entry` or None when not found
+
+    Returns:
+    - The response, or None when the document does not exist
+    """
+    entry = detail_cache.peek(namespace, identifier)
+    if entry is None and model_class is not None and _has_validators(request):
+        document = model_class.objects(**{key: identifier}).only('version', 'updated_at').first()
+        if document is None:
+            return None
+        response = not_modified(request, *validators(namespace, identifier, document))
+        if response is not None:
+            return response
+
+    if entry is None:
+        entry = detail_cache.get_or_load(namespace, identifier, load)
+        if entry is None:
+            return None
+    return conditional_response(request, entry["etag"], entry["last_modified"], lambda: Response(entry["data"]))
+
+
+def list_etag(request, model_class):
+    """
+    ETag and Last-Modified of a list response: the collection version plus the query string.
+
+    Returns:
+    - (etag, last modified)
+    """
+    return collection_etag(request, model_class, collection_state(model_class))
+
+
+def collection_etag(request, model_class, state):
+    """
+    List validators from an already read collection state, see list_etag.
+    """
+    query = hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()[:12]
+    return make_etag(model_class._meta['collection'], state["version"], query), state["updated_at"]
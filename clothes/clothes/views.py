@@ -1,12 +1,36 @@
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from .serializers import CustomerSerializer, ProductSerializer, FeedbackSerializer
-from .models import Customer, Product, Feedback
+from .serializers import CustomerSerializer, ProductSerializer, FeedbackSerializer, JobSerializer
+from .models import Customer, Product, Feedback, Job, ProductFacet, utc_now
 from .utils import get_db_handle
+from .bulk import load_rows, get_batch_size, bulk_response, stream_upload
+from .bulk import update_items, validate_feedback_changes, enqueue_upload, enqueue_update
+from .jobs import cancel, enqueue, ensure_started, wants_async
+from .streaming import is_streaming_upload, is_streaming_list, stream_list
+from .projection import get_fields, project, render_rows
+from .pagination import paginate, paginated_response
+from .search import search_pipeline, search_page
+from .ranges import range_page
+from .facets import facet_body, record, tracked_update
+from .counters import COUNTED_FIELDS, count_feedback, counted_update, counts_body
+from .fit import get_neighbours, predict_fit
+from .cache import detail_cache
+from .mongo import pool_stats
+from .metrics import exposition
+from .export import EXPORTS, export_response
+from .reaper import PARENTS, delete_in_background
+from .filters import guard_filter
+from .batch_validation import validate_customers, validate_products
+from .versioning import bump_collection, combined_entry, conditional_detail, conditional_response, detail_entry, list_etag
+from .versioning import invalidate_customers, invalidate_products
 from django.core.files.uploadedfile import UploadedFile
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+from prometheus_client import CONTENT_TYPE_LATEST
 import json
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import ParseError, ValidationError
+from mongoengine.errors import ValidationError as DocumentValidationError
 from bson import ObjectId, errors
 import bson
 
@@ -23,6 +47,8 @@ def customer_create(request):
     if serializer.is_valid():
         try:
             serializer.create(serializer.validated_data)
+            detail_cache.invalidate('customer', serializer.validated_data['user_id'])
+            bump_collection(Customer)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except ValidationError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -35,6 +61,9 @@ def product_create(request):
     if serializer.is_valid():
         try:
             serializer.create(serializer.validated_data)
+            record(added=[serializer.validated_data])
+            detail_cache.invalidate('product', serializer.validated_data['item_id'])
+            bump_collection(Product)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except ValidationError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -46,6 +75,9 @@ def feedback_create(request):
     if serializer.is_valid():
         try:
             serializer.save()  # Save the new feedback
+            count_feedback(added=[serializer.instance])
+            detail_cache.invalidate('feedback', serializer.validated_data['review_id'])
+            bump_collection(Feedback)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except ValidationError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -54,84 +86,103 @@ def feedback_create(request):
 # 1. Bulk Upload Customers (MongoEngine)
 @api_view(['POST'])
 def bulk_upload_customers(request):
-    """Bulk upload customers using MongoEngine."""
+    """
+    Bulk upload customers as unordered batched inserts.
+
+    Rows are validated column by column, existing or repeated user_ids are
+    rejected with one lookup, and the rest is written in chunks of `?batch_size=` rows.
+    Failed rows are reported individually under "errors".
+
+    NDJSON bodies (or JSON arrays with `?stream=1`) are parsed and written
+    shard by shard instead, keeping memory bounded by the shards in flight.
+
+    With `?async=1`, or above BULK_ASYNC_ROWS rows, the payload is stored and
+    processed by a background job instead (202 with the job).
+    """
     try:
-        customers_to_save = []
-        for customer_data in request.data:
-            serializer = CustomerSerializer(data=customer_data)
-            if serializer.is_valid():
-                customers_to_save.append(Customer(**serializer.validated_data))
-            else:
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Save all validated customers
-        for customer in customers_to_save:
-            customer.save()
-        
-        return Response({"inserted_ids": [str(customer.user_id) for customer in customers_to_save]}, status=status.HTTP_201_CREATED)
-    except Exception as e:
+        if is_streaming_upload(request):
+            if wants_async(request):
+                return enqueue_upload(request, 'customers')
+            return stream_upload(request, 'customers')
+        if not isinstance(request.data, list):
+            return Response({"error": "Expected a list of customers"}, status=status.HTTP_400_BAD_REQUEST)
+        if wants_async(request, len(request.data)):
+            return enqueue_upload(request, 'customers')
+        errors = []
+        inserted = load_rows(Customer, 'user_id', request.data, get_batch_size(request), errors)
+
+        return bulk_response({
+            "inserted_count": len(inserted),
+            "inserted_ids": [str(customer.user_id) for customer in inserted]
+        }, inserted, errors)
+    except (ParseError, ValidationError, DocumentValidationError) as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 # 2. Bulk Upload Products (MongoEngine)
 @api_view(['POST'])
 def bulk_upload_products(request):
-    """Bulk upload products using MongoEngine."""
+    """
+    Bulk upload products as unordered batched inserts.
+
+    Rows are validated column by column, existing or repeated item_ids are
+    rejected with one lookup, and the rest is written in chunks of `?batch_size=` rows.
+    Failed rows are reported individually under "errors".
+
+    NDJSON bodies (or JSON arrays with `?stream=1`) are parsed and written
+    shard by shard instead, keeping memory bounded by the shards in flight.
+
+    With `?async=1`, or above BULK_ASYNC_ROWS rows, the payload is stored and
+    processed by a background job instead (202 with the job).
+    """
     try:
-        products_to_save = []
-        for product_data in request.data:
-            serializer = ProductSerializer(data=product_data)
-            if serializer.is_valid():
-                products_to_save.append(Product(**serializer.validated_data))
-            else:
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Save all validated products
-        for product in products_to_save:
-            product.save()
-        
-        return Response({"inserted_ids": [str(product.item_id) for product in products_to_save]}, status=status.HTTP_201_CREATED)
-    except Exception as e:
+        if is_streaming_upload(request):
+            if wants_async(request):
+                return enqueue_upload(request, 'products')
+            return stream_upload(request, 'products')
+        if not isinstance(request.data, list):
+            return Response({"error": "Expected a list of products"}, status=status.HTTP_400_BAD_REQUEST)
+        if wants_async(request, len(request.data)):
+            return enqueue_upload(request, 'products')
+        errors = []
+        inserted = load_rows(Product, 'item_id', request.data, get_batch_size(request), errors)
+
+        return bulk_response({
+            "inserted_count": len(inserted),
+            "inserted_ids": [str(product.item_id) for product in inserted]
+        }, inserted, errors)
+    except (ParseError, ValidationError, DocumentValidationError) as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 # 3. Bulk Upload Feedbacks (Mongoengine)
 @api_view(['POST'])
 def bulk_upload_feedbacks(request):
-    """Bulk upload feedback using MongoEngine validation."""
+    """
+    Bulk upload feedback as unordered batched inserts.
+
+    Referenced customers and products are resolved with one query per
+    collection; rows with missing references are reported under "errors".
+    Streamed bodies resolve references and write one shard at a time.
+    Large or `?async=1` uploads run as a background job like customer uploads.
+    """
     try:
-        feedbacks_to_save = []
-        for feedback_data in request.data:
-            # Try to find the referenced customer and product
-            try:
-                customer = Customer.objects.get(user_id=feedback_data.get('customer_id'))
-                product = Product.objects.get(item_id=feedback_data.get('product_id'))
-                
-                # Create Feedback object with proper references
-                feedback = Feedback(
-                    review_id=feedback_data['review_id'],
-                    fit=feedback_data['fit'],
-                    length=feedback_data.get('length'),
-                    review_text=feedback_data.get('review_text'),
-                    review_summary=feedback_data.get('review_summary'),
-                    customer=customer,
-                    product=product
-                )
-                feedbacks_to_save.append(feedback)
-            except (Customer.DoesNotExist, Product.DoesNotExist):
-                # Optionally, you can skip or handle documents without valid references
-                print(f"Skipping feedback {feedback_data['review_id']} due to missing references")
-        
-        # Save all validated feedbacks
-        for feedback in feedbacks_to_save:
-            feedback.save()
-        
-        return Response({
-            "inserted_count": len(feedbacks_to_save),
-            "details": [f.review_id for f in feedbacks_to_save]
-        }, status=status.HTTP_201_CREATED)
-    
-    except Exception as e:
+        if is_streaming_upload(request):
+            if wants_async(request):
+                return enqueue_upload(request, 'feedback')
+            return stream_upload(request, 'feedback')
+        if not isinstance(request.data, list):
+            return Response({"error": "Expected a list of feedbacks"}, status=status.HTTP_400_BAD_REQUEST)
+        if wants_async(request, len(request.data)):
+            return enqueue_upload(request, 'feedback')
+        errors = []
+        inserted = load_rows(Feedback, 'review_id', request.data, get_batch_size(request), errors)
+
+        return bulk_response({
+            "inserted_count": len(inserted),
+            "details": [f.review_id for f in inserted]
+        }, inserted, errors)
+    except (ParseError, ValidationError, DocumentValidationError) as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -142,28 +193,152 @@ def bulk_upload_feedbacks(request):
 
 @api_view(['GET'])
 def customer_list(request):
-    customers = Customer.objects.all()  # MongoEngine query to get all customers
-    serializer = CustomerSerializer(customers, many=True)
-    return Response(serializer.data)
+    """
+    Retrieve customers one page at a time, ordered by user_id.
+
+    Query params:
+    - limit: Page size (default LIST_PAGE_SIZE)
+    - cursor: Opaque `next` value from the previous page
+    - count: Set to 1 to include the number of live documents
+    - fields: Comma separated sparse fieldset, projected in the database
+    - stream: Set to 1 to stream the whole collection as one JSON array
+
+    Responses carry an ETag built from the collection version; a matching
+    If-None-Match is answered with 304 before any customer is queried.
+    """
+    fields = get_fields(request.query_params, CustomerSerializer)
+
+    def build():
+        if is_streaming_list(request):
+            return stream_list(request, Customer, CustomerSerializer, 'user_id', fields)
+        if fields:
+            customers, next_cursor = paginate(project(Customer.objects.all(), Customer, 'user_id', fields), 'user_id', request)
+            return paginated_response(request, render_rows(Customer, customers, fields), next_cursor, Customer)
+
+        customers, next_cursor = paginate(Customer.objects.all(), 'user_id', request)
+        serializer = CustomerSerializer(customers, many=True)
+        return paginated_response(request, serializer.data, next_cursor, Customer)
+
+    etag, last_modified = list_etag(request, Customer)
+    return conditional_response(request, etag, last_modified, build)
+
+@api_view(['GET'])
+def customer_range(request):
+    """
+    Retrieve customers whose measurements fall within ranges, e.g.
+    `?waist__gte=28&waist__lte=32&hips__gte=36`.
+
+    Query params:
+    - <field>__<op>: Bound on waist, hips, bust, bra_size or height (inches or 5'6)
+      with op gt, gte, lt or lte
+    - limit, cursor, fields: As for customer_list
+
+    Customers still stored with string measurements (not yet converted by
+    migrate_measurements) are not matched.
+    """
+    return Response(range_page(request.query_params))
 
 @api_view(['GET'])
 def product_list(request):
-    products = Product.objects.all()  # MongoEngine query to get all products
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    """
+    Retrieve products one page at a time, ordered by item_id.
+
+    Accepts the same query params and conditional headers as customer_list.
+    """
+    fields = get_fields(request.query_params, ProductSerializer)
+
+    def build():
+        if is_streaming_list(request):
+            return stream_list(request, Product, ProductSerializer, 'item_id', fields)
+        if fields:
+            products, next_cursor = paginate(project(Product.objects.all(), Product, 'item_id', fields), 'item_id', request)
+            return paginated_response(request, render_rows(Product, products, fields), next_cursor, Product)
+
+        products, next_cursor = paginate(Product.objects.all(), 'item_id', request)
+        serializer = ProductSerializer(products, many=True)
+        return paginated_response(request, serializer.data, next_cursor, Product)
+
+    etag, last_modified = list_etag(request, Product)
+    return conditional_response(request, etag, last_modified, build)
 
 @api_view(['GET'])
 def feedback_list(request):
     """
-    Retrieve a list of all feedbacks.
+    Retrieve feedbacks one page at a time, ordered by review_id.
+
+    Accepts the same query params and conditional headers as customer_list.
     """
     try:
-        feedbacks = Feedback.objects.all()
-        serializer = FeedbackSerializer(feedbacks, many=True)
-        return Response(serializer.data)
+        fields = get_fields(request.query_params, FeedbackSerializer)
+
+        def build():
+            if is_streaming_list(request):
+                return stream_list(request, Feedback, FeedbackSerializer, 'review_id', fields)
+            if fields:
+                feedbacks, next_cursor = paginate(project(Feedback.objects.all(), Feedback, 'review_id', fields), 'review_id', request)
+                return paginated_response(request, render_rows(Feedback, feedbacks, fields), next_cursor, Feedback)
+
+            feedbacks, next_cursor = paginate(Feedback.objects.all(), 'review_id', request)
+            serializer = FeedbackSerializer(feedbacks, many=True)
+            return paginated_response(request, serializer.data, next_cursor, Feedback)
+
+        etag, last_modified = list_etag(request, Feedback)
+        return conditional_response(request, etag, last_modified, build)
+    except ValidationError:
+        raise
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+def feedback_search(request):
+    """
+    Search review texts and summaries, best matches first.
+
+    Query params:
+    - q: Words or "quoted phrases" to look for; summaries weigh three times as much as texts
+    - customer_id, product_id, fit: Optional filters
+    - limit, cursor, fields: As for feedback_list; each result also carries its `score`
+    """
+    pipeline, limit, fields = search_pipeline(request.query_params)
+    documents = list(Feedback._get_collection().aggregate(pipeline))
+    return Response(search_page(documents, limit, fields))
+
+@api_view(['GET'])
+def product_facets(request):
+    """
+    Number of products per keyword, per size category and per combination of both.
+
+    Read from the maintained counts, so the cost depends on the number of
+    facets, not of products.
+    """
+    return Response(facet_body(ProductFacet._get_collection().find({}, {"_id": 0})))
+
+
+def customer_entry(customer_id):
+    """
+    Detail entry of a customer with their feedback counts, or None if not found.
+    """
+    customer = Customer.objects(user_id=customer_id).first()
+    if customer is None:
+        return None
+    data = {**CustomerSerializer(customer).data, "feedback_counts": counts_body(customer.feedback_counts)}
+    return detail_entry(data, 'customer', customer_id, customer)
+
+def product_entry(product_id):
+    """
+    Detail entry of a product with its feedback counts, or None if not found.
+    """
+    product = Product.objects(item_id=product_id).first()
+    if product is None:
+        return None
+    data = {**ProductSerializer(product).data, "feedback_counts": counts_body(product.feedback_counts)}
+    return detail_entry(data, 'product', product_id, product)
+
+def without_counts(entry):
+    """
+    The serialized document of a customer or product entry, as embedded in feedback details.
+    """
+    return {name: value for name, value in entry["data"].items() if name != 'feedback_counts'}
 
 @api_view(['GET'])
 def customer_detail(request, customer_id):
@@ -174,15 +349,15 @@ def customer_detail(request, customer_id):
     - customer_id: ID of the customer to retrieve
     
     Returns:
-    - Customer details if found
+    - Customer details with their feedback counts if found (served from the detail cache when possible)
+    - 304 Not Modified if the client's ETag still matches
     - 404 Not Found if customer doesn't exist
     """
-    try:
-        customer = Customer.objects.get(user_id=customer_id)
-        serializer = CustomerSerializer(customer)
-        return Response(serializer.data)
-    except Customer.DoesNotExist:
+    response = conditional_detail(request, 'customer', customer_id, lambda: customer_entry(customer_id),
+                                  Customer, 'user_id')
+    if response is None:
         return Response(status=status.HTTP_404_NOT_FOUND)
+    return response
 
 @api_view(['GET'])
 def product_detail(request, product_id):
@@ -193,47 +368,126 @@ def product_detail(request, product_id):
     - product_id: ID of the product to retrieve
     
     Returns:
-    - Product details if found
+    - Product details with its review, fit and length counts if found (served
+      from the detail cache when possible)
+    - 304 Not Modified if the client's ETag still matches
     - 404 Not Found if product doesn't exist
     """
-    try:
-        product = Product.objects.get(item_id=product_id)
-        serializer = ProductSerializer(product)
-        return Response(serializer.data)
-    except Product.DoesNotExist:
+    response = conditional_detail(request, 'product', product_id, lambda: product_entry(product_id),
+                                  Product, 'item_id')
+    if response is None:
         return Response(status=status.HTTP_404_NOT_FOUND)
+    return response
 
 @api_view(['GET'])
 def feedback_detail(request, feedback_id):
     """
     Retrieve details of a specific feedback, including associated customer and product details.
+
+    The feedback is cached on its own; its customer and product come from
+    their own detail entries, so a write to either shows up here without
+    dropping any feedback entry.
     """
+    def load():
+        feedback = Feedback.objects(review_id=feedback_id).first()
+        if feedback is None:
+            return None
+        return detail_entry(FeedbackSerializer(feedback).data, 'feedback', feedback_id, feedback)
+
     try:
-        # Retrieve the feedback
-        feedback = Feedback.objects.get(review_id=feedback_id)
-        
-        # Serialize the feedback
-        serializer = FeedbackSerializer(feedback)
-        
-        # Get the associated customer and product
-        customer = feedback.customer
-        product = feedback.product
-        
-        # Serialize customer and product details
-        customer_serializer = CustomerSerializer(customer)
-        product_serializer = ProductSerializer(product)
-        
-        # Create a response dictionary with all details
-        response_data = serializer.data
-        response_data['customer'] = customer_serializer.data
-        response_data['product'] = product_serializer.data
-        
-        return Response(response_data)
-    except Feedback.DoesNotExist:
-        return Response({"error": "Feedback not found"}, status=status.HTTP_404_NOT_FOUND)
+        entry = detail_cache.get_or_load('feedback', feedback_id, load)
+        customer = product = None
+        if entry is not None:
+            user_id, item_id = entry["data"]["customer_id"], entry["data"]["product_id"]
+            customer = detail_cache.get_or_load('customer', user_id, lambda: customer_entry(user_id))
+            product = detail_cache.get_or_load('product', item_id, lambda: product_entry(item_id))
+        # Feedback of a deleted customer or product is only waiting for the reaper
+        if customer is None or product is None:
+            return Response({"error": "Feedback not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        data = {**entry["data"], "customer": without_counts(customer), "product": without_counts(product)}
+        # The payload changes whenever any of the three documents does
+        combined = combined_entry(data, 'feedback', feedback_id, entry, customer, product)
+        return conditional_response(request, combined["etag"], combined["last_modified"], lambda: Response(data))
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+def job_detail(request, job_id):
+    """
+    Status and progress of a background job: rows processed and failed,
+    throughput and the first row errors.
+    """
+    # Polling also revives the jobs a stopped process left behind
+    ensure_started()
+    job = Job.objects(job_id=job_id).first()
+    if job is None:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(JobSerializer(job).data)
+
+@api_view(['POST'])
+def job_cancel(request, job_id):
+    """
+    Cancel a background job; a running one stops after its current batch.
+
+    Returns:
+    - 202 Accepted with the job
+    - 404 Not Found if the job doesn't exist
+    - 409 Conflict if the job has already finished or deletes customers or products
+    """
+    job = Job.objects(job_id=job_id).first()
+    if job is None:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+    # Stopping halfway would leave tombstoned documents nobody removes
+    if job.kind == 'cascade_delete' or (job.kind == 'bulk_delete' and job.target in PARENTS):
+        return Response({"error": "Deletes of customers or products cannot be cancelled"}, status=status.HTTP_409_CONFLICT)
+    if job.status not in ('pending', 'running'):
+        return Response({"error": f"Job is already {job.status}"}, status=status.HTTP_409_CONFLICT)
+    return Response(JobSerializer(cancel(job)).data, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+def cache_stats(request):
+    """
+    Hit/miss counters of the detail cache in this process.
+    """
+    return Response(detail_cache.stats())
+
+@api_view(['GET'])
+def connection_pool_stats(request):
+    """
+    Checked-out and idle connections and checkout wait times of this process's Mongo pools.
+    """
+    return Response(pool_stats.snapshot())
+
+@require_GET
+def export(request, collection):
+    """
+    Stream a whole collection (customers, products or feedbacks) for bulk
+    consumers such as the nightly warehouse load.
+
+    Query params:
+    - format: ndjson (default) or csv
+    - gzip: Set to 1 to gzip the stream
+    - fields: Comma separated sparse fieldset, projected in the database
+    - updated_since, after and per-collection filters, see export.export_query
+
+    A plain Django view: DRF's `?format=` override would pick a renderer
+    for the CSV/NDJSON choice.
+    """
+    if collection not in EXPORTS:
+        return JsonResponse({"error": f"Unknown collection. Choose one of {', '.join(EXPORTS)}."}, status=404)
+    try:
+        return export_response(collection, request.GET)
+    except ValidationError as e:
+        return JsonResponse(e.detail, status=400)
+
+@require_GET
+def metrics(request):
+    """
+    Request, Mongo command, bulk ingest and cache metrics in the Prometheus text format.
+    """
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE_LATEST)
+
 
 # @api_view(['PATCH'])
 # def customer_update(request, customer_id):
@@ -261,15 +515,11 @@ def customer_feedbacks(request, user_id):
     - List of customer's feedback review IDs
     - 404 Not Found if customer doesn't exist
     """
-    try:
-        customer = Customer.objects.get(user_id=user_id)
-        # Explicitly query for review IDs associated with this customer
-        feedbacks = Feedback.objects.filter(customer=customer)
-        # Extract just the review IDs
-        feedback_ids = [feedback.review_id for feedback in feedbacks]
-        return Response({"feedback_ids": feedback_ids})
-    except Customer.DoesNotExist:
+    # Checked first: the feedback of a deleted customer stays until its delete job reaches it
+    if Customer.objects(user_id=user_id).only('id').first() is None:
         return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
+    # Read the review IDs straight off the stored natural key
+    return Response({"feedback_ids": list(Feedback.objects(user_id=user_id).scalar('review_id'))})
 
 @api_view(['GET'])
 def product_feedbacks(request, item_id):
@@ -283,15 +533,40 @@ def product_feedbacks(request, item_id):
     - List of product's feedback review IDs
     - 404 Not Found if product doesn't exist
     """
+    # Checked first: the feedback of a deleted product stays until its delete job reaches it
+    if Product.objects(item_id=item_id).only('id').first() is None:
+        return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+    # Read the review IDs straight off the stored natural key
+    return Response({"feedback_ids": list(Feedback.objects(item_id=item_id).scalar('review_id'))})
+
+@api_view(['GET'])
+def product_fit_prediction(request, item_id):
+    """
+    Predict how a product fits a customer from the reviews of the customers
+    whose measurements are closest to theirs.
+
+    Args:
+    - item_id: ID of the product
+    - customer (query param): user_id of the customer
+    - k (query param): Number of closest reviewers to use
+
+    Returns:
+    - Fit and length counts of the neighbours and the weighted prediction
+    - 400 Bad Request for a missing or invalid customer or k
+    - 404 Not Found if the product or customer doesn't exist
+    """
     try:
-        product = Product.objects.get(item_id=item_id)
-        # Explicitly query for review IDs associated with this product
-        feedbacks = Feedback.objects.filter(product=product)
-        # Extract just the review IDs
-        feedback_ids = [feedback.review_id for feedback in feedbacks]
-        return Response({"feedback_ids": feedback_ids})
-    except Product.DoesNotExist:
+        user_id = int(request.query_params['customer'])
+    except (KeyError, ValueError):
+        return Response({"customer": "A customer user_id is required."}, status=status.HTTP_400_BAD_REQUEST)
+    k = get_neighbours(request.query_params)
+    reviews = list(Feedback.objects(item_id=item_id).only('user_id', 'fit', 'length').as_pymongo())
+    if not reviews and Product.objects(item_id=item_id).only('id').first() is None:
         return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+    body = predict_fit(item_id, user_id, reviews, k)
+    if body is None:
+        return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(body)
 
 
 #############
@@ -314,9 +589,12 @@ def customer_update(request, customer_id):
     """
     try:
         customer = Customer.objects.get(id=ObjectId(customer_id))
+        previous_user_id = customer.user_id
         serializer = CustomerSerializer(customer, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            invalidate_customers(previous_user_id, customer.user_id)
+            bump_collection(Customer)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except (Customer.DoesNotExist, ValidationError, bson.errors.InvalidId):
@@ -325,16 +603,32 @@ def customer_update(request, customer_id):
 @api_view(['PATCH'])
 def bulk_update_customers(request):
     """
-    Bulk update customers matching specific filter criteria.
+    Bulk update customers, either all matching a filter or each with its own changes.
     
     Args:
     - filter: Criteria to select customers
     - update: Data to update matching customers
+    - items: Alternatively, a list of {"id": user_id, "changes": {...}} applied in one bulk write
+    
+    The filter may only use whitelisted fields and operators and must be
+    answered by an index (see filters.guard_filter); `?explain=1` returns its
+    plan and estimated matches without writing, `?allow_scan=1` runs an
+    unindexed filter as a throttled background job.
     
     Returns:
-    - Count of matched and modified customers
-    - 400 Bad Request if filter or update is missing
-    """
+    - Count of matched and modified customers (plus updated IDs and per-item errors in items mode)
+    - 202 Accepted with a job when run in the background (`?async=1`, many items or a scan)
+    - 400 Bad Request if filter or update is missing, or the filter is refused
+    """
+    if 'items' in request.data:
+        items = request.data.get('items')
+        if wants_async(request, len(items) if isinstance(items, list) else None):
+            return enqueue_update(request, 'customers')
+        response, updated = update_items(request, Customer, 'user_id', validate_customers)
+        if updated:
+            invalidate_customers(*updated)
+        return response
+
     filter_data = request.data.get('filter', {})
     update_data = request.data.get('update', {})
 
@@ -342,19 +636,25 @@ def bulk_update_customers(request):
         return Response({"error": "Both 'filter' and 'update' fields are required"}, 
                         status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        # Get matched customers
-        matched_count = Customer.objects.filter(**filter_data).count()
+    response, queryset, scans = guard_filter(request, Customer)
+    if response is not None:
+        return response
 
-        if matched_count == 0:
-            return Response({"matched_count": 0, "modified_count": 0})
+    if wants_async(request) or scans:
+        return enqueue_update(request, 'customers', scan=scans)
 
-        # Perform bulk update
-        modified_count = Customer.objects.filter(**filter_data).update(**update_data)
+    try:
+        # One update_many reports both counts, no separate count() scan
+        result = queryset.update(
+            inc__version=1, set__updated_at=utc_now(), full_result=True, **update_data
+        )
+        if result.matched_count:
+            detail_cache.invalidate_all('customer')
+            bump_collection(Customer)
 
         return Response({
-            "matched_count": matched_count,
-            "modified_count": modified_count
+            "matched_count": result.matched_count,
+            "modified_count": result.modified_count
         })
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -374,9 +674,14 @@ def product_update(request, product_id):
     """
     try:
         product = Product.objects.get(id=ObjectId(product_id))
+        previous_item_id = product.item_id
+        previous = {"keywords": list(product.keywords), "cloth_size_category": product.cloth_size_category}
         serializer = ProductSerializer(product, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            record(added=[product], removed=[previous])
+            invalidate_products(previous_item_id, product.item_id)
+            bump_collection(Product)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except (Product.DoesNotExist, ValidationError, bson.errors.InvalidId):
@@ -385,8 +690,18 @@ def product_update(request, product_id):
 @api_view(['PATCH'])
 def bulk_update_products(request):
     """
-    Bulk update products matching specific filter criteria.
+    Bulk update products matching specific filter criteria, or per-product
+    changes given as `items` like bulk_update_customers.
     """
+    if 'items' in request.data:
+        items = request.data.get('items')
+        if wants_async(request, len(items) if isinstance(items, list) else None):
+            return enqueue_update(request, 'products')
+        response, updated = update_items(request, Product, 'item_id', validate_products)
+        if updated:
+            invalidate_products(*updated)
+        return response
+
     filter_data = request.data.get('filter', {})
     update_data = request.data.get('update', {})
 
@@ -394,19 +709,24 @@ def bulk_update_products(request):
         return Response({"error": "Both 'filter' and 'update' fields are required"},
                         status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        # Count matched documents before updating
-        matched_count = Product.objects.filter(**filter_data).count()
+    response, queryset, scans = guard_filter(request, Product)
+    if response is not None:
+        return response
 
-        if matched_count == 0:
-            return Response({"matched_count": 0, "modified_count": 0})
+    if wants_async(request) or scans:
+        return enqueue_update(request, 'products', scan=scans)
 
-        # Perform bulk update
-        modified_count = Product.objects.filter(**filter_data).update(**update_data)
+    try:
+        # One update_many reports both counts, no separate count() scan
+        result = tracked_update(queryset,
+                                inc__version=1, set__updated_at=utc_now(), **update_data)
+        if result.matched_count:
+            detail_cache.invalidate_all('product')
+            bump_collection(Product)
 
         return Response({
-            "matched_count": matched_count,
-            "modified_count": modified_count
+            "matched_count": result.matched_count,
+            "modified_count": result.modified_count
         })
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -418,9 +738,14 @@ def feedback_update(request, feedback_id):
     """
     try:
         feedback = Feedback.objects.get(review_id=feedback_id)
+        previous_review_id = feedback.review_id
+        before = {name: getattr(feedback, name) for name in COUNTED_FIELDS}
         serializer = FeedbackSerializer(feedback, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            count_feedback(added=[feedback], removed=[before])
+            detail_cache.invalidate('feedback', previous_review_id, feedback.review_id)
+            bump_collection(Feedback)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except Feedback.DoesNotExist:
@@ -429,8 +754,18 @@ def feedback_update(request, feedback_id):
 @api_view(['PATCH'])
 def bulk_update_feedbacks(request):
     """
-    Bulk update feedback matching specific filter criteria.
+    Bulk update feedback matching specific filter criteria, or per-feedback
+    changes given as `items` like bulk_update_customers.
     """
+    if 'items' in request.data:
+        items = request.data.get('items')
+        if wants_async(request, len(items) if isinstance(items, list) else None):
+            return enqueue_update(request, 'feedback')
+        response, updated = update_items(request, Feedback, 'review_id', validate_feedback_changes)
+        if updated:
+            detail_cache.invalidate('feedback', *updated)
+        return response
+
     filter_data = request.data.get('filter', {})
     update_data = request.data.get('update', {})
 
@@ -438,19 +773,24 @@ def bulk_update_feedbacks(request):
         return Response({"error": "Both 'filter' and 'update' fields are required"},
                         status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        # Count matched documents before updating
-        matched_count = Feedback.objects.filter(**filter_data).count()
+    response, queryset, scans = guard_filter(request, Feedback)
+    if response is not None:
+        return response
 
-        if matched_count == 0:
-            return Response({"matched_count": 0, "modified_count": 0})
+    if wants_async(request) or scans:
+        return enqueue_update(request, 'feedback', scan=scans)
 
-        # Perform bulk update
-        modified_count = Feedback.objects.filter(**filter_data).update(**update_data)
+    try:
+        # One update_many reports both counts, no separate count() scan
+        result = counted_update(queryset,
+                                inc__version=1, set__updated_at=utc_now(), **update_data)
+        if result.matched_count:
+            detail_cache.invalidate_all('feedback')
+            bump_collection(Feedback)
 
         return Response({
-            "matched_count": matched_count,
-            "modified_count": modified_count
+            "matched_count": result.matched_count,
+            "modified_count": result.modified_count
         })
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -466,26 +806,27 @@ def bulk_update_feedbacks(request):
 def customer_delete(request, customer_id):
     """
     Delete a specific customer by ID.
+
+    The customer is tombstoned right away; its feedback is removed by a
+    background job whose status is returned (202 Accepted).
     """
-    try:
-        customer = Customer.objects.get(user_id=customer_id)
-        customer.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
-    except Customer.DoesNotExist:
+    deleted_count, job = delete_in_background(request, Customer.objects(user_id=customer_id))
+    if not deleted_count:
         return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
+    detail_cache.invalidate('customer', customer_id)
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
 # DELETE: Product Delete
 @api_view(['DELETE'])
 def product_delete(request, product_id):
     """
-    Delete a specific product by ID.
+    Delete a specific product by ID, in the background like customer_delete.
     """
-    try:
-        product = Product.objects.get(item_id=product_id)
-        product.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
-    except Product.DoesNotExist:
+    deleted_count, job = delete_in_background(request, Product.objects(item_id=product_id))
+    if not deleted_count:
         return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+    detail_cache.invalidate('product', product_id)
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
 # DELETE: Feedback Delete
 @api_view(['DELETE'])
@@ -496,6 +837,9 @@ def feedback_delete(request, feedback_id):
     try:
         feedback = Feedback.objects.get(review_id=feedback_id)
         feedback.delete()
+        count_feedback(removed=[feedback])
+        detail_cache.invalidate('feedback', feedback.review_id)
+        bump_collection(Feedback)
         return Response(status=status.HTTP_204_NO_CONTENT)
     except Feedback.DoesNotExist:
         return Response({"error": "Feedback not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -505,12 +849,25 @@ def feedback_delete(request, feedback_id):
 def bulk_delete_customers(request):
     """
     Bulk delete customers matching specific criteria.
-    """
-    filter_data = request.data.get('filter', {})
+
+    Matching customers are tombstoned in one update; removing them and their
+    feedback runs as a background job (202 Accepted with the job). The filter
+    is checked like bulk_update_customers'; one no index answers, let through
+    by `?allow_scan=1`, is tombstoned in throttled chunks by the job as well.
+    """
+    response, queryset, scans = guard_filter(request, Customer)
+    if response is not None:
+        return response
+    if scans:
+        return enqueue(request, 'bulk_delete', 'customers', {"filter": request.data['filter'],
+                                                             "batch_size": get_batch_size(request), "scan": scans})
     try:
-        deleted_count_tuple = Customer.objects.filter(**filter_data).delete()
-        deleted_count = deleted_count_tuple[0] if isinstance(deleted_count_tuple, tuple) else deleted_count_tuple
-        return Response({"deleted_count": deleted_count}, status=status.HTTP_200_OK)
+        deleted_count, job = delete_in_background(request, queryset)
+        if not deleted_count:
+            return Response({"deleted_count": 0}, status=status.HTTP_200_OK)
+        detail_cache.invalidate_all('customer')
+        return Response({"deleted_count": deleted_count, "job": JobSerializer(job).data},
+                        status=status.HTTP_202_ACCEPTED)
     except ValidationError as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -518,13 +875,21 @@ def bulk_delete_customers(request):
 @api_view(['DELETE'])
 def bulk_delete_products(request):
     """
-    Bulk delete products matching specific criteria.
+    Bulk delete products matching specific criteria, in the background like bulk_delete_customers.
     """
-    filter_data = request.data.get('filter', {})
+    response, queryset, scans = guard_filter(request, Product)
+    if response is not None:
+        return response
+    if scans:
+        return enqueue(request, 'bulk_delete', 'products', {"filter": request.data['filter'],
+                                                            "batch_size": get_batch_size(request), "scan": scans})
     try:
-        deleted_count_tuple = Product.objects.filter(**filter_data).delete()
-        deleted_count = deleted_count_tuple[0] if isinstance(deleted_count_tuple, tuple) else deleted_count_tuple
-        return Response({"deleted_count": deleted_count}, status=status.HTTP_200_OK)
+        deleted_count, job = delete_in_background(request, queryset)
+        if not deleted_count:
+            return Response({"deleted_count": 0}, status=status.HTTP_200_OK)
+        detail_cache.invalidate_all('product')
+        return Response({"deleted_count": deleted_count, "job": JobSerializer(job).data},
+                        status=status.HTTP_202_ACCEPTED)
     except ValidationError as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -533,10 +898,23 @@ def bulk_delete_products(request):
 def bulk_delete_feedbacks(request):
     """
     Bulk delete feedbacks matching specific criteria.
+
+    With `?async=1` the matching feedback is deleted in chunks by a background
+    job, as is a filter no index answers when `?allow_scan=1` lets it run.
     """
-    filter_data = request.data.get('filter', {})
+    response, queryset, scans = guard_filter(request, Feedback)
+    if response is not None:
+        return response
+    if wants_async(request) or scans:
+        return enqueue(request, 'bulk_delete', 'feedback', {"filter": request.data['filter'],
+                                                            "batch_size": get_batch_size(request), "scan": scans})
     try:
-        deleted_count_tuple = Feedback.objects.filter(**filter_data).delete()
+        # Deleted by _id, so exactly the feedback read for the counters goes
+        removed = list(queryset.only(*COUNTED_FIELDS).as_pymongo())
+        deleted_count_tuple = Feedback.objects(id__in=[document['_id'] for document in removed]).delete()
+        count_feedback(removed=removed)
+        detail_cache.invalidate_all('feedback')
+        bump_collection(Feedback)
         deleted_count = deleted_count_tuple[0] if isinstance(deleted_count_tuple, tuple) else deleted_count_tuple
         return Response({"deleted_count": deleted_count}, status=status.HTTP_200_OK)
     except ValidationError as e:
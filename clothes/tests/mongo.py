@@ -0,0 +1,236 @@
+import contextvars
+import functools
+import json
+import os
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import TestCase
+import mongoengine
+from django.conf import settings
+from pymongo.errors import OperationFailure
+from rest_framework.test import APIClient
+from clothes.cache import LRUCache, SharedGenerations, detail_cache
+from clothes.models import Customer, Product, Feedback, CacheDrop, CollectionVersion, Job, JobBatch, ProductFacet
+from clothes.profiling import command_profiler
+
+# Sample payloads shipped at the top of the repository
+SAMPLES = Path(__file__).resolve().parents[2]
+
+# Set to run the tests against a MongoDB server instead of mongomock
+MONGO_TEST_HOST = os.getenv('MONGO_TEST_HOST')
+MONGO_TEST_DB_NAME = os.getenv('MONGO_TEST_DB_NAME', 'clothes_fit_test')
+
+# pymongo command issued by each mongomock Collection method
+COMMANDS = {
+    'insert_one': 'insert',
+    'insert_many': 'insert',
+    'update_one': 'update',
+    'update_many': 'update',
+    'replace_one': 'update',
+    'delete_one': 'delete',
+    'delete_many': 'delete',
+    'bulk_write': 'bulkWrite',
+    'find_one_and_update': 'findAndModify',
+    'find_one_and_replace': 'findAndModify',
+    'find_one_and_delete': 'findAndModify',
+    'count_documents': 'aggregate',
+    'estimated_document_count': 'count',
+    'aggregate': 'aggregate',
+    'distinct': 'distinct',
+    'create_index': 'createIndexes',
+    'index_information': 'listIndexes',
+}
+
+_in_command = contextvars.ContextVar('in_command', default=False)
+
+
+def publish(name):
+    """
+    Hand a mongomock operation to the command profiler as the command pymongo
+    would have sent.
+    """
+    command_profiler.succeeded(SimpleNamespace(command_name=name, duration_micros=0, reply={}))
+
+
+def counted(name, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if _in_command.get():
+            return method(*args, **kwargs)
+        publish(name)
+        token = _in_command.set(True)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _in_command.reset(token)
+    return wrapper
+
+
+def install_mongomock():
+    """
+    Make mongomock behave enough like a server for the app:
+
+    - every operation publishes the command it stands for, since mongomock
+      sends no command monitoring events; a cursor does so once its results
+      are computed, as pymongo sends `find` on the first fetch
+    - `explain` fails like it does for a user without the privilege, so
+      the index guard falls back to meta['indexes']
+    - the `sort` of an UpdateOne (pymongo 4.11+) is accepted
+    """
+    import mongomock.collection
+    import mongomock.database
+
+    collection_class = mongomock.collection.Collection
+    if getattr(collection_class, '_publishes_commands', False):
+        return
+    for method, name in COMMANDS.items():
+        setattr(collection_class, method, counted(name, getattr(collection_class, method)))
+    collection_class._publishes_commands = True
+
+    compute_results = mongomock.collection.Cursor._compute_results
+
+    def _compute_results(self, with_limit_and_skip=False):
+        if getattr(self, '_published', None) is not self._factory and not _in_command.get():
+            self._published = self._factory
+            publish('find')
+        return compute_results(self, with_limit_and_skip)
+
+    mongomock.collection.Cursor._compute_results = _compute_results
+
+    def command(self, command, *args, **kwargs):
+        if isinstance(command, dict) and 'explain' in command:
+            raise OperationFailure('not authorized to explain')
+        raise NotImplementedError(f"mongomock does not run {command!r}")
+
+    mongomock.database.Database.command = command
+
+    add_update = mongomock.collection.BulkOperationBuilder.add_update
+
+    def _add_update(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    mongomock.collection.BulkOperationBuilder.add_update = _add_update
+
+
+def connect_test_db():
+    """
+    Point MongoEngine at the test database: MONGO_TEST_HOST when set, else
+    an in-memory mongomock client.
+    """
+    mongoengine.disconnect_all()
+    if MONGO_TEST_HOST:
+        return mongoengine.connect(db=MONGO_TEST_DB_NAME, host=MONGO_TEST_HOST,
+                                   event_listeners=[command_profiler])
+    import mongomock
+    install_mongomock()
+    return mongoengine.connect(db=MONGO_TEST_DB_NAME, host='mongodb://localhost',
+                               mongo_client_class=mongomock.MongoClient)
+
+
+class AsyncCursor:
+    """
+    A synchronous cursor behind the AsyncCursor calls the async views make.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self.cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, limit):
+        self.cursor.limit(limit)
+        return self
+
+    def batch_size(self, batch_size):
+        self.cursor.batch_size(batch_size)
+        return self
+
+    async def to_list(self, length=None):
+        return list(self.cursor)
+
+    async def __aiter__(self):
+        for document in self.cursor:
+            yield document
+
+
+class AsyncCollection:
+    """
+    A synchronous collection behind the AsyncCollection calls the async views make.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.collection.find(*args, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        return self.collection.find_one(*args, **kwargs)
+
+    async def aggregate(self, *args, **kwargs):
+        return AsyncCursor(self.collection.aggregate(*args, **kwargs))
+
+    async def count_documents(self, *args, **kwargs):
+        return self.collection.count_documents(*args, **kwargs)
+
+    async def estimated_document_count(self):
+        return self.collection.estimated_document_count()
+
+
+class AsyncDatabase:
+    """
+    A synchronous database handing out AsyncCollection wrappers.
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    def __getitem__(self, name):
+        return AsyncCollection(self.database[name])
+
+
+def async_db_handle(db_name=None):
+    """
+    Stand-in for utils.get_async_db_handle on the test database, so the async
+    views read what the sync ones do, mongomock or not.
+    """
+    return AsyncDatabase(mongoengine.get_db()), None
+
+
+def load_sample(name):
+    with open(SAMPLES / name) as f:
+        return json.load(f)
+
+
+class MongoTestCase(TestCase):
+    """
+    Runs against the test database, emptied before every test. No SQL
+    database is involved, so plain unittest cases do.
+
+    Each test gets an empty detail cache whose generations are read once,
+    up front, so command counts don't depend on when they are next synced.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connect_test_db()
+
+    def setUp(self):
+        for model_class in (Customer, Product, Feedback, CacheDrop, CollectionVersion, Job, JobBatch, ProductFacet):
+            model_class._get_collection().delete_many({})
+        detail_cache.backend = LRUCache(settings.DETAIL_CACHE_MAX_ENTRIES, settings.DETAIL_CACHE_TTL,
+                                        SharedGenerations(float('inf')))
+        detail_cache.backend.get_generation('customer')
+        self.client = APIClient()
+
+    def load_samples(self):
+        """
+        Upload the sample customers, products and feedback.
+        """
+        for kind, name in (('customers', 'bulk_upload_customer.txt'), ('products', 'bulk_upload_products.txt'),
+                           ('feedbacks', 'bulk_upload_feedbacks.txt')):
+            response = self.client.post(f'/upload/{kind}/', load_sample(name), format='json')
+            self.assertEqual(response.status_code, 201, response.content)
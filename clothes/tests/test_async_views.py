@@ -0,0 +1,86 @@
+import json
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory
+from django.urls import resolve
+from clothes import async_views, reaper
+from clothes.models import Feedback
+from .mongo import MongoTestCase, async_db_handle
+
+
+class AsyncParityTests(MongoTestCase):
+    """
+    The async read views must answer like their sync twins: same status,
+    body and validators for the same request.
+    """
+
+    def setUp(self):
+        super().setUp()
+        # Delete jobs are left pending; their documents are tombstoned by the request
+        for patcher in (mock.patch.object(async_views, 'get_async_db_handle', async_db_handle),
+                        mock.patch.object(reaper, 'submit')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.factory = AsyncRequestFactory()
+        self.load_samples()
+
+    def get(self, path, params=None, headers=None):
+        """
+        Send the same GET to the sync view and to its async twin.
+
+        Returns:
+        - (sync response, async response)
+        """
+        sync = self.client.get(path, params, headers=headers)
+        match = resolve(path)
+        view = getattr(async_views, match.url_name)
+        return sync, async_to_sync(view)(self.factory.get(path, params, headers=headers), **match.kwargs)
+
+    def assertSameResponse(self, path, params=None, headers=None):
+        sync, response = self.get(path, params, headers)
+        self.assertEqual(response.status_code, sync.status_code, path)
+        if sync.status_code == 200:
+            self.assertEqual(json.loads(response.content), sync.json(), path)
+        for header in ('ETag', 'Last-Modified'):
+            self.assertEqual(response.get(header), sync.get(header), f'{path} {header}')
+        return sync
+
+    def test_list_pages(self):
+        for path in ('/customers/', '/products/', '/feedbacks/'):
+            params, pages = {"limit": 7}, 0
+            while True:
+                with self.subTest(path=path, page=pages):
+                    body = self.assertSameResponse(path, params).json()
+                pages += 1
+                if not body['next']:
+                    break
+                params = {"limit": 7, "cursor": body['next']}
+            self.assertEqual(pages, 3)
+
+    def test_projection(self):
+        body = self.assertSameResponse('/customers/', {"fields": "user_id,user_name", "limit": 5}).json()
+        self.assertEqual(set(body['results'][0]), {'user_id', 'user_name'})
+        self.assertSameResponse('/feedbacks/', {"fields": "review_id,fit", "limit": 5})
+
+    def test_count(self):
+        self.assertEqual(self.assertSameResponse('/products/', {"count": 1, "limit": 5}).json()['count'], 20)
+        self.client.delete('/products/200001/delete/')
+        # The tombstoned product waits for the reaper but is no longer counted
+        self.assertEqual(self.assertSameResponse('/products/', {"count": 1, "limit": 5}).json()['count'], 19)
+
+    def test_tombstoned_documents_are_not_found(self):
+        review_ids = list(Feedback.objects(user_id=100001).scalar('review_id'))
+        self.assertEqual(self.client.delete('/customers/100001/delete/').status_code, 202)
+        for path in ('/customers/100001/', '/customers/100001/feedbacks/',
+                     *(f'/feedbacks/{review_id}/' for review_id in review_ids)):
+            with self.subTest(path=path):
+                self.assertEqual(self.assertSameResponse(path).status_code, 404)
+        self.assertNotIn(100001, [row['user_id'] for row in
+                                  self.assertSameResponse('/customers/', {"limit": 100}).json()['results']])
+
+    def test_not_modified(self):
+        review_id = Feedback.objects.first().review_id
+        for path in ('/customers/100001/', '/products/200001/', f'/feedbacks/{review_id}/', '/customers/'):
+            with self.subTest(path=path):
+                etag = self.assertSameResponse(path)['ETag']
+                self.assertEqual(self.assertSameResponse(path, headers={'If-None-Match': etag}).status_code, 304)
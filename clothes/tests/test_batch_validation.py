@@ -0,0 +1,76 @@
+from datetime import date, timedelta
+from unittest import TestCase
+from clothes.batch_validation import validate_customers, validate_products
+from clothes.serializers import CustomerSerializer, ProductSerializer
+from .mongo import load_sample
+
+
+def variants(sample, changes):
+    """
+    The sample with each change applied in turn; None as a value drops the field.
+    """
+    rows = []
+    for change in changes:
+        row = {**sample, **change}
+        rows.append({name: value for name, value in row.items() if not (name in change and change[name] is None)})
+    return rows
+
+
+class ParityTests(TestCase):
+    """
+    The column-wise batch validators must accept, reject and clean every row
+    exactly like the serializers they stand in for.
+    """
+
+    def assertParity(self, validate, serializer_class, rows):
+        validated, failed = validate(rows)
+        results = dict(validated)
+        results.update(failed)
+        self.assertEqual(sorted(results), list(range(len(rows))))
+        for position, row in enumerate(rows):
+            with self.subTest(row=row):
+                serializer = serializer_class(data=row)
+                if serializer.is_valid():
+                    self.assertEqual(results[position], dict(serializer.validated_data))
+                else:
+                    self.assertEqual(results[position], serializer.errors)
+
+    def test_customers(self):
+        samples = load_sample('bulk_upload_customer.txt')
+        rows = samples + variants(samples[0], [
+            {"user_id": None}, {"user_id": "100002"}, {"user_id": "100002.0"}, {"user_id": 99999},
+            {"user_id": 1000000}, {"user_id": "abc"}, {"user_id": True}, {"user_id": 12.5},
+            {"user_name": "A"}, {"user_name": "  Al  "}, {"user_name": ""}, {"user_name": "x" * 101},
+            {"user_name": False}, {"user_name": ["Al"]}, {"user_name": 42},
+            {"waist": "abc"}, {"waist": "19"}, {"waist": "60.5"}, {"waist": 30}, {"waist": "30.5"},
+            {"waist": "3e1"}, {"waist": "36"}, {"waist": "40"},
+            {"cup_size": "H"}, {"cup_size": "dd"}, {"cup_size": None},
+            {"bra_size": "33"}, {"bra_size": "34E"}, {"bra_size": "34D"}, {"bra_size": "54"}, {"bra_size": "34B"},
+            {"hips": "x"}, {"hips": "36.5.1"}, {"hips": "38.0"}, {"bust": "3e1"}, {"bust": "-34"},
+            {"height": "5-6"}, {"height": "3'11"}, {"height": "8'0"}, {"height": "5'12"}, {"height": "7'11"},
+            {"height": 66}, {"height": "x" * 11},
+            {"waist": "abc", "height": "tall", "bra_size": "1"},
+        ]) + [None, "customer", [samples[0]], {}]
+        self.assertParity(validate_customers, CustomerSerializer, rows)
+
+    def test_products(self):
+        samples = load_sample('bulk_upload_products.txt')
+        today = date.today()
+        # Sample dates age out, so rows are checked against recent ones
+        samples = [{**sample, "last_update_date": (today - timedelta(days=position)).isoformat()}
+                   for position, sample in enumerate(samples)]
+        rows = samples + variants(samples[0], [
+            {"item_id": "abc"}, {"item_id": 99999}, {"item_id": None},
+            {"product_name": "T"}, {"product_name": " T-Shirt "},
+            {"size": -1}, {"size": 51}, {"size": "10"}, {"quality": 0}, {"quality": 6}, {"quality": "high"},
+            {"keywords": "tops"}, {"keywords": []}, {"keywords": ["TOPS ", "Casual"]}, {"keywords": ["nope"]},
+            {"keywords": ["tops"] * 6}, {"keywords": [None]}, {"keywords": [""]}, {"keywords": ["tops", 7]},
+            {"keywords": {"tops": 1}}, {"keywords": ["x" * 101]}, {"keywords": [["tops"]]},
+            {"cloth_size_category": "XXXL"}, {"cloth_size_category": "m"},
+            {"last_update_date": "2024-13-01"}, {"last_update_date": "yesterday"}, {"last_update_date": 20240101},
+            {"last_update_date": (today + timedelta(days=1)).isoformat()},
+            {"last_update_date": (today - timedelta(days=365 * 5)).isoformat()},
+            {"last_update_date": (today - timedelta(days=365 * 5 + 1)).isoformat()},
+            {"size": 99, "quality": 9, "keywords": ["nope"]},
+        ]) + [None, 7]
+        self.assertParity(validate_products, ProductSerializer, rows)
@@ -0,0 +1,147 @@
+from unittest import mock
+from clothes import bulk
+from clothes.models import Customer, Feedback
+from clothes.profiling import profile
+from .mongo import MongoTestCase, load_sample
+
+
+class BulkUploadTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.customers = load_sample('bulk_upload_customer.txt')
+
+    def upload(self, rows, status, batch_size=1000):
+        with profile() as stats:
+            response = self.client.post(f'/upload/customers/?batch_size={batch_size}', rows, format='json')
+        self.assertEqual(response.status_code, status, response.content)
+        return response, stats
+
+    def test_rows_are_inserted_in_unordered_batches(self):
+        response, stats = self.upload(self.customers, 201, batch_size=6)
+        self.assertEqual(stats.names.count('insert'), 4)
+        self.assertEqual(response.data['inserted_ids'], [str(row['user_id']) for row in self.customers])
+        self.assertEqual(Customer.objects.count(), 20)
+
+    def test_duplicates_are_reported_by_row(self):
+        self.upload(self.customers[:3], 201)
+        rows = self.customers[2:8] + [self.customers[5]]
+        response, stats = self.upload(rows, 207)
+        self.assertEqual(response.data['errors'], [
+            {"index": 0, "errors": {"user_id": [f"user_id {rows[0]['user_id']} already exists."]}},
+            {"index": 6, "errors": {"user_id": [f"Duplicate user_id {rows[6]['user_id']} in payload."]}},
+        ])
+        self.assertEqual(response.data['inserted_ids'], [str(row['user_id']) for row in rows[1:6]])
+        # Existing keys are found with one lookup, then everything else goes in one insert
+        self.assertEqual(stats.names.count('insert'), 1)
+        self.assertEqual(Customer.objects.count(), 8)
+
+    def test_a_failing_row_does_not_stop_its_batch(self):
+        self.upload(self.customers[:1], 201)
+        # A row written by another request between the lookup and the insert
+        with mock.patch.object(bulk, 'drop_duplicates', lambda model_class, key, validated, *args: validated):
+            response, _ = self.upload(self.customers[1:4] + self.customers[:1] + self.customers[4:6], 207)
+        self.assertEqual([error["index"] for error in response.data['errors']], [3])
+        self.assertIn('duplicate', response.data['errors'][0]['errors'][0].lower())
+        self.assertEqual(response.data['inserted_count'], 5)
+        self.assertEqual(Customer.objects.count(), 6)
+
+    def test_nothing_written_is_a_bad_request(self):
+        self.upload(self.customers[:2], 201)
+        response, stats = self.upload(self.customers[:2], 400)
+        self.assertEqual(response.data['inserted_count'], 0)
+        self.assertNotIn('insert', stats.names)
+
+
+class FeedbackUploadTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for kind, name in (('customers', 'bulk_upload_customer.txt'), ('products', 'bulk_upload_products.txt')):
+            self.assertEqual(self.client.post(f'/upload/{kind}/', load_sample(name), format='json').status_code, 201)
+        self.feedbacks = load_sample('bulk_upload_feedbacks.txt')
+
+    def upload(self, rows, status):
+        with profile() as stats:
+            response = self.client.post('/upload/feedbacks/', rows, format='json')
+        self.assertEqual(response.status_code, status, response.content)
+        return response, stats
+
+    def test_references_are_resolved_once_per_collection(self):
+        _, few = self.upload(self.feedbacks[:2], 201)
+        _, many = self.upload(self.feedbacks[2:], 201)
+        # Customers, products and existing reviews: one lookup each, whatever the number of rows
+        self.assertEqual(few.names.count('find'), 3)
+        self.assertEqual(many.names.count('find'), 3)
+        self.assertEqual(Feedback.objects.count(), 20)
+        feedback = Feedback.objects.get(review_id=self.feedbacks[5]['review_id'])
+        self.assertEqual((feedback.user_id, feedback.item_id),
+                         (self.feedbacks[5]['customer_id'], self.feedbacks[5]['product_id']))
+
+    def test_missing_references_are_reported_by_row(self):
+        rows = [dict(row) for row in self.feedbacks[:4]]
+        rows[1]['customer_id'] = 999999
+        rows[2]['product_id'] = 999998
+        rows[3]['customer_id'] = '100004'
+        response, _ = self.upload(rows, 207)
+        self.assertEqual(response.data['errors'], [
+            {"index": 1, "errors": {"customer_id": ["Customer 999999 does not exist."]}},
+            {"index": 2, "errors": {"product_id": ["Product 999998 does not exist."]}},
+        ])
+        self.assertEqual(sorted(Feedback.objects.scalar('review_id')), [rows[0]['review_id'], rows[3]['review_id']])
+
+
+class BulkUpdateTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.load_samples()
+        self.customers = {row['user_id']: row for row in load_sample('bulk_upload_customer.txt')}
+
+    def update(self, body, status=200, batch_size=1000):
+        with profile() as stats:
+            response = self.client.patch(f'/customers/bulk_update/?batch_size={batch_size}', body, format='json')
+        self.assertEqual(response.status_code, status, response.content)
+        return response, stats
+
+    def test_filter_mode_is_one_round_trip(self):
+        for user_ids in ([100001, 100002], list(range(100001, 100011))):
+            with self.subTest(matched=len(user_ids)):
+                response, stats = self.update({"filter": {"user_id__in": user_ids}, "update": {"set__cup_size": "G"}})
+                self.assertEqual((response.data['matched_count'], response.data['modified_count']),
+                                 (len(user_ids), len(user_ids)))
+                # The update_many, the cache generation and the collection version
+                self.assertEqual(stats.names, ['update', 'findAndModify', 'update'])
+        self.assertEqual(Customer.objects(cup_size='G').count(), 10)
+
+    def test_items_are_written_in_one_bulk_write_per_batch(self):
+        version = Customer.objects.get(user_id=100001).version
+        items = [{"id": user_id, "changes": {"cup_size": "F"}} for user_id in range(100001, 100006)]
+        response, stats = self.update({"items": items}, batch_size=2)
+        self.assertEqual(response.data['updated'], list(range(100001, 100006)))
+        self.assertEqual((response.data['matched_count'], response.data['modified_count']), (5, 5))
+        # The stored documents are read with one lookup
+        self.assertEqual(stats.names.count('find'), 1)
+        self.assertEqual(stats.names.count('bulkWrite'), 3)
+        self.assertEqual(Customer.objects(cup_size='F').count(), 5)
+        self.assertEqual(Customer.objects.get(user_id=100001).version, version + 1)
+
+    def test_item_errors_are_reported_by_index(self):
+        stored = self.customers[100003]
+        response, _ = self.update({"items": [
+            {"id": 100001, "changes": {"user_name": "Renamed"}},
+            {"id": 999999, "changes": {"user_name": "Nobody"}},
+            {"id": 100001, "changes": {"user_name": "Again"}},
+            {"id": 100002, "changes": {"user_id": 100099}},
+            # Checked against the stored hips, which the item leaves alone
+            {"id": 100003, "changes": {"waist": stored['hips']}},
+        ]}, status=207)
+        self.assertEqual(sorted(response.data['errors'], key=lambda error: error['index']), [
+            {"index": 1, "errors": {"id": ["user_id 999999 does not exist."]}},
+            {"index": 2, "errors": {"id": ["Duplicate user_id 100001 in payload."]}},
+            {"index": 3, "errors": {"user_id": ["user_id cannot be changed in a bulk update."]}},
+            {"index": 4, "errors": {"non_field_errors": ["Waist measurement must be less than hip measurement."]}},
+        ])
+        self.assertEqual(response.data['updated'], [100001])
+        self.assertEqual(Customer.objects.get(user_id=100001).user_name, 'Renamed')
+        self.assertEqual(Customer.objects.get(user_id=100003).waist, float(stored['waist']))
@@ -0,0 +1,168 @@
+import threading
+from unittest import mock
+from clothes.cache import DetailCache, LRUCache, SharedGenerations, detail_cache
+from clothes.models import Customer
+from .mongo import MongoTestCase, load_sample
+
+
+class Loader:
+    """
+    Loader returning `value` for any key, counting its calls.
+    """
+
+    def __init__(self, value='payload'):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def process_cache(ttl=60, interval=0):
+    """
+    A detail cache as another process would hold it: its own entries, the
+    shared generations and dropped keys re-read every `interval` seconds.
+    """
+    return DetailCache(LRUCache(100, ttl, SharedGenerations(interval)))
+
+
+class DetailCacheTests(MongoTestCase):
+
+    def test_hit(self):
+        cache, load = process_cache(), Loader()
+        self.assertEqual(cache.get_or_load('customer', 1, load), 'payload')
+        self.assertEqual(cache.get_or_load('customer', 1, load), 'payload')
+        self.assertEqual(cache.peek('customer', 1), 'payload')
+        self.assertEqual(load.calls, 1)
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (2, 1))
+
+    def test_not_found_is_not_cached(self):
+        cache, load = process_cache(), Loader(None)
+        self.assertIsNone(cache.get_or_load('customer', 1, load))
+        self.assertIsNone(cache.get_or_load('customer', 1, load))
+        self.assertEqual(load.calls, 2)
+
+    def test_entries_expire(self):
+        cache, load = process_cache(ttl=10), Loader()
+        with mock.patch('clothes.cache.time.monotonic', return_value=1000):
+            cache.get_or_load('customer', 1, load)
+        with mock.patch('clothes.cache.time.monotonic', return_value=1009):
+            cache.get_or_load('customer', 1, load)
+        self.assertEqual(load.calls, 1)
+        with mock.patch('clothes.cache.time.monotonic', return_value=1011):
+            self.assertIsNone(cache.peek('customer', 1))
+            cache.get_or_load('customer', 1, load)
+        self.assertEqual(load.calls, 2)
+
+    def test_concurrent_misses_load_once(self):
+        cache, started, release = process_cache(), threading.Event(), threading.Event()
+        calls = []
+
+        def slow_load():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'payload'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(cache.get_or_load('customer', 1, slow_load)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(cache.get_or_load('customer', 1, slow_load)))
+                     for _ in range(3)]
+        for follower in followers:
+            follower.start()
+        # The followers are waiting on the leader's flight before it finishes
+        while cache.stats()['coalesced'] < 3:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+        self.assertEqual(results, ['payload'] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_value_loaded_across_an_invalidation_is_not_cached(self):
+        cache = process_cache()
+
+        def load():
+            # A write lands while this read is in flight
+            cache.invalidate('customer', 1)
+            return 'before the write'
+
+        self.assertEqual(cache.get_or_load('customer', 1, load), 'before the write')
+        self.assertIsNone(cache.peek('customer', 1))
+
+    def test_invalidating_a_key_keeps_the_others(self):
+        first, second = process_cache(), process_cache()
+        for cache in (first, second):
+            for identifier in (1, 2):
+                cache.get_or_load('customer', identifier, Loader())
+            cache.get_or_load('product', 1, Loader())
+
+        first.invalidate('customer', 1)
+        for cache in (first, second):
+            with self.subTest(cache=cache):
+                self.assertIsNone(cache.peek('customer', 1))
+                self.assertEqual(cache.peek('customer', 2), 'payload')
+                self.assertEqual(cache.peek('product', 1), 'payload')
+
+    def test_invalidation_reaches_other_processes(self):
+        writer, reader = process_cache(), process_cache(interval=60)
+        reader.get_or_load('customer', 1, Loader('old'))
+        writer.invalidate('customer', 1)
+        # Seen at the reader's next sync, not before
+        self.assertEqual(reader.peek('customer', 1), 'old')
+        reader.backend.generations._synced_at -= 60
+        self.assertIsNone(reader.peek('customer', 1))
+        self.assertEqual(reader.get_or_load('customer', 1, Loader('new')), 'new')
+        # A drop is replayed once, not again at every sync
+        reader.backend.generations._synced_at -= 60
+        self.assertEqual(reader.peek('customer', 1), 'new')
+
+    def test_invalidate_all_reaches_other_processes(self):
+        writer, reader = process_cache(), process_cache()
+        for identifier in (1, 2):
+            reader.get_or_load('customer', identifier, Loader())
+        reader.get_or_load('product', 1, Loader())
+        writer.invalidate_all('customer')
+        self.assertIsNone(reader.peek('customer', 1))
+        self.assertIsNone(reader.peek('customer', 2))
+        self.assertEqual(reader.peek('product', 1), 'payload')
+
+
+class DetailEndpointCacheTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.load_samples()
+
+    def rename(self, user_id, user_name):
+        # Waist and hips are checked against each other on every update
+        sample = next(row for row in load_sample('bulk_upload_customer.txt') if row['user_id'] == user_id)
+        customer = Customer.objects.get(user_id=user_id)
+        response = self.client.patch(f'/customers/{customer.id}/update/',
+                                     {"user_name": user_name, "waist": sample['waist'], "hips": sample['hips']},
+                                     format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_update_is_served_after_invalidation(self):
+        customer = Customer.objects.get(user_id=100001)
+        self.assertEqual(self.client.get('/customers/100001/').data['user_name'], customer.user_name)
+        self.rename(100001, 'Renamed')
+        self.assertEqual(self.client.get('/customers/100001/').data['user_name'], 'Renamed')
+
+    def test_feedback_detail_follows_its_customer(self):
+        review_id = self.client.get('/customers/100001/feedbacks/').data['feedback_ids'][0]
+        first = self.client.get(f'/feedbacks/{review_id}/')
+        self.client.get('/customers/100002/')
+        self.rename(100001, 'Renamed')
+
+        # Only the customer's own entry was dropped
+        self.assertIsNotNone(detail_cache.peek('feedback', review_id))
+        self.assertIsNotNone(detail_cache.peek('customer', 100002))
+        second = self.client.get(f'/feedbacks/{review_id}/')
+        self.assertEqual(second.data['customer']['user_name'], 'Renamed')
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self.client.get(f'/feedbacks/{review_id}/', HTTP_IF_NONE_MATCH=second['ETag']).status_code,
+                         304)
@@ -0,0 +1,71 @@
+from io import StringIO
+from django.core.management import call_command
+from clothes.cache import detail_cache
+from clothes.counters import FITS, LENGTHS, reconcile
+from clothes.models import Customer, Product, Feedback
+from .mongo import MongoTestCase
+
+PARENTS = (('/customers/', Customer, 'user_id', 'customer'), ('/products/', Product, 'item_id', 'product'))
+
+
+class FeedbackCounterTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.load_samples()
+
+    def recount(self, key, identifier):
+        reviews = list(Feedback.objects(**{key: identifier}).only('fit', 'length').as_pymongo())
+        return {
+            "reviews": len(reviews),
+            "fit": {fit: sum(review.get('fit') == fit for review in reviews) for fit in FITS},
+            "length": {length: sum(review.get('length') == length for review in reviews) for length in LENGTHS},
+        }
+
+    def assertCountsMatchFeedback(self):
+        for path, model_class, key, _ in PARENTS:
+            for identifier in model_class.objects.scalar(key):
+                with self.subTest(parent=f'{path}{identifier}'):
+                    served = self.client.get(f'{path}{identifier}/').data['feedback_counts']
+                    self.assertEqual(served, self.recount(key, identifier))
+
+    def test_uploads_are_counted(self):
+        self.assertEqual(self.client.get('/customers/100008/').data['feedback_counts']['reviews'], 4)
+        self.assertCountsMatchFeedback()
+
+    def test_updates_and_deletes_move_the_counts(self):
+        product = self.client.get('/products/200001/').data['feedback_counts']
+        response = self.client.patch('/feedbacks/bulk_update/', {"items": [
+            {"id": 300001, "changes": {"fit": "Loose", "length": "Long"}}]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        counts = self.client.get('/products/200001/').data['feedback_counts']
+        self.assertEqual(counts['fit']['Perfect'], product['fit']['Perfect'] - 1)
+        self.assertEqual(counts['fit']['Loose'], product['fit']['Loose'] + 1)
+        self.assertEqual(counts['length']['Long'], product['length']['Long'] + 1)
+        self.assertCountsMatchFeedback()
+
+        self.assertEqual(self.client.delete('/feedbacks/300001/delete/').status_code, 204)
+        response = self.client.delete('/feedbacks/bulk_delete/', {'filter': {'review_id__in': [300013, 300014]}},
+                                      format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.client.get('/products/200001/').data['feedback_counts']['reviews'],
+                         product['reviews'] - 1)
+        self.assertCountsMatchFeedback()
+
+    def test_reconcile_repairs_drifted_counters(self):
+        expected = self.client.get('/customers/100008/').data['feedback_counts']
+        Customer._get_collection().update_one({"user_id": 100008}, {"$set": {"feedback_counts.reviews": 99}})
+        Product._get_collection().update_one({"item_id": 200001}, {"$unset": {"feedback_counts": 1}})
+        Product._get_collection().update_one({"item_id": 200002}, {"$inc": {"feedback_counts.fit.Tight": 1}})
+        detail_cache.invalidate('customer', 100008)
+        self.assertEqual(self.client.get('/customers/100008/').data['feedback_counts']['reviews'], 99)
+
+        self.assertEqual(reconcile(Customer, 'user_id', 'customer', batch_size=3), 1)
+        self.assertEqual(reconcile(Product, 'item_id', 'product', batch_size=3), 2)
+        # The repaired counters are served, not the cached details from before
+        self.assertEqual(self.client.get('/customers/100008/').data['feedback_counts'], expected)
+        self.assertCountsMatchFeedback()
+        output = StringIO()
+        call_command('reconcile_feedback_counts', stdout=output)
+        self.assertIn("Repaired the counters of 0 customers.", output.getvalue())
+        self.assertIn("Repaired the counters of 0 products.", output.getvalue())
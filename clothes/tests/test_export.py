@@ -0,0 +1,75 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+from unittest import mock
+from clothes import reaper
+from clothes.models import Product
+from .mongo import MongoTestCase, load_sample
+
+
+class ExportTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.load_samples()
+        self.products = load_sample('bulk_upload_products.txt')
+
+    def export(self, collection, **params):
+        response = self.client.get(f'/export/{collection}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def ndjson(self, collection, **params):
+        _, body = self.export(collection, **params)
+        return [json.loads(line) for line in body.decode().splitlines()]
+
+    def test_ndjson_in_key_order(self):
+        response, _ = self.export('products')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="products.ndjson"')
+        rows = self.ndjson('products')
+        self.assertEqual([row['item_id'] for row in rows], sorted(product['item_id'] for product in self.products))
+        # Rows render like the detail views, without the counters
+        detail = self.client.get(f"/products/{rows[0]['item_id']}/").data
+        self.assertEqual(rows[0], {field: value for field, value in detail.items() if field != 'feedback_counts'})
+        self.assertEqual(self.ndjson('feedbacks', fields='review_id,fit')[0], {"review_id": 300001, "fit": "Perfect"})
+
+    def test_csv(self):
+        response, body = self.export('products', format='csv', fields='item_id,keywords')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(body.decode())))
+        self.assertEqual(rows[0], ['item_id', 'keywords'])
+        self.assertEqual(rows[1], [str(self.products[0]['item_id']), ';'.join(self.products[0]['keywords'])])
+        self.assertEqual(len(rows), len(self.products) + 1)
+
+    def test_gzip(self):
+        _, plain = self.export('customers', format='csv')
+        response, body = self.export('customers', format='csv', gzip=1)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(body), plain)
+
+    def test_updated_since_in_write_order(self):
+        for item_id, day in ((200005, 1), (200004, 2), (200003, 2)):
+            Product._get_collection().update_one({"item_id": item_id}, {"$set": {
+                "updated_at": datetime(2030, 1, day, tzinfo=timezone.utc)}})
+        # Written first comes first; ties keep the natural key order
+        self.assertEqual([row['item_id'] for row in self.ndjson('products', updated_since='2030-01-01')],
+                         [200005, 200003, 200004])
+        self.assertEqual([row['item_id'] for row in self.ndjson('products', updated_since='2030-01-01T12:00:00Z')],
+                         [200003, 200004])
+
+    def test_filters_resume_and_tombstones(self):
+        self.assertEqual([row['item_id'] for row in self.ndjson('products', after=200017)], [200018, 200019, 200020])
+        self.assertEqual({row['customer_id'] for row in self.ndjson('feedbacks', customer_id=100008)}, {100008})
+        with mock.patch.object(reaper, 'submit'):
+            self.assertEqual(self.client.delete('/products/200001/delete/').status_code, 202)
+        self.assertNotIn(200001, [row['item_id'] for row in self.ndjson('products')])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get('/export/orders/').status_code, 404)
+        for params in ({"format": "xml"}, {"updated_since": "yesterday"}, {"after": "x"},
+                       {"updated_since": "2030-01-01", "after": 200001}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/export/products/', params).status_code, 400)
@@ -0,0 +1,80 @@
+from clothes.facets import facet_body, rebuild
+from clothes.models import Product, ProductFacet
+from .mongo import MongoTestCase, load_sample
+
+
+class FacetTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.load_samples()
+
+    def facets(self):
+        response = self.client.get('/products/facets/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def counted(self):
+        """
+        Facets counted from the live products, the way rebuild does it.
+        """
+        products = list(Product.objects.only('keywords', 'cloth_size_category').as_pymongo())
+        keywords, sizes = {}, {}
+        for product in products:
+            sizes[product['cloth_size_category']] = sizes.get(product['cloth_size_category'], 0) + 1
+            for keyword in set(product['keywords']):
+                keywords[keyword] = keywords.get(keyword, 0) + 1
+        return len(products), keywords, sizes
+
+    def assertFacetsMatchProducts(self):
+        body = self.facets()
+        total, keywords, sizes = self.counted()
+        self.assertEqual(body['total'], total)
+        self.assertEqual({keyword: count for keyword, count in body['keywords'].items() if count}, keywords)
+        self.assertEqual({size: count for size, count in body['cloth_size_categories'].items() if count}, sizes)
+        # Maintained with $inc, the counts are what a rebuild computes
+        maintained = sorted(ProductFacet.objects.filter(count__gt=0).as_pymongo(), key=lambda facet: facet['_id'])
+        self.assertEqual(rebuild(), len(maintained))
+        self.assertEqual(sorted(ProductFacet.objects.as_pymongo(), key=lambda facet: facet['_id']), maintained)
+        self.assertEqual(self.facets(), body)
+
+    def test_uploads_are_counted(self):
+        self.assertEqual(self.facets()['total'], len(load_sample('bulk_upload_products.txt')))
+        self.assertFacetsMatchProducts()
+
+    def test_updates_move_products_between_facets(self):
+        before = self.facets()
+        response = self.client.patch('/products/bulk_update/', {"items": [
+            {"id": 200001, "changes": {"keywords": ["formal", "shoes"], "cloth_size_category": "XXL"}}
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        after = self.facets()
+        self.assertEqual(after['keywords']['formal'], before['keywords']['formal'] + 1)
+        self.assertEqual(after['keywords']['clothing'], before['keywords']['clothing'] - 1)
+        self.assertEqual(after['cloth_size_categories']['M'], before['cloth_size_categories']['M'] - 1)
+        self.assertEqual(after['keyword_sizes']['shoes']['XXL'], 1)
+        self.assertFacetsMatchProducts()
+
+        response = self.client.patch('/products/bulk_update/', {"filter": {"item_id__in": [200002, 200003]},
+                                                                 "update": {"set__cloth_size_category": "XS"}},
+                                     format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFacetsMatchProducts()
+
+    def test_rebuild_repairs_drifted_counts(self):
+        body = self.facets()
+        ProductFacet.objects(pk='keyword:clothing').update_one(inc__count=5)
+        ProductFacet.objects(pk='size:M').delete()
+        self.assertNotEqual(self.facets(), body)
+        rebuild()
+        self.assertEqual(self.facets(), body)
+
+    def test_body_lists_every_category(self):
+        body = facet_body([{"keyword": "tops", "count": 2}, {"cloth_size_category": "S", "count": 2},
+                           {"keyword": "tops", "cloth_size_category": "S", "count": 2},
+                           {"keyword": "shoes", "count": 0}, {"cloth_size_category": "M", "count": -1}])
+        self.assertEqual(body['total'], 2)
+        self.assertEqual(body['keywords']['tops'], 2)
+        self.assertEqual(body['keywords']['shoes'], 0)
+        self.assertEqual(body['cloth_size_categories'], {"XS": 0, "S": 2, "M": 0, "L": 0, "XL": 0, "XXL": 0})
+        self.assertEqual(body['keyword_sizes'], {"tops": {"S": 2}})
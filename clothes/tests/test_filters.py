@@ -0,0 +1,151 @@
+from unittest import mock
+from pymongo.errors import OperationFailure
+from clothes import jobs
+from clothes.filters import compile_filter, declared_indexes, query_plan
+from clothes.models import Customer, Product, Feedback, Job
+from .mongo import MongoTestCase
+
+
+class GuardTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(jobs, 'submit')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.load_samples()
+        self.feedback = Feedback.objects.order_by('review_id').first()
+
+    def explain(self, winning_plan=None):
+        """
+        Have the server answer explain with `winning_plan`, or refuse it like
+        it does for a user without the privilege.
+        """
+        def command(database, command, *args, **kwargs):
+            if winning_plan is None:
+                raise OperationFailure('not authorized to explain')
+            return {'queryPlanner': {'winningPlan': winning_plan}}
+        return mock.patch.object(type(Feedback._get_collection().database), 'command', command)
+
+    def plan(self, model_class, filter_data):
+        queryset, errors = compile_filter(model_class, filter_data)
+        self.assertEqual(errors, {})
+        return query_plan(queryset, filter_data)
+
+    def test_declared_indexes(self):
+        indexes = declared_indexes(Feedback)
+        self.assertEqual(indexes['_id_'], '_id')
+        self.assertEqual(indexes['user_id_1'], 'user_id')
+        self.assertNotIn('review_search', indexes)
+        self.assertEqual(declared_indexes(Customer)['measurements'], 'waist')
+
+    def test_rejected_filters(self):
+        for model_class, filter_data, field in (
+            (Feedback, {}, 'filter'),
+            (Feedback, ['user_id', 1], 'filter'),
+            (Feedback, {'review_text__contains': 'x'}, 'review_text__contains'),
+            (Feedback, {'fit__regex': '^T'}, 'fit__regex'),
+            (Feedback, {'user_id__where': 'sleep(1)'}, 'user_id__where'),
+            (Customer, {'user_id': 'abc'}, 'filter'),
+            (Product, {'keywords__all': 'tops', 'deleted_at': None}, 'deleted_at'),
+        ):
+            with self.subTest(filter=filter_data):
+                queryset, errors = compile_filter(model_class, filter_data)
+                self.assertIsNone(queryset)
+                self.assertIn(field, errors)
+
+    def test_declared_index_fallback(self):
+        with self.explain(None):
+            for model_class, filter_data, indexed in (
+                (Feedback, {'user_id': 100001}, True),
+                (Feedback, {'item_id__in': [200001, 200002]}, True),
+                (Feedback, {'review_id__gte': 300005, 'fit': 'Perfect'}, True),
+                (Feedback, {'fit': 'Perfect'}, False),
+                (Feedback, {'user_id__ne': 100001}, False),
+                (Feedback, {'user_id__nin': [100001]}, False),
+                (Feedback, {'user_id__exists': True}, False),
+                (Customer, {'waist__gte': 30}, True),
+                # Only the leading field of the compound measurements index counts
+                (Customer, {'hips__gte': 30}, False),
+                (Product, {'quality': 4}, False),
+            ):
+                with self.subTest(filter=filter_data):
+                    plan = self.plan(model_class, filter_data)
+                    self.assertEqual((plan['source'], plan['indexed']), ('declared_indexes', indexed))
+
+    def test_server_plan(self):
+        ixscan = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': 'user_id_1'}}
+        for winning_plan, indexed in (
+            (ixscan, True),
+            ({'queryPlan': ixscan}, True),
+            ({'shards': [{'winningPlan': ixscan}, {'winningPlan': ixscan}]}, True),
+            ({'stage': 'COLLSCAN'}, False),
+            ({'stage': 'OR', 'inputStages': [ixscan, {'stage': 'COLLSCAN'}]}, False),
+            # An index made by hand may be dropped again; only declared ones count
+            ({'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': 'fit_1'}}, False),
+        ):
+            with self.subTest(plan=winning_plan), self.explain(winning_plan):
+                plan = self.plan(Feedback, {'user_id': 100001})
+                self.assertEqual((plan['source'], plan['indexed']), ('explain', indexed))
+
+    def test_unindexed_filter_is_refused(self):
+        count = Feedback.objects.count()
+        with self.explain(None):
+            response = self.client.delete('/feedbacks/bulk_delete/', {'filter': {'fit': 'Perfect'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['plan']['indexed'])
+        self.assertEqual(Feedback.objects.count(), count)
+
+    def test_explain_is_a_dry_run(self):
+        count = Feedback.objects.count()
+        with self.explain(None):
+            indexed = self.client.delete('/feedbacks/bulk_delete/?explain=1',
+                                         {'filter': {'user_id': self.feedback.user_id}}, format='json')
+            scan = self.client.delete('/feedbacks/bulk_delete/?explain=1',
+                                      {'filter': {'fit': 'Perfect'}}, format='json')
+        self.assertEqual(indexed.status_code, 200)
+        self.assertTrue(indexed.data['allowed'])
+        self.assertEqual(indexed.data['estimated_count'], Feedback.objects(user_id=self.feedback.user_id).count())
+        # Counting the matches of a scan would cost the scan itself
+        self.assertFalse(scan.data['allowed'])
+        self.assertIsNone(scan.data['estimated_count'])
+        self.assertEqual(scan.data['collection_count'], count)
+        self.assertEqual(Feedback.objects.count(), count)
+
+    def test_indexed_filter_runs_in_the_request(self):
+        with self.explain(None):
+            response = self.client.patch('/customers/bulk_update/', {'filter': {'user_id__in': [100001, 100002]},
+                                                                     'update': {'set__cup_size': 'C'}}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(Customer.objects(cup_size='C', user_id__in=[100001, 100002]).count(), 2)
+
+    def test_allowed_scan_runs_as_a_throttled_job(self):
+        with self.explain(None):
+            response = self.client.patch('/feedbacks/bulk_update/?allow_scan=1', {'filter': {'fit': 'Perfect'},
+                                                                                  'update': {'set__length': 'Long'}},
+                                         format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertTrue(Job.objects.get(job_id=response.data['job_id']).params['scan'])
+        with mock.patch('clothes.bulk.time.sleep') as sleep:
+            job = jobs.run(response.data['job_id'])
+        self.assertEqual(job.status, 'done')
+        sleep.assert_called()
+        self.assertEqual(Feedback.objects(fit='Perfect', length__ne='Long').count(), 0)
+
+    def test_allowed_scan_delete_tombstones_in_chunks(self):
+        matched = list(Product.objects(quality=4).scalar('item_id'))
+        with self.explain(None):
+            response = self.client.delete('/products/bulk_delete/?allow_scan=1&batch_size=3',
+                                          {'filter': {'quality': 4}}, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        # Nothing is written by the request itself
+        self.assertEqual(Product.objects(quality=4).count(), len(matched))
+        self.assertEqual(self.client.post(f"/jobs/{response.data['job_id']}/cancel/").status_code, 409)
+
+        with mock.patch('clothes.reaper.time.sleep') as sleep:
+            job = jobs.run(response.data['job_id'])
+        self.assertEqual((job.status, job.total, job.processed), ('done', len(matched), len(matched)))
+        self.assertEqual(sleep.call_count, -(-len(matched) // 3))
+        self.assertEqual(Product.all_objects(item_id__in=matched).count(), 0)
+        self.assertEqual(Feedback.all_objects(item_id__in=matched).count(), 0)
+        self.assertEqual(Product.objects.count(), 20 - len(matched))
@@ -0,0 +1,79 @@
+from unittest import mock
+from clothes import fit, reaper
+from clothes.fit import CustomerIndex
+from .mongo import MongoTestCase, load_sample
+
+TARGET = 100100
+# Reviewers of the product: two measuring like the target, three far from it
+REVIEWERS = {
+    100101: ("28", "36", "34", "5'5", "Tight", "Short"),
+    100102: ("29", "37", "34", "5'5", "Tight", "Regular"),
+    100103: ("40", "48", "44", "5'11", "Loose", "Long"),
+    100104: ("41", "50", "46", "6'0", "Loose", "Long"),
+    100105: ("42", "52", "46", "6'1", "Loose", "Long"),
+}
+
+
+def customer(user_id, waist, hips, bust, height):
+    return {"user_id": user_id, "user_name": f"Customer {user_id}", "waist": waist, "cup_size": "B",
+            "bra_size": "34", "hips": hips, "bust": bust, "height": height}
+
+
+class FitPredictionTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Each test starts from an empty index, loaded on first use
+        patcher = mock.patch.object(fit, 'customer_index', CustomerIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        customers = [customer(TARGET, "28", "36", "34", "5'5")]
+        customers += [customer(user_id, *values[:4]) for user_id, values in REVIEWERS.items()]
+        product = {**load_sample('bulk_upload_products.txt')[0], "item_id": 200100}
+        feedback = [{"review_id": 300100 + position, "customer_id": user_id, "product_id": 200100,
+                     "fit": values[4], "length": values[5], "review_text": "", "review_summary": ""}
+                    for position, (user_id, values) in enumerate(REVIEWERS.items())]
+        for kind, rows in (('customers', customers), ('products', [product]), ('feedbacks', feedback)):
+            response = self.client.post(f'/upload/{kind}/', rows, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+
+    def predict(self, **params):
+        response = self.client.get('/products/200100/fit-prediction/', {"customer": TARGET, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_nearest_reviewers_decide(self):
+        body = self.predict(k=2)
+        self.assertEqual(body['neighbours'], 2)
+        self.assertEqual(body['fit'], {"Tight": 2, "Loose": 0, "Perfect": 0})
+        self.assertEqual(body['prediction']['fit'], {"value": "Tight", "confidence": 1.0})
+        self.assertEqual(body['prediction']['length']['value'], "Short")
+
+    def test_closer_reviewers_weigh_more(self):
+        body = self.predict(k=5)
+        # Outnumbered three to two, the close reviewers still win on weight
+        self.assertEqual(body['fit'], {"Tight": 2, "Loose": 3, "Perfect": 0})
+        self.assertEqual(body['prediction']['fit']['value'], "Tight")
+        self.assertGreater(body['prediction']['fit']['confidence'], 0.5)
+        self.assertLess(body['prediction']['fit']['confidence'], 1)
+        # The reviewer measuring exactly like the target outweighs the three far ones alone
+        self.assertEqual(body['length'], {"Short": 1, "Regular": 1, "Long": 3})
+        self.assertEqual(body['prediction']['length']['value'], "Short")
+
+    def test_index_follows_writes(self):
+        self.assertEqual(self.predict(k=2)['fit']['Tight'], 2)
+        # One close reviewer now measures like the far ones, the other is deleted
+        response = self.client.patch('/customers/bulk_update/', {"items": [
+            {"id": 100101, "changes": {"waist": "43", "hips": "53", "bust": "46"}}]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        with mock.patch.object(reaper, 'submit'):
+            self.assertEqual(self.client.delete('/customers/100102/delete/').status_code, 202)
+        body = self.predict(k=2)
+        self.assertEqual(body['fit'], {"Tight": 0, "Loose": 2, "Perfect": 0})
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get('/products/200100/fit-prediction/').status_code, 400)
+        self.assertEqual(self.client.get('/products/200100/fit-prediction/', {"customer": TARGET, "k": 0}).status_code,
+                         400)
+        self.assertEqual(self.client.get('/products/200100/fit-prediction/', {"customer": 100999}).status_code, 404)
+        self.assertEqual(self.client.get('/products/299999/fit-prediction/', {"customer": TARGET}).status_code, 404)
@@ -0,0 +1,131 @@
+from datetime import timedelta
+from unittest import mock
+from clothes import bulk, jobs
+from clothes.jobs import LeaseLost, Progress, claim, resume_stale, stale_jobs
+from clothes.models import Customer, Job, JobBatch, utc_now
+from .mongo import MongoTestCase, load_sample
+
+
+class WorkerCrash(BaseException):
+    """
+    Stands in for a worker process dying: nothing catches it, so the job is
+    left running under a lease nobody renews.
+    """
+
+
+class LeaseTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Jobs are run by the tests, not by the worker pool
+        patcher = mock.patch.object(jobs, 'submit')
+        self.submit = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.customers = load_sample('bulk_upload_customer.txt')
+        response = self.client.post('/upload/customers/?async=1&batch_size=5', self.customers, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        self.job_id = response.data['job_id']
+
+    def job(self):
+        return Job.objects.get(job_id=self.job_id)
+
+    def expire_lease(self):
+        Job.objects(job_id=self.job_id).update_one(set__lease_expires_at=utc_now() - timedelta(seconds=1))
+
+    def crash_after(self, commits):
+        """
+        Patch Progress so the worker dies right after its `commits`-th commit.
+        """
+        commit = Progress.commit
+        calls = []
+
+        def crashing(progress, *args, **kwargs):
+            commit(progress, *args, **kwargs)
+            calls.append(1)
+            if len(calls) == commits:
+                raise WorkerCrash()
+
+        return mock.patch.object(Progress, 'commit', crashing)
+
+    def test_queued_job_is_stale_until_claimed(self):
+        self.submit.assert_called_once_with(self.job_id)
+        self.assertEqual(JobBatch.objects(job_id=self.job_id).count(), 4)
+        self.assertEqual(stale_jobs(), [self.job_id])
+        job = claim(self.job_id)
+        self.assertEqual((job.status, job.attempts), ('running', 1))
+        self.assertEqual(stale_jobs(), [])
+
+    def test_live_lease_is_not_taken_over(self):
+        self.assertIsNotNone(claim(self.job_id))
+        self.assertIsNone(claim(self.job_id))
+        self.assertIsNone(jobs.run(self.job_id))
+        self.assertEqual(self.job().attempts, 1)
+
+    def test_commit_renews_the_lease(self):
+        job = claim(self.job_id)
+        self.expire_lease()
+        Progress(job).commit(1, processed=5)
+        self.assertGreater(self.job().lease_expires_at, utc_now().replace(tzinfo=None))
+        self.assertEqual(stale_jobs(), [])
+
+    def test_expired_lease_is_taken_over(self):
+        job = claim(self.job_id)
+        self.expire_lease()
+        self.assertEqual(stale_jobs(), [self.job_id])
+        with mock.patch.object(jobs, 'worker_id', return_value='other-host:1:abc'):
+            self.assertEqual(claim(self.job_id).attempts, 2)
+        # The first worker finds out at its next commit and stops
+        with self.assertRaises(LeaseLost):
+            Progress(job).commit(1, processed=5)
+        self.assertEqual(self.job().processed, 0)
+
+    def test_crashed_job_resumes_after_its_last_commit(self):
+        with self.crash_after(2), self.assertRaises(WorkerCrash):
+            jobs.run(self.job_id)
+        job = self.job()
+        self.assertEqual((job.status, job.cursor, job.processed), ('running', 2, 10))
+        self.assertEqual(Customer.objects.count(), 10)
+
+        # Nobody picks it up while the dead worker's lease lasts
+        self.assertEqual(resume_stale(), [])
+        self.expire_lease()
+        self.submit.reset_mock()
+        self.assertEqual(resume_stale(), [self.job_id])
+        self.submit.assert_called_once_with(self.job_id)
+
+        job = jobs.run(self.job_id)
+        self.assertEqual((job.status, job.attempts), ('done', 2))
+        self.assertEqual((job.processed, job.succeeded, job.failed), (20, 20, 0))
+        self.assertEqual(sorted(Customer.objects.scalar('user_id')), sorted(row['user_id'] for row in self.customers))
+        self.assertEqual(JobBatch.objects(job_id=self.job_id).count(), 0)
+
+    def test_batch_replayed_after_a_crash_before_its_commit(self):
+        # Dies after inserting the third batch, before recording it
+        insert_batches = bulk.insert_batches
+        calls = []
+
+        def crashing(*args, **kwargs):
+            inserted = insert_batches(*args, **kwargs)
+            calls.append(1)
+            if len(calls) == 3:
+                raise WorkerCrash()
+            return inserted
+
+        with mock.patch.object(bulk, 'insert_batches', crashing), self.assertRaises(WorkerCrash):
+            jobs.run(self.job_id)
+        self.assertEqual(self.job().cursor, 2)
+        self.expire_lease()
+        job = jobs.run(self.job_id)
+        # The replayed rows already exist; nothing is written twice
+        self.assertEqual((job.status, job.processed, job.succeeded, job.failed), ('done', 20, 15, 5))
+        self.assertEqual(Customer.objects.count(), 20)
+
+    def test_cancel_stops_at_the_next_commit(self):
+        with self.crash_after(1), self.assertRaises(WorkerCrash):
+            jobs.run(self.job_id)
+        self.client.post(f'/jobs/{self.job_id}/cancel/')
+        self.expire_lease()
+        job = jobs.run(self.job_id)
+        # The batch in flight when the cancellation is seen is still recorded
+        self.assertEqual((job.status, job.processed), ('cancelled', 10))
+        self.assertEqual(Customer.objects.count(), 10)
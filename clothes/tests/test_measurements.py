@@ -0,0 +1,106 @@
+from io import StringIO
+from django.core.management import call_command
+from clothes.cache import detail_cache
+from clothes.models import Customer, CollectionVersion
+from .mongo import MongoTestCase, load_sample
+
+
+class HeightFieldTests(MongoTestCase):
+
+    def test_feet_and_inches_are_stored_in_inches(self):
+        row = load_sample('bulk_upload_customer.txt')[0]
+        customer = Customer(**{**row, "waist": 28, "hips": 36, "bust": 34, "bra_size": 34, "height": "5'6"})
+        self.assertEqual(customer.height, 66)
+        customer.save()
+        self.assertEqual(Customer._get_collection().find_one({"user_id": row["user_id"]})["height"], 66)
+        self.assertEqual(Customer.objects(height="5'6").count(), 1)
+        self.assertEqual(Customer.objects(height__gt="5'5", height__lt=67).count(), 1)
+
+    def test_legacy_heights_load_and_render(self):
+        self.load_samples()
+        # A document written before the conversion still holds the string
+        Customer._get_collection().update_one({"user_id": 100001}, {"$set": {"height": "5'5"}})
+        self.assertEqual(Customer.objects.get(user_id=100001).height, 65)
+        self.assertEqual(self.client.get('/customers/100001/').data['height'], "5'5")
+        self.assertEqual(self.client.get('/customers/100002/').data['height'],
+                         load_sample('bulk_upload_customer.txt')[1]['height'])
+
+
+class RangeQueryTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.load_samples()
+        self.customers = Customer._get_collection()
+
+    def matching(self, query):
+        order = ('waist', 'hips', 'bust', 'user_id')
+        documents = sorted(self.customers.find(query), key=lambda document: [document[field] for field in order])
+        return [document['user_id'] for document in documents]
+
+    def walk(self, params, limit):
+        user_ids, cursor = [], None
+        while True:
+            response = self.client.get('/customers/range/', {**params, "limit": limit,
+                                                             **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200, response.content)
+            user_ids += [row['user_id'] for row in response.data['results']]
+            cursor = response.data['next']
+            if not cursor:
+                return user_ids
+
+    def test_pages_follow_the_index_order(self):
+        params = {"waist__gte": 26, "waist__lte": 32, "hips__gt": 35}
+        expected = self.matching({"waist": {"$gte": 26, "$lte": 32}, "hips": {"$gt": 35}})
+        self.assertTrue(len(expected) > 3)
+        for limit in (1, 3, 100):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.walk(params, limit), expected)
+
+    def test_height_in_feet_and_inches(self):
+        expected = self.matching({"height": {"$gte": 66}})
+        self.assertEqual(self.walk({"height__gte": "5'6"}, 100), expected)
+        self.assertEqual(self.walk({"height__gte": 66}, 100), expected)
+
+    def test_invalid_ranges(self):
+        for params in ({}, {"waist__between": 1}, {"shoe__gte": 1}, {"waist__gte": "wide"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/customers/range/', params).status_code, 400)
+
+
+class MigrateMeasurementsTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.load_samples()
+        self.customers = Customer._get_collection()
+        # Customers 100001-100005 as they were stored before the conversion
+        self.legacy = load_sample('bulk_upload_customer.txt')[:5]
+        for row in self.legacy:
+            self.customers.update_one({"user_id": row["user_id"]}, {"$set": {
+                field: row[field] for field in ('waist', 'hips', 'bust', 'bra_size', 'height')}})
+
+    def ranged(self):
+        return len(self.client.get('/customers/range/', {"waist__gte": 0, "limit": 100}).data['results'])
+
+    def test_strings_become_numbers(self):
+        # String measurements are not matched by ranges
+        self.assertEqual(self.ranged(), 15)
+        output = StringIO()
+        call_command('migrate_measurements', '--batch-size', '2', stdout=output)
+        self.assertIn("Converted 5 customers (0 with unreadable measurements, 0 left)", output.getvalue())
+        for row in self.legacy:
+            document = self.customers.find_one({"user_id": row["user_id"]})
+            self.assertEqual(document['waist'], float(row['waist']))
+            self.assertEqual(document['bra_size'], int(row['bra_size']))
+            self.assertIsInstance(document['height'], int)
+        # The converted customers are found by range now
+        self.assertEqual(self.ranged(), 20)
+
+    def test_caches_are_dropped(self):
+        self.client.get('/customers/100001/')
+        self.assertIsNotNone(detail_cache.peek('customer', 100001))
+        version = CollectionVersion.objects.get(name='customers').version
+        call_command('migrate_measurements', stdout=StringIO())
+        self.assertIsNone(detail_cache.peek('customer', 100001))
+        self.assertEqual(CollectionVersion.objects.get(name='customers').version, version + 1)
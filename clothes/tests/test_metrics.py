@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+from unittest import TestCase
+from prometheus_client import REGISTRY
+from clothes.metrics import CommandMetrics
+from .mongo import MongoTestCase
+
+
+def command_event(request_id, command_name='find', collection='customers'):
+    return SimpleNamespace(connection_id=('localhost', 27017), request_id=request_id, command_name=command_name,
+                           command={command_name: collection}, duration_micros=1000)
+
+
+class CommandMetricsTests(TestCase):
+
+    def observed(self, collection):
+        return REGISTRY.get_sample_value('mongo_command_duration_seconds_count',
+                                         {'collection': collection, 'command': 'find'}) or 0
+
+    def test_reply_is_observed_under_its_collection(self):
+        listener, before = CommandMetrics(), self.observed('products')
+        listener.started(command_event(1, collection='products'))
+        listener.succeeded(command_event(1))
+        self.assertEqual(self.observed('products'), before + 1)
+        self.assertEqual(len(listener._pending), 0)
+
+    def test_commands_without_a_reply_are_dropped(self):
+        listener = CommandMetrics(max_pending=3)
+        for request_id in range(5):
+            listener.started(command_event(request_id))
+        self.assertEqual(list(listener._pending), [(('localhost', 27017), request_id) for request_id in (2, 3, 4)])
+        before = self.observed('')
+        # The reply of a dropped command still counts, without its collection
+        listener.succeeded(command_event(0))
+        self.assertEqual(self.observed(''), before + 1)
+
+
+class MetricsEndpointTests(MongoTestCase):
+
+    def sample(self, body, name, **labels):
+        """
+        Value of one sample in a scrape, or None when it isn't there.
+        """
+        selector = ','.join(f'{label}="{value}"' for label, value in sorted(labels.items()))
+        for line in body.splitlines():
+            if line.startswith(f'{name}{{{selector}}} '):
+                return float(line.rsplit(' ', 1)[1])
+        return None
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def test_requests_are_counted_by_view_and_method(self):
+        before = self.sample(self.scrape(), 'http_requests_total', view='customer_list', method='GET',
+                             status='200') or 0
+        self.client.get('/customers/')
+        self.client.get('/customers/')
+        self.client.get('/no/such/path/')
+        body = self.scrape()
+        self.assertEqual(self.sample(body, 'http_requests_total', view='customer_list', method='GET', status='200'),
+                         before + 2)
+        self.assertIsNotNone(self.sample(body, 'http_requests_total', view='<unresolved>', method='GET',
+                                         status='404'))
+        self.assertIsNotNone(self.sample(body, 'http_request_duration_seconds_count', view='customer_list',
+                                         method='GET'))
+
+    def test_unknown_methods_share_one_label(self):
+        for method in ('BREW', 'PROPFIND', 'X-RANDOM'):
+            self.client.generic(method, '/customers/')
+        body = self.scrape()
+        self.assertGreaterEqual(self.sample(body, 'http_requests_total', view='customer_list', method='other',
+                                            status='405'), 3)
+        for method in ('BREW', 'PROPFIND', 'X-RANDOM'):
+            self.assertNotIn(f'method="{method}"', body)
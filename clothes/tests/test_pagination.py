@@ -0,0 +1,75 @@
+from unittest import TestCase
+from rest_framework.exceptions import ValidationError
+from clothes.models import Customer
+from clothes.pagination import decode_cursor, encode_cursor
+from .mongo import MongoTestCase, load_sample
+
+
+class CursorTests(TestCase):
+
+    def test_round_trip(self):
+        for value in (100001, 0, -5, 'B-12', 'Zoë', [28, 36, 34, 100001]):
+            with self.subTest(value=value):
+                cursor = encode_cursor(value)
+                self.assertEqual(decode_cursor(cursor), value)
+                # Cursors go into query strings as they are
+                self.assertRegex(cursor, r'^[A-Za-z0-9_=-]+$')
+
+    def test_no_cursor(self):
+        self.assertIsNone(decode_cursor(None))
+        self.assertIsNone(decode_cursor(''))
+
+    def test_invalid_cursor(self):
+        for cursor in ('not a cursor', encode_cursor(1)[:-4] + '!!!!', 'e30='):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValidationError):
+                    decode_cursor(cursor)
+
+
+class KeysetPageTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Customers tied on every field but the key
+        template = load_sample('bulk_upload_customer.txt')[0]
+        self.user_ids = [100007, 100008, 100009, 100010, 100011, 100012, 100098, 100099, 100100, 100101]
+        response = self.client.post('/upload/customers/', [{**template, "user_id": user_id}
+                                                           for user_id in reversed(self.user_ids)], format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def walk(self, url, limit):
+        keys, pages, cursor = [], 0, None
+        while True:
+            response = self.client.get(url, {"limit": limit, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200, response.content)
+            keys += [row['user_id'] for row in response.data['results']]
+            pages += 1
+            cursor = response.data['next']
+            if cursor is None:
+                return keys, pages
+
+    def test_pages_follow_the_key(self):
+        for limit in (1, 3, 4, 10, 11):
+            with self.subTest(limit=limit):
+                keys, pages = self.walk('/customers/', limit)
+                self.assertEqual(keys, self.user_ids)
+                # A last page that is exactly full gets no cursor to an empty page
+                self.assertEqual(pages, -(-len(self.user_ids) // limit))
+
+    def test_cursor_continues_after_its_key(self):
+        first = self.client.get('/customers/', {"limit": 3}).data
+        self.assertEqual(decode_cursor(first['next']), 100009)
+        # Writes behind the cursor don't shift the next pages; new keys past it show up in order
+        Customer.objects(user_id=100008).delete()
+        template = load_sample('bulk_upload_customer.txt')[0]
+        self.client.post('/upload/customers/', [{**template, "user_id": 100001}, {**template, "user_id": 100050}],
+                         format='json')
+        second = self.client.get('/customers/', {"limit": 3, "cursor": first['next']}).data
+        self.assertEqual([row['user_id'] for row in second['results']], [100010, 100011, 100012])
+        third = self.client.get('/customers/', {"limit": 3, "cursor": second['next']}).data
+        self.assertEqual([row['user_id'] for row in third['results']], [100050, 100098, 100099])
+
+    def test_invalid_limit_or_cursor(self):
+        for params in ({"limit": 0}, {"limit": "ten"}, {"cursor": "not a cursor"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/customers/', params).status_code, 400)
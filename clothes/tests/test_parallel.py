@@ -0,0 +1,132 @@
+import os
+from unittest import mock
+from django.test import override_settings
+from clothes import bulk, jobs, parallel
+from clothes.bulk import load_stream, validate_rows
+from clothes.jobs import Progress
+from clothes.models import Customer, Product, Feedback, Job
+from clothes.parallel import map_shards, shards
+from .mongo import MongoTestCase, load_sample
+
+TIMESTAMPS = ('created_at', 'updated_at')
+
+
+def worker_pid(shard):
+    return os.getpid()
+
+
+def shutdown_pool():
+    if parallel._pool is not None:
+        parallel._pool.shutdown()
+        parallel._pool = None
+
+
+class ShardTests(MongoTestCase):
+    """
+    Validation sharded across worker processes must report the same rows,
+    errors and indexes, in the same order, as validating in one piece.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.addClassCleanup(shutdown_pool)
+
+    def setUp(self):
+        super().setUp()
+        customers = load_sample('bulk_upload_customer.txt')
+        # Every third row is broken in a different way, so each shard holds valid and failing rows
+        breakages = [{"waist": "abc"}, {"user_id": 1}, {"height": "tall", "cup_size": "Z"}, {"hips": "20"}]
+        self.customers = [{**row, **breakages[position // 3 % len(breakages)]} if position % 3 == 1 else row
+                          for position, row in enumerate(customers)]
+
+    def prepare(self, model_class, rows, start=0, **overrides):
+        errors = []
+        with override_settings(**overrides):
+            validated = validate_rows(model_class, rows, errors, start)
+        # Timestamps are the only fields that differ between two runs
+        return [(index, {field: value for field, value in document.to_mongo().items() if field not in TIMESTAMPS})
+                for index, document in validated], errors
+
+    def test_shards_cover_the_payload_in_order(self):
+        with override_settings(VALIDATION_SHARD_SIZE=3):
+            self.assertEqual(shards(list(range(8)), start=100),
+                             [(100, [0, 1, 2]), (103, [3, 4, 5]), (106, [6, 7])])
+
+    def test_shards_run_in_worker_processes(self):
+        with override_settings(VALIDATION_WORKERS=2):
+            pids = map_shards(worker_pid, [(shard,) for shard in range(4)])
+        self.assertEqual(len(pids), 4)
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_customer_errors_keep_row_order(self):
+        serial = self.prepare(Customer, self.customers, start=40, VALIDATION_WORKERS=1)
+        sharded = self.prepare(Customer, self.customers, start=40,
+                               VALIDATION_WORKERS=3, VALIDATION_SHARD_SIZE=4)
+        self.assertEqual(sharded, serial)
+        validated, errors = sharded
+        self.assertEqual([error["index"] for error in errors], list(range(41, 60, 3)))
+        self.assertEqual([index for index, _ in validated], [index for index in range(40, 60) if index % 3 != 2])
+        self.assertEqual(errors[0]["errors"], {"waist": ["Waist must be a numeric value."]})
+
+    def test_product_errors_keep_row_order(self):
+        products = load_sample('bulk_upload_products.txt')
+        products = [{**row, "quality": 9} if position % 4 == 0 else row for position, row in enumerate(products)]
+        serial = self.prepare(Product, products, VALIDATION_WORKERS=1)
+        sharded = self.prepare(Product, products, VALIDATION_WORKERS=2, VALIDATION_SHARD_SIZE=3)
+        self.assertEqual(sharded, serial)
+        self.assertEqual([error["index"] for error in sharded[1]], [0, 4, 8, 12, 16])
+
+    def test_feedback_errors_keep_row_order(self):
+        self.load_samples()
+        feedbacks = load_sample('bulk_upload_feedbacks.txt')
+        feedbacks = [{**row, "fit": "x" * 21} if position % 3 == 0 else row for position, row in enumerate(feedbacks)]
+        serial = self.prepare(Feedback, feedbacks, VALIDATION_WORKERS=1)
+        sharded = self.prepare(Feedback, feedbacks, VALIDATION_WORKERS=2, VALIDATION_SHARD_SIZE=4)
+        self.assertEqual(sharded, serial)
+        self.assertEqual([error["index"] for error in sharded[1]], list(range(0, 20, 3)))
+
+    def test_upload_reports_errors_by_row(self):
+        with override_settings(VALIDATION_WORKERS=2, VALIDATION_SHARD_SIZE=4):
+            response = self.client.post('/upload/customers/', self.customers, format='json')
+        self.assertEqual(response.status_code, 207, response.content)
+        self.assertEqual([error["index"] for error in response.data["errors"]], list(range(1, 20, 3)))
+        self.assertEqual(response.data["inserted_ids"],
+                         [str(row["user_id"]) for position, row in enumerate(self.customers) if position % 3 != 1])
+
+    def test_stream_is_written_while_later_shards_validate(self):
+        read, read_at_insert = [], []
+
+        def records():
+            for row in self.customers:
+                read.append(row)
+                yield row
+
+        insert_batches = bulk.insert_batches
+
+        def recording(*args, **kwargs):
+            read_at_insert.append(len(read))
+            return insert_batches(*args, **kwargs)
+
+        with override_settings(VALIDATION_WORKERS=2, VALIDATION_SHARD_SIZE=2), \
+                mock.patch.object(bulk, 'insert_batches', recording):
+            inserted_count, failed_count, errors = load_stream(records(), Customer, 'user_id', 1000)
+        # Two workers keep four shards in flight; the first is written before the rest is read
+        self.assertEqual(read_at_insert[0], 8)
+        self.assertEqual(len(read_at_insert), 10)
+        self.assertEqual((inserted_count, failed_count), (13, 7))
+        self.assertEqual([error["index"] for error in errors], list(range(1, 20, 3)))
+
+    def test_job_batches_are_validated_in_the_pool(self):
+        with mock.patch.object(jobs, 'submit'):
+            response = self.client.post('/upload/customers/?async=1&batch_size=4', self.customers, format='json')
+        commit = Progress.commit
+        with override_settings(VALIDATION_WORKERS=2), \
+                mock.patch.object(Progress, 'commit', autospec=True, side_effect=commit) as commits:
+            job = jobs.run(response.data['job_id'])
+        # Still one commit per stored batch, in order
+        self.assertEqual([call.args[1] for call in commits.call_args_list], [1, 2, 3, 4, 5])
+        self.assertEqual((job.status, job.processed, job.succeeded, job.failed), ('done', 20, 13, 7))
+        self.assertEqual([error["index"] for error in Job.objects.get(job_id=job.job_id).errors],
+                         list(range(1, 20, 3)))
+        self.assertEqual(Customer.objects.count(), 13)
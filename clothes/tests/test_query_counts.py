@@ -0,0 +1,63 @@
+from clothes.models import Feedback
+from clothes.profiling import assert_max_queries
+from .mongo import MongoTestCase
+
+
+class ReadQueryCountTests(MongoTestCase):
+    """
+    Mongo commands per read endpoint, so an extra round trip per row (or per
+    reference) fails here instead of in production.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.load_samples()
+        self.feedback = Feedback.objects.order_by('review_id').first()
+
+    def get(self, url, commands, **headers):
+        """
+        GET a URL, failing unless it issues exactly `commands` Mongo commands.
+        """
+        with assert_max_queries(commands) as stats:
+            response = self.client.get(url, **headers)
+        # Fewer means the count was lost, e.g. commands went unmonitored
+        self.assertEqual(stats.commands, commands, stats.names)
+        return response
+
+    def test_list_endpoints(self):
+        # The collection version for the ETag, then the page
+        for url in ('/customers/', '/products/', '/feedbacks/', '/feedbacks/?limit=100'):
+            with self.subTest(url=url):
+                response = self.get(url, 2)
+                self.assertEqual(response.status_code, 200)
+
+    def test_next_page(self):
+        response = self.get('/feedbacks/?limit=1', 2)
+        response = self.get(f"/feedbacks/?limit=1&cursor={response.data['next']}", 2)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_unchanged_list_is_answered_from_the_version(self):
+        response = self.get('/feedbacks/', 2)
+        response = self.get('/feedbacks/', 1, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_feedback_detail(self):
+        url = f'/feedbacks/{self.feedback.review_id}/'
+        # The feedback, its customer and its product
+        response = self.get(url, 3)
+        self.assertEqual(response.status_code, 200)
+        response = self.get(url, 0)
+        self.assertEqual(response.status_code, 200)
+
+    def test_customer_feedbacks(self):
+        # The customer, which may be deleted while its feedback waits for the reaper, then the IDs
+        response = self.get(f'/customers/{self.feedback.user_id}/feedbacks/', 2)
+        self.assertIn(self.feedback.review_id, response.data['feedback_ids'])
+        response = self.get('/customers/999999/feedbacks/', 1)
+        self.assertEqual(response.status_code, 404)
+
+    def test_product_feedbacks(self):
+        response = self.get(f'/products/{self.feedback.item_id}/feedbacks/', 2)
+        self.assertIn(self.feedback.review_id, response.data['feedback_ids'])
+        response = self.get('/products/999999/feedbacks/', 1)
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,100 @@
+from unittest import mock
+from django.test import override_settings
+from clothes import jobs, reaper
+from clothes.jobs import Progress, claim
+from clothes.models import Customer, Product, Feedback, Job
+from .mongo import MongoTestCase
+
+
+class CascadeDeleteTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Jobs are run by the tests, not by the worker pool
+        patcher = mock.patch.object(reaper, 'submit')
+        self.submit = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.load_samples()
+
+    def delete(self, url):
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual((response.data['kind'], response.data['status']), ('cascade_delete', 'pending'))
+        self.submit.assert_called_once_with(response.data['job_id'])
+        return response.data['job_id']
+
+    def listed(self, url, key):
+        return [row[key] for row in self.client.get(url, {"limit": 1000}).data['results']]
+
+    def test_customer_disappears_with_the_request(self):
+        review_ids = list(Feedback.objects(user_id=100001).scalar('review_id'))
+        self.assertTrue(review_ids)
+        job_id = self.delete('/customers/100001/delete/')
+
+        self.assertEqual(self.client.get('/customers/100001/').status_code, 404)
+        self.assertNotIn(100001, self.listed('/customers/', 'user_id'))
+        self.assertEqual(self.client.get('/customers/100001/feedbacks/').status_code, 404)
+        for review_id in review_ids:
+            self.assertEqual(self.client.get(f'/feedbacks/{review_id}/').status_code, 404)
+        # The request wrote the customer only; its feedback is the job's
+        self.assertEqual(Feedback.objects(user_id=100001).count(), len(review_ids))
+        self.assertEqual(Job.objects.get(job_id=job_id).total, 1)
+
+    @override_settings(REAPER_CHUNK_SIZE=2)
+    def test_job_tombstones_the_feedback_in_chunks(self):
+        item_ids = list(Product.objects(quality=4).scalar('item_id'))
+        response = self.client.delete('/products/bulk_delete/', {'filter': {'item_id__in': item_ids}}, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.data['deleted_count'], len(item_ids))
+        self.assertEqual(self.client.get(f'/products/{item_ids[0]}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/products/{item_ids[0]}/feedbacks/').status_code, 404)
+
+        job = claim(response.data['job']['job_id'])
+        with mock.patch.object(Feedback, 'objects', wraps=Feedback.objects) as objects:
+            reaper.tombstone_dependents(job, Progress(job))
+        self.assertEqual(objects.call_count, -(-len(item_ids) // 2))
+        self.assertEqual(Feedback.objects(item_id__in=item_ids).count(), 0)
+        self.assertTrue(Feedback.all_objects(item_id__in=item_ids).count())
+        self.assertFalse(set(self.listed('/feedbacks/', 'product_id')) & set(item_ids))
+
+    @override_settings(REAPER_CHUNK_SIZE=1)
+    def test_reap_reverses_the_counts(self):
+        product = Product.objects.get(item_id=200001)
+        reviews = list(Feedback.objects(item_id=200001))
+        customer_reviews = {review.user_id: Customer.objects.get(user_id=review.user_id).feedback_counts['reviews']
+                            for review in reviews}
+        facets = self.client.get('/products/facets/').data
+        job_id = self.delete('/products/200001/delete/')
+
+        job = jobs.run(job_id)
+        self.assertEqual((job.status, job.processed, job.deleted_dependents), ('done', 1, len(reviews)))
+        self.assertEqual(Product.all_objects(item_id=200001).count(), 0)
+        self.assertEqual(Feedback.all_objects(item_id=200001).count(), 0)
+        # The customers who reviewed it count one review less each
+        for user_id, count in customer_reviews.items():
+            self.assertEqual(Customer.objects.get(user_id=user_id).feedback_counts['reviews'], count - 1)
+            self.assertEqual(self.client.get(f'/customers/{user_id}/').data['feedback_counts']['reviews'], count - 1)
+        after = self.client.get('/products/facets/').data
+        self.assertEqual(after['total'], facets['total'] - 1)
+        self.assertEqual(after['cloth_size_categories'][product.cloth_size_category],
+                         facets['cloth_size_categories'][product.cloth_size_category] - 1)
+        for keyword in product.keywords:
+            self.assertEqual(after['keywords'][keyword], facets['keywords'][keyword] - 1)
+
+    @override_settings(REAPER_CHUNK_SIZE=2)
+    def test_reap_removes_in_chunks(self):
+        user_ids = [100001, 100002, 100003]
+        deleted_feedback = Feedback.objects(user_id__in=user_ids).count()
+        response = self.client.delete('/customers/bulk_delete/', {'filter': {'user_id__in': user_ids}}, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(Customer.all_objects(user_id__in=user_ids).count(), 3)
+
+        commit = Progress.commit
+        with mock.patch.object(Progress, 'commit', autospec=True, side_effect=commit) as commits:
+            job = jobs.run(response.data['job']['job_id'])
+        # Two chunks of feedback tombstoned, then two of customers removed
+        self.assertEqual(commits.call_count, 4)
+        self.assertEqual((job.status, job.processed, job.deleted_dependents), ('done', 3, deleted_feedback))
+        self.assertEqual(Customer.all_objects(user_id__in=user_ids).count(), 0)
+        self.assertEqual(Feedback.all_objects(user_id__in=user_ids).count(), 0)
+        self.assertEqual(Customer.objects.count(), 17)
@@ -0,0 +1,62 @@
+from unittest import TestCase, skipUnless
+from clothes.pagination import decode_cursor, encode_cursor
+from clothes.search import search_page, search_pipeline
+from .mongo import MONGO_TEST_HOST, MongoTestCase
+
+
+class SearchPipelineTests(TestCase):
+
+    def test_match_and_order(self):
+        pipeline, limit, fields = search_pipeline({"q": " snug ", "customer_id": "100006", "fit": "Tight",
+                                                   "limit": "5", "fields": "review_id,fit"})
+        self.assertEqual(pipeline[0], {"$match": {"$text": {"$search": "snug"}, "deleted_at": None,
+                                                  "user_id": 100006, "fit": "Tight"}})
+        self.assertEqual(pipeline[1], {"$addFields": {"score": {"$meta": "textScore"}}})
+        self.assertEqual(pipeline[-3:-1], [{"$sort": {"score": -1, "review_id": 1}}, {"$limit": 6}])
+        self.assertEqual(set(pipeline[-1]["$project"]), {"_id", "review_id", "fit", "score"})
+        self.assertEqual((limit, fields), (5, ["review_id", "fit"]))
+
+    def test_cursor_continues_after_the_last_score(self):
+        pipeline, _, _ = search_pipeline({"q": "fit", "cursor": encode_cursor([1.5, 300004])})
+        self.assertEqual(pipeline[2], {"$match": {"$or": [{"score": {"$lt": 1.5}},
+                                                          {"score": 1.5, "review_id": {"$gt": 300004}}]}})
+
+    def test_page_carries_scores_and_the_next_cursor(self):
+        documents = [{"review_id": 300000 + n, "score": 2 - n / 3} for n in range(4)]
+        page = search_page(documents, 3, ["review_id"])
+        self.assertEqual([(row["review_id"], row["score"]) for row in page["results"]],
+                         [(300000, 2), (300001, 1.6667), (300002, 1.3333)])
+        self.assertEqual(decode_cursor(page["next"]), [documents[2]["score"], 300002])
+        self.assertIsNone(search_page(documents, 4, ["review_id"])["next"])
+
+
+class SearchEndpointTests(MongoTestCase):
+
+    def test_invalid_params(self):
+        for params in ({}, {"q": "  "}, {"q": "x" * 201}, {"q": "fit", "fit": "Roomy"},
+                       {"q": "fit", "customer_id": "me"}, {"q": "fit", "cursor": encode_cursor(1)}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/feedbacks/search/', params).status_code, 400)
+
+    @skipUnless(MONGO_TEST_HOST, "mongomock has no text search")
+    def test_summary_matches_rank_first(self):
+        self.load_samples()
+        rows = [{"review_id": 300101, "fit": "Perfect", "length": "Just right", "customer_id": 100001,
+                 "product_id": 200001, "review_summary": "Nice", "review_text": "Soft velvet lining."},
+                {"review_id": 300102, "fit": "Perfect", "length": "Just right", "customer_id": 100002,
+                 "product_id": 200001, "review_summary": "Velvet dream", "review_text": "Very soft."}]
+        self.assertEqual(self.client.post('/upload/feedbacks/', rows, format='json').status_code, 201)
+        results = self.client.get('/feedbacks/search/', {"q": "velvet"}).data['results']
+        self.assertEqual([row['review_id'] for row in results], [300102, 300101])
+
+        # Pages walk the ranking without repeating or skipping results
+        ranked = [row['review_id'] for row in self.client.get('/feedbacks/search/', {"q": "fit", "limit": 100})
+                  .data['results']]
+        walked, params = [], {"q": "fit", "limit": 3}
+        while True:
+            page = self.client.get('/feedbacks/search/', params).data
+            walked += [row['review_id'] for row in page['results']]
+            if not page['next']:
+                break
+            params = {"q": "fit", "limit": 3, "cursor": page['next']}
+        self.assertEqual(walked, ranked)
@@ -0,0 +1,100 @@
+import io
+import json
+from unittest import TestCase, mock
+from clothes import streaming
+from clothes.models import Customer
+from clothes.streaming import StreamParseError, iter_json_array, iter_ndjson
+from .mongo import MongoTestCase, load_sample
+
+
+class JsonArrayTests(TestCase):
+
+    def parse(self, body, chunk_size=streaming.READ_CHUNK_SIZE):
+        with mock.patch.object(streaming, 'READ_CHUNK_SIZE', chunk_size):
+            return list(iter_json_array(io.BytesIO(body.encode('utf-8'))))
+
+    def test_elements_in_order(self):
+        records = [{"user_id": 1, "tags": [1, 2]}, {"user_id": 2, "name": "a, b]"}, 3, "x", None]
+        self.assertEqual(self.parse(json.dumps(records)), records)
+
+    def test_values_split_across_chunks(self):
+        records = [{"user_id": n, "user_name": "Zoë " * n} for n in range(1, 20)]
+        body = json.dumps(records, ensure_ascii=False)
+        # Every chunk size splits some value, number and multi-byte character
+        for chunk_size in (1, 2, 3, 7, 64):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(body, chunk_size), records)
+
+    def test_number_at_a_chunk_boundary_is_not_cut_short(self):
+        self.assertEqual(self.parse('[12345, 678]', chunk_size=3), [12345, 678])
+
+    def test_whitespace_and_empty_array(self):
+        self.assertEqual(self.parse(' \n[ ]\n'), [])
+        self.assertEqual(self.parse('[\n  1 ,\n  2\n]'), [1, 2])
+
+    def test_not_an_array(self):
+        with self.assertRaisesRegex(StreamParseError, "Expected a JSON array"):
+            self.parse('{"user_id": 1}')
+
+    def test_missing_separator(self):
+        with self.assertRaisesRegex(StreamParseError, "Expected ',' or ']'"):
+            self.parse('[1 2]')
+
+    def test_invalid_value(self):
+        with self.assertRaisesRegex(StreamParseError, "Invalid JSON value"):
+            self.parse('[1, {"user_id": }]')
+
+    def test_truncated_body_yields_the_complete_records_first(self):
+        records = iter_json_array(io.BytesIO(b'[{"user_id": 1}, {"user_id": 2}, {"user_'))
+        self.assertEqual(next(records), {"user_id": 1})
+        self.assertEqual(next(records), {"user_id": 2})
+        with self.assertRaisesRegex(StreamParseError, "Invalid JSON value"):
+            next(records)
+
+    def test_unterminated_array(self):
+        with self.assertRaisesRegex(StreamParseError, "Unexpected end"):
+            self.parse('[1, 2,', chunk_size=2)
+
+
+class NdjsonTests(TestCase):
+
+    def parse(self, body):
+        return list(iter_ndjson(io.BytesIO(body.encode('utf-8'))))
+
+    def test_one_record_per_line(self):
+        self.assertEqual(self.parse('{"a": 1}\n\n  {"a": 2}  \r\n{"a": 3}'), [{"a": 1}, {"a": 2}, {"a": 3}])
+
+    def test_error_names_the_line(self):
+        records = iter_ndjson(io.BytesIO(b'{"a": 1}\n\n{"a": \n'))
+        self.assertEqual(next(records), {"a": 1})
+        with self.assertRaisesRegex(StreamParseError, "line 3"):
+            next(records)
+
+
+class StreamingUploadTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.customers = load_sample('bulk_upload_customer.txt')
+
+    def test_ndjson_upload(self):
+        body = '\n'.join(json.dumps(customer) for customer in self.customers)
+        response = self.client.post('/upload/customers/?batch_size=3', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['inserted_count'], len(self.customers))
+        self.assertEqual(Customer.objects.count(), len(self.customers))
+
+    def test_json_array_upload(self):
+        response = self.client.post('/upload/customers/?stream=1&batch_size=3', json.dumps(self.customers),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Customer.objects.count(), len(self.customers))
+
+    def test_parse_error_keeps_the_records_before_it(self):
+        body = '\n'.join(json.dumps(customer) for customer in self.customers[:4]) + '\n{"user_id": '
+        response = self.client.post('/upload/customers/?batch_size=3', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 207, response.content)
+        self.assertEqual(response.data['inserted_count'], 4)
+        self.assertEqual(response.data['errors'][-1]['index'], 4)
+        self.assertIn("line 5", response.data['errors'][-1]['errors'][0])
+        self.assertEqual(Customer.objects.count(), 4)